@@ -28,6 +28,10 @@ def create_app(config_class=Config):
     configure_jwt_callbacks(app)
     upload_dir = os.path.join(app.root_path, 'uploads', 'reports')
     os.makedirs(upload_dir, exist_ok=True)
+
+    # 模拟使用进程池后端时，启动阶段就拉起并预热工作进程
+    from app.services.executor_service import simulation_executor
+    simulation_executor.start()
     return app
 
 def initialize_extensions(app):
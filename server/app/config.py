@@ -25,6 +25,63 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB 文件大小限制
     ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+
+    # 用户上传的数据集：存储目录、单个文件大小、点数上限和每个用户的配额
+    USER_DATASET_FOLDER = os.getenv('USER_DATASET_FOLDER', os.path.join(UPLOAD_FOLDER, 'datasets'))
+    USER_DATASET_MAX_FILE_BYTES = int(os.getenv('USER_DATASET_MAX_FILE_BYTES', 16 * 1024 * 1024))
+    USER_DATASET_MAX_POINTS = int(os.getenv('USER_DATASET_MAX_POINTS', 200000))
+    USER_DATASET_MAX_COUNT = int(os.getenv('USER_DATASET_MAX_COUNT', 10))
+    USER_DATASET_QUOTA_BYTES = int(os.getenv('USER_DATASET_QUOTA_BYTES', 32 * 1024 * 1024))
+
+    # 聚类模拟：数据集缓存的内存上限（字节）
+    DATASET_CACHE_MAX_BYTES = int(os.getenv('DATASET_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # 聚类模拟：结果缓存（优先使用Redis，不可用时退回进程内LRU）
+    SIMULATION_CACHE_ENABLED = os.getenv('SIMULATION_CACHE_ENABLED', 'true').lower() in ('true', '1', 't')
+    SIMULATION_CACHE_REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    SIMULATION_CACHE_TTL = int(os.getenv('SIMULATION_CACHE_TTL', 3600))  # 1小时
+    SIMULATION_CACHE_MAX_ITEMS = int(os.getenv('SIMULATION_CACHE_MAX_ITEMS', 256))
+    SIMULATION_CACHE_MAX_BYTES = int(os.getenv('SIMULATION_CACHE_MAX_BYTES', 128 * 1024 * 1024))
+    SIMULATION_CACHE_MAX_ENTRY_BYTES = int(os.getenv('SIMULATION_CACHE_MAX_ENTRY_BYTES', 16 * 1024 * 1024))
+    # 默认帧预算：请求没有指定 max_frames 和 max_bytes 时使用，保证默认响应能写入结果缓存（0 表示不限制）
+    SIMULATION_DEFAULT_MAX_FRAMES = int(os.getenv('SIMULATION_DEFAULT_MAX_FRAMES', 200))
+    SIMULATION_DEFAULT_MAX_BYTES = int(os.getenv('SIMULATION_DEFAULT_MAX_BYTES', 8 * 1024 * 1024))
+    # 聚类质量指标：不超过该点数时计算精确轮廓系数，否则抽样估计
+    METRICS_EXACT_MAX_POINTS = int(os.getenv('METRICS_EXACT_MAX_POINTS', 5000))
+    METRICS_SAMPLE_SIZE = int(os.getenv('METRICS_SAMPLE_SIZE', 2000))
+    METRICS_REFERENCE_SIZE = int(os.getenv('METRICS_REFERENCE_SIZE', 20000))  # 抽样时估计簇平均距离的参考点数
+    METRICS_WORKING_MEMORY = int(os.getenv('METRICS_WORKING_MEMORY', 64 * 1024 * 1024))  # 单块距离矩阵的内存上限
+    # 异步模拟任务：超过该点数的模拟请求自动转为异步任务
+    SIMULATION_SYNC_MAX_POINTS = int(os.getenv('SIMULATION_SYNC_MAX_POINTS', 20000))
+    SIMULATION_JOB_WORKERS = int(os.getenv('SIMULATION_JOB_WORKERS', 2))
+    SIMULATION_JOB_MAX_DEPTH = int(os.getenv('SIMULATION_JOB_MAX_DEPTH', 16))  # 排队和运行中的任务总数上限
+    SIMULATION_JOB_RESULT_TTL = int(os.getenv('SIMULATION_JOB_RESULT_TTL', 600))  # 任务结果保留时间（秒）
+    # 模拟执行后端：thread 在请求线程内计算，process 使用预热的进程池
+    SIMULATION_BACKEND = os.getenv('SIMULATION_BACKEND', 'thread')
+    SIMULATION_PROCESS_WORKERS = int(os.getenv('SIMULATION_PROCESS_WORKERS', os.cpu_count() or 1))
+    SIMULATION_PROCESS_START_METHOD = os.getenv('SIMULATION_PROCESS_START_METHOD', 'spawn')
+    SIMULATION_PROCESS_BLAS_THREADS = int(os.getenv('SIMULATION_PROCESS_BLAS_THREADS', 1))  # 每个工作进程的BLAS线程数，0 表示不限制
+    # K值扫描：K的上限和并行拟合的线程数
+    KMEANS_SWEEP_MAX_K = int(os.getenv('KMEANS_SWEEP_MAX_K', 20))
+    KMEANS_SWEEP_WORKERS = int(os.getenv('KMEANS_SWEEP_WORKERS', 4))
+    # GMM模型选择：分量数的上限和并行拟合的线程数
+    GMM_SWEEP_MAX_COMPONENTS = int(os.getenv('GMM_SWEEP_MAX_COMPONENTS', 10))
+    GMM_SWEEP_WORKERS = int(os.getenv('GMM_SWEEP_WORKERS', 4))
+    # DBSCAN：不超过该点数时预先计算与ε无关的密度结构并缓存，拖动ε只需线性时间提取标签
+    DBSCAN_DENSITY_MAX_POINTS = int(os.getenv('DBSCAN_DENSITY_MAX_POINTS', 5000))
+    DBSCAN_DENSITY_CACHE_MAX_BYTES = int(os.getenv('DBSCAN_DENSITY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    # DBSCAN扩展过程动画的最大帧数（超过后只输出最终结果）
+    DBSCAN_TRACE_MAX_FRAMES = int(os.getenv('DBSCAN_TRACE_MAX_FRAMES', 300))
+    # k距离图只需一次KD树k近邻查询（10万点约0.5秒），点数上限与上传数据集的上限一致
+    DBSCAN_K_DISTANCE_MAX_POINTS = int(os.getenv('DBSCAN_K_DISTANCE_MAX_POINTS', 200000))
+    # 层次聚类：点对距离需要 n(n-1)/2 个浮点数，限制点数以控制内存（4000点约64MB）
+    AGGLOMERATIVE_MAX_POINTS = int(os.getenv('AGGLOMERATIVE_MAX_POINTS', 4000))
+    # 多算法对比：一次请求最多的算法参数组数和并发运行的线程数
+    SIMULATION_BATCH_MAX_RUNS = int(os.getenv('SIMULATION_BATCH_MAX_RUNS', 6))
+    SIMULATION_BATCH_WORKERS = int(os.getenv('SIMULATION_BATCH_WORKERS', 3))
+    # 实验会话：空闲过期时间（秒）、每个用户的会话数和常驻数据（数据集、KD树等）的内存上限
+    SIMULATION_SESSION_TTL = int(os.getenv('SIMULATION_SESSION_TTL', 1800))
+    SIMULATION_SESSION_MAX_COUNT = int(os.getenv('SIMULATION_SESSION_MAX_COUNT', 8))
+    SIMULATION_SESSION_MAX_USER_BYTES = int(os.getenv('SIMULATION_SESSION_MAX_USER_BYTES', 256 * 1024 * 1024))
     
 class DevelopmentConfig(Config):
     """开发环境配置"""
@@ -1,16 +1,59 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services.clustering_service import (
-    simulate_kmeans, 
-    simulate_dbscan, 
-    simulate_gmm,  # 删除层次聚类，增加GMM
-    generate_data_points,
+    parse_simulation_params,
+    parse_sweep_params,
+    run_kmeans_sweep,
+    parse_gmm_sweep_params,
+    run_gmm_sweep,
+    parse_k_distance_params,
+    run_k_distance,
+    parse_session_params,
+    parse_batch_params,
+    run_batch,
+    DATASET_KEYS,
+    stream_simulation,
     get_supported_data_types,
     get_supported_centroid_methods
 )
+from ..services.simulation_cache_service import make_cache_key, simulation_cache, simulation_body
+from ..services.executor_service import simulation_executor
+from ..services.job_service import simulation_jobs, JOB_SUCCEEDED, JOB_FINISHED
+from ..services.user_dataset_service import list_user_datasets, save_user_dataset, delete_user_dataset
+from ..services.session_service import simulation_sessions
+from ..utils.exceptions import NotFoundException, QueueFullException, QuotaExceededException
 
 clustering_bp = Blueprint('clustering', __name__)
 
+# 流式模拟支持的传输格式：ndjson 每行一个JSON对象，sse 为 Server-Sent Events
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+def _stream_event(stream_format, event, data):
+    """把一条流式消息编码为 NDJSON 行或 SSE 事件"""
+    if stream_format == 'sse':
+        return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+    return current_app.json.dumps({'type': event, 'data': data}) + '\n'
+
+def _missing_dataset(data):
+    """请求体中既没有内置数据集的点数，也没有上传数据集的ID"""
+    return not data or ('point_count' not in data and 'dataset_id' not in data)
+
+def _with_session(data):
+    """请求体带 session_id 时取出实验会话，并以会话的数据来源替换请求中的数据集参数
+
+    数据来源参数与不带会话的请求相同，因此结果缓存在两种请求之间共享。
+    会话不存在时抛出 NotFoundException。返回 (请求体, 会话或 None)。
+    """
+    if not data or not data.get('session_id'):
+        return data, None
+    session = simulation_sessions.get(data['session_id'], get_jwt_identity())
+    data = {key: value for key, value in data.items() if key not in DATASET_KEYS}
+    data.update(session.dataset)
+    return data, session
+
 @clustering_bp.route('/data-types', methods=['GET'])
 @jwt_required()
 def get_data_types():
@@ -31,6 +74,97 @@ def get_centroid_methods():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@clustering_bp.route('/datasets', methods=['GET'])
+@jwt_required()
+def get_user_datasets():
+    """获取当前用户上传的数据集"""
+    try:
+        return jsonify(list_user_datasets(get_jwt_identity()))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@clustering_bp.route('/datasets', methods=['POST'])
+@jwt_required()
+def upload_dataset():
+    """上传CSV/NPY数据集（每行 x, y 或 x, y, 标签），之后模拟时以 dataset_id 引用"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': '缺少上传的文件'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': '未选择文件'}), 400
+        
+        info = save_user_dataset(get_jwt_identity(), file, request.form.get('name'))
+        return jsonify(info), 201
+        
+    except QuotaExceededException as e:
+        return jsonify({'error': e.message}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@clustering_bp.route('/datasets/<dataset_id>', methods=['DELETE'])
+@jwt_required()
+def delete_dataset(dataset_id):
+    """删除当前用户上传的数据集"""
+    try:
+        delete_user_dataset(get_jwt_identity(), dataset_id)
+        return jsonify({'message': '数据集已删除'})
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@clustering_bp.route('/sessions', methods=['POST'])
+@jwt_required()
+def create_session():
+    """创建实验会话：服务端保留数据集、标准化副本和KD树，之后的模拟请求以 session_id 引用"""
+    try:
+        data = request.get_json()
+        
+        # 验证参数
+        if _missing_dataset(data):
+            return jsonify({'error': '缺少必要参数'}), 400
+        
+        session = simulation_sessions.create(get_jwt_identity(), parse_session_params(data))
+        return jsonify(session.to_dict(simulation_sessions.ttl)), 201
+        
+    except QuotaExceededException as e:
+        return jsonify({'error': e.message}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@clustering_bp.route('/sessions', methods=['GET'])
+@jwt_required()
+def get_sessions():
+    """获取当前用户的实验会话"""
+    sessions = simulation_sessions.list(get_jwt_identity())
+    return jsonify([session.to_dict(simulation_sessions.ttl) for session in sessions])
+
+@clustering_bp.route('/sessions/<session_id>', methods=['GET'])
+@jwt_required()
+def get_session(session_id):
+    """查询实验会话（同时刷新其过期时间）"""
+    try:
+        session = simulation_sessions.get(session_id, get_jwt_identity())
+        return jsonify(session.to_dict(simulation_sessions.ttl))
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+
+@clustering_bp.route('/sessions/<session_id>', methods=['DELETE'])
+@jwt_required()
+def delete_session(session_id):
+    """删除实验会话并释放其占用的内存"""
+    try:
+        simulation_sessions.delete(session_id, get_jwt_identity())
+        return jsonify({'message': '实验会话已删除'})
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+
 @clustering_bp.route('/simulate/<algorithm>', methods=['POST'])
 @jwt_required()
 def simulate_algorithm(algorithm):
@@ -39,48 +173,294 @@ def simulate_algorithm(algorithm):
         data = request.get_json()
         user_id = get_jwt_identity()
         
+        data, session = _with_session(data)
+        
         # 验证参数
-        if not data or 'point_count' not in data:
+        if _missing_dataset(data):
             return jsonify({'error': '缺少必要参数'}), 400
         
-        point_count = data.get('point_count', 100)
-        data_type = data.get('data_type', 'uniform')
+        params = parse_simulation_params(algorithm, data)
         
-        # 生成数据点
-        points = generate_data_points(point_count, data_type)
+        # 大数据量的模拟会长时间占用请求线程，转为异步任务
+        if int(params['point_count']) > current_app.config['SIMULATION_SYNC_MAX_POINTS']:
+            return _submit_job(user_id, algorithm, params, session)
         
-        # 根据算法类型调用不同的模拟函数
-        if algorithm == 'kmeans':
-            k_value = data.get('k_value', 3)
-            centroid_method = data.get('centroid_method', 'random')
-            custom_centroids = data.get('custom_centroids')  # 获取自定义质心
-            result = simulate_kmeans(points, k_value, centroid_method, custom_centroids)
-            
-        elif algorithm == 'dbscan':
-            epsilon = data.get('epsilon', 0.5)
-            min_points = data.get('min_points', 5)
-            result = simulate_dbscan(points, epsilon, min_points)
-            
-        elif algorithm == 'gmm':  # 删除层次聚类，增加GMM
-            k_value = data.get('k_value', 3)
-            covariance_type = data.get('covariance_type', 'full')
-            max_iterations = data.get('max_iterations', 100)
-            tolerance = data.get('tolerance', 0.001)
-            result = simulate_gmm(points, k_value, covariance_type, max_iterations, tolerance)
-            
-        else:
-            return jsonify({'error': '不支持的算法类型'}), 400
+        # 相同参数的模拟结果完全一致，先查结果缓存；未命中时交给执行器（线程内或进程池）计算
+        def compute():
+            return simulation_executor.run(algorithm, params, session)
         
-        return jsonify({
-            'status': 'success',
-            'algorithm': algorithm,
-            'steps': result['steps'],
-            'metrics': result['metrics']
-        })
+        body, cache_status = simulation_cache.get_or_compute(make_cache_key(algorithm, params), compute)
+        
+        return Response(body, mimetype='application/json', headers={'X-Simulation-Cache': cache_status})
+        
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+    except QueueFullException as e:
+        return jsonify({'error': e.message}), 429, {'Retry-After': '5'}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@clustering_bp.route('/simulate/batch', methods=['POST'])
+@jwt_required()
+def simulate_batch():
+    """多算法对比：同一数据集只生成一次，并发运行 runs 中的各组算法，返回全部结果和指标对比表"""
+    try:
+        data = request.get_json()
+        data, session = _with_session(data)
+        
+        # 验证参数
+        if _missing_dataset(data):
+            return jsonify({'error': '缺少必要参数'}), 400
         
+        params = parse_batch_params(data)
+        
+        def compute():
+            return simulation_body('batch', run_batch(params, session))
+        
+        body, cache_status = simulation_cache.get_or_compute(make_cache_key('batch', params), compute)
+        
+        return Response(body, mimetype='application/json', headers={'X-Simulation-Cache': cache_status})
+        
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _submit_job(user_id, algorithm, params, session=None):
+    """提交异步模拟任务，返回 202 和任务状态的查询地址"""
+    job = simulation_jobs.submit(current_app._get_current_object(), user_id, algorithm, params, session)
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = url_for('clustering.get_simulation_job', job_id=job.id)
+    return response
+
+@clustering_bp.route('/simulate/<algorithm>/jobs', methods=['POST'])
+@jwt_required()
+def submit_simulation_job(algorithm):
+    """提交异步模拟任务：立即返回任务ID，之后通过 /jobs/<job_id> 查询进度和结果"""
+    try:
+        data = request.get_json()
+        user_id = get_jwt_identity()
+        
+        data, session = _with_session(data)
+        
+        # 验证参数
+        if _missing_dataset(data):
+            return jsonify({'error': '缺少必要参数'}), 400
+        
+        params = parse_simulation_params(algorithm, data)
+        return _submit_job(user_id, algorithm, params, session)
+        
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+    except QueueFullException as e:
+        return jsonify({'error': e.message}), 429, {'Retry-After': '5'}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@clustering_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_simulation_job(job_id):
+    """查询异步模拟任务的状态和进度"""
+    try:
+        job = simulation_jobs.get(job_id, get_jwt_identity())
+        return jsonify(job.to_dict())
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+
+@clustering_bp.route('/jobs/<job_id>/result', methods=['GET'])
+@jwt_required()
+def get_simulation_job_result(job_id):
+    """获取异步模拟任务的结果（格式与同步模拟接口相同）"""
+    try:
+        job = simulation_jobs.get(job_id, get_jwt_identity())
+        if job.status != JOB_SUCCEEDED:
+            info = job.to_dict()
+            info['error'] = job.error or '任务尚未完成'
+            return jsonify(info), 409
+        return Response(job.body, mimetype='application/json', headers={'X-Simulation-Cache': job.cache_status})
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+
+@clustering_bp.route('/jobs/<job_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_simulation_job(job_id):
+    """取消尚未开始运行的异步模拟任务"""
+    try:
+        job = simulation_jobs.get(job_id, get_jwt_identity())
+        if not simulation_jobs.cancel(job_id, get_jwt_identity()):
+            if job.status in JOB_FINISHED:
+                return jsonify({'error': '任务已结束'}), 409
+            return jsonify({'error': '任务已开始运行，无法取消'}), 409
+        return jsonify(job.to_dict())
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+
+@clustering_bp.route('/simulate/<algorithm>/stream', methods=['POST'])
+@jwt_required()
+def stream_simulate_algorithm(algorithm):
+    """流式模拟聚类算法：每算完一帧就推送一帧，最后推送性能指标
+    
+    消息依次为 start（状态、算法名及列式格式的坐标等）、若干 step、metrics 和 end，
+    计算出错时推送 error 并结束。参数与 /simulate/<algorithm> 相同，另加 stream_format。
+    流式响应不经过结果缓存；帧在算出时立即发送，max_frames/max_bytes 帧预算不适用。
+    点数超过 SIMULATION_SYNC_MAX_POINTS 时返回 413，并给出异步任务接口的地址。
+    """
+    try:
+        data = request.get_json()
+        
+        data, session = _with_session(data)
+        
+        # 验证参数
+        if _missing_dataset(data):
+            return jsonify({'error': '缺少必要参数'}), 400
+        
+        stream_format = data.get('stream_format', 'ndjson')
+        if stream_format not in STREAM_FORMATS:
+            return jsonify({'error': f'不支持的流式格式: {stream_format}'}), 400
+        
+        params = parse_simulation_params(algorithm, data)
+        
+        # 流式计算同样占用请求线程，大数据量需改用异步任务
+        if int(params['point_count']) > current_app.config['SIMULATION_SYNC_MAX_POINTS']:
+            return jsonify({
+                'error': f'流式模拟的数据点数不能超过 {current_app.config["SIMULATION_SYNC_MAX_POINTS"]}，请改用异步任务',
+                'jobs_url': url_for('clustering.submit_simulation_job', algorithm=algorithm)
+            }), 413
+        
+        parts = stream_simulation(algorithm, params, session)
+        
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        try:
+            for kind, content in parts:
+                if kind == 'header':
+                    start = {'status': 'success', 'algorithm': algorithm}
+                    start.update(content)
+                    yield _stream_event(stream_format, 'start', start)
+                else:
+                    yield _stream_event(stream_format, kind, content)
+            yield _stream_event(stream_format, 'end', {'status': 'success'})
+        except Exception as e:
+            current_app.logger.error(f"流式模拟失败: {e}")
+            yield _stream_event(stream_format, 'error', {'error': str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype=STREAM_FORMATS[stream_format],
+        # 禁止代理缓冲，保证每一帧立即送达客户端
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@clustering_bp.route('/sweep/kmeans', methods=['POST'])
+@jwt_required()
+def sweep_kmeans_k():
+    """K值扫描：一次请求得到 K=k_min..k_max 的SSE（肘部法）和轮廓系数等指标曲线"""
+    try:
+        data = request.get_json()
+        
+        data, session = _with_session(data)
+        
+        # 验证参数
+        if _missing_dataset(data):
+            return jsonify({'error': '缺少必要参数'}), 400
+        
+        params = parse_sweep_params(data)
+        
+        def compute():
+            return simulation_body('kmeans_sweep', run_kmeans_sweep(params, session))
+        
+        body, cache_status = simulation_cache.get_or_compute(make_cache_key('kmeans_sweep', params), compute)
+        
+        return Response(body, mimetype='application/json', headers={'X-Simulation-Cache': cache_status})
+        
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@clustering_bp.route('/sweep/gmm', methods=['POST'])
+@jwt_required()
+def sweep_gmm_models():
+    """GMM模型选择：一次请求得到 分量数 × 协方差类型 网格上的BIC/AIC曲面和最优模型"""
+    try:
+        data = request.get_json()
+        
+        data, session = _with_session(data)
+        
+        # 验证参数
+        if _missing_dataset(data):
+            return jsonify({'error': '缺少必要参数'}), 400
+        
+        params = parse_gmm_sweep_params(data)
+        
+        def compute():
+            return simulation_body('gmm_sweep', run_gmm_sweep(params, session))
+        
+        body, cache_status = simulation_cache.get_or_compute(make_cache_key('gmm_sweep', params), compute)
+        
+        return Response(body, mimetype='application/json', headers={'X-Simulation-Cache': cache_status})
+        
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@clustering_bp.route('/dbscan/k-distance', methods=['POST'])
+@jwt_required()
+def dbscan_k_distance():
+    """k距离图：返回排序后的第k近邻距离曲线和自动检测的建议 ε"""
+    try:
+        data = request.get_json()
+        
+        data, session = _with_session(data)
+        
+        # 验证参数
+        if _missing_dataset(data):
+            return jsonify({'error': '缺少必要参数'}), 400
+        
+        params = parse_k_distance_params(data)
+        
+        def compute():
+            return simulation_body('dbscan_k_distance', run_k_distance(params, session))
+        
+        body, cache_status = simulation_cache.get_or_compute(make_cache_key('dbscan_k_distance', params), compute)
+        
+        return Response(body, mimetype='application/json', headers={'X-Simulation-Cache': cache_status})
+        
+    except NotFoundException as e:
+        return jsonify({'error': e.message}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@clustering_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """获取模拟结果缓存的命中统计、异步任务队列和实验会话的状态"""
+    stats = simulation_cache.stats()
+    stats['jobs'] = simulation_jobs.stats()
+    stats['executor'] = simulation_executor.stats()
+    stats['sessions'] = simulation_sessions.stats()
+    return jsonify(stats)
+
 @clustering_bp.route('/intro/<algorithm>', methods=['GET'])
 def get_algorithm_intro(algorithm):
     """获取算法介绍"""
@@ -144,6 +524,24 @@ def get_algorithm_intro(algorithm):
                 '可能收敛到局部最优',
                 '计算复杂度较高'
             ]
+        },
+        'agglomerative': {
+            'name': '层次聚类',
+            'description': '凝聚式层次聚类：每个点先自成一簇，每次合并距离最近的两个簇，形成树状图，在任意高度切割即可得到对应数量的簇',
+            'parameters': [
+                {'name': '簇数量', 'description': '切割树状图得到的簇数，可在客户端按合并表随时调整'},
+                {'name': '链接方式', 'description': '簇间距离的定义：ward、complete、average 或 single'}
+            ],
+            'advantages': [
+                '不需要预先确定簇的数量',
+                '树状图直观展示簇的层次结构',
+                'single链接能够发现任意形状的簇'
+            ],
+            'limitations': [
+                '需要计算全部点对距离，时间和内存开销随点数平方增长',
+                '合并一旦发生无法撤销',
+                '对噪声和离群点敏感（尤其是single链接）'
+            ]
         }
     }
     
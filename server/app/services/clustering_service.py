@@ -1,683 +1,1351 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-from sklearn.cluster import KMeans, DBSCAN
-from sklearn.mixture import GaussianMixture  # 删除层次聚类，增加GMM
-from sklearn.datasets import make_blobs, make_moons, make_circles
-from sklearn.metrics import silhouette_score
+from sklearn.cluster import DBSCAN, kmeans_plusplus
 from sklearn.preprocessing import StandardScaler
-import json
-def generate_data_points(n_samples, data_type='uniform'):
-    """生成不同类型的数据点"""
-    if data_type == 'gaussian':
-        # 生成高斯分布数据
-        points, labels = make_blobs(
-            n_samples=n_samples, 
-            centers=3, 
-            cluster_std=0.8, 
-            random_state=42
-        )
-    elif data_type == 'moons':
-        # 生成月牙形数据
-        points, labels = make_moons(
-            n_samples=n_samples, 
-            noise=0.1, 
-            random_state=42
-        )
-    elif data_type == 'circles':
-        # 生成环形数据
-        points, labels = make_circles(
-            n_samples=n_samples, 
-            noise=0.05, 
-            factor=0.5, 
-            random_state=42
-        )
-    elif data_type == 'smiley':
-        # 生成笑脸分布数据
-        points, labels = generate_smiley_data(n_samples)
-    elif data_type == 'spiral':
-        # 生成螺旋分布数据
-        points, labels = generate_spiral_data(n_samples)
-    elif data_type == 'anisotropic':
-        # 生成异方差分布数据
-        points, labels = generate_anisotropic_data(n_samples)
-    elif data_type == 'noisy':
-        # 生成带噪声的数据
-        points, labels = generate_noisy_data(n_samples)
-    else:
-        # 默认均匀分布
-        np.random.seed(42)
-        points = np.random.rand(n_samples, 2) * 10
-        labels = np.zeros(n_samples)
-    
-    # 转换为前端需要的格式
-    formatted_points = []
-    for i, point in enumerate(points):
-        formatted_points.append({
-            'x': float(point[0]),
-            'y': float(point[1]),
-            'cluster': int(labels[i]) if i < len(labels) else -1,
-            'originalCluster': int(labels[i]) if i < len(labels) else -1
-        })
-    
-    return formatted_points
-
-
-def generate_smiley_data(n_samples):
-    """生成笑脸形状的数据 - 最终修正版"""
-    np.random.seed(42)
-    
-    # 精确计算各部分点数
-    n_face = n_samples // 2
-    n_eye = n_samples // 8
-    n_mouth = n_samples - n_face - 2 * n_eye
-    
-    points = []
-    labels = []
-    
-    # 1. 脸轮廓 (大圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_face)
-    radii = np.random.uniform(3.5, 4.5, n_face)
-    face_x = 5 + radii * np.cos(angles)
-    face_y = 5 + radii * np.sin(angles)
-    points.extend(np.column_stack([face_x, face_y]))
-    labels.extend([0] * n_face)
-    
-    # 2. 左眼 (小圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_eye)
-    radii = np.random.uniform(0.4, 0.6, n_eye)
-    left_eye_x = 3.5 + radii * np.cos(angles)
-    left_eye_y = 6 + radii * np.sin(angles)
-    points.extend(np.column_stack([left_eye_x, left_eye_y]))
-    labels.extend([1] * n_eye)
-    
-    # 3. 右眼 (小圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_eye)
-    radii = np.random.uniform(0.4, 0.6, n_eye)
-    right_eye_x = 6.5 + radii * np.cos(angles)
-    right_eye_y = 6 + radii * np.sin(angles)
-    points.extend(np.column_stack([right_eye_x, right_eye_y]))
-    labels.extend([2] * n_eye)
-    
-    # 4. 嘴巴 (向下弧形) - 关键修正！
-    # 使用下半圆的角度范围：π 到 2π (180° 到 360°)
-    angles = np.random.uniform(np.pi, 2 * np.pi, n_mouth)
-    radii = np.random.uniform(1.5, 2.0, n_mouth)  # 减小半径
-    
-    mouth_x = 5 + radii * np.cos(angles)
-    mouth_y = 4.5 + radii * np.sin(angles)  # 中心点下移
-    
-    points.extend(np.column_stack([mouth_x, mouth_y]))
-    labels.extend([3] * n_mouth)
-    
-    points = np.array(points)
-    labels = np.array(labels)
-    
-    # 确保坐标在 0-10 范围内
-    points = np.clip(points, 0.1, 9.9)
-    
-    # 打乱顺序
-    indices = np.random.permutation(len(points))
-    return points[indices], labels[indices]
-    """生成笑脸形状的数据 - 修正版"""
-    np.random.seed(42)
-    
-    # 精确计算各部分点数
-    n_face = n_samples // 2
-    n_eye = n_samples // 8
-    n_mouth = n_samples - n_face - 2 * n_eye
-    
-    points = []
-    labels = []
-    
-    # 1. 脸轮廓 (大圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_face)
-    radii = np.random.uniform(3.5, 4.5, n_face)
-    face_x = 5 + radii * np.cos(angles)
-    face_y = 5 + radii * np.sin(angles)
-    points.extend(np.column_stack([face_x, face_y]))
-    labels.extend([0] * n_face)
-    
-    # 2. 左眼 (小圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_eye)
-    radii = np.random.uniform(0.4, 0.6, n_eye)
-    left_eye_x = 3.5 + radii * np.cos(angles)
-    left_eye_y = 6 + radii * np.sin(angles)
-    points.extend(np.column_stack([left_eye_x, left_eye_y]))
-    labels.extend([1] * n_eye)
-    
-    # 3. 右眼 (小圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_eye)
-    radii = np.random.uniform(0.4, 0.6, n_eye)
-    right_eye_x = 6.5 + radii * np.cos(angles)
-    right_eye_y = 6 + radii * np.sin(angles)
-    points.extend(np.column_stack([right_eye_x, right_eye_y]))
-    labels.extend([2] * n_eye)
-    
-    # 4. 嘴巴 (向下弧形) - 修正部分
-    angles = np.random.uniform(np.pi * 0.2, np.pi * 0.8, n_mouth)
-    radii = np.random.uniform(2.0, 2.5, n_mouth)
-    mouth_x = 5 + radii * np.cos(angles)  # 中心点x坐标修正为5
-    mouth_y = 4 + radii * np.sin(angles)  # 中心点y坐标下移
-    points.extend(np.column_stack([mouth_x, mouth_y]))
-    labels.extend([3] * n_mouth)
-    
-    points = np.array(points)
-    labels = np.array(labels)
-    
-    # 确保坐标在 0-10 范围内
-    points = np.clip(points, 0.1, 9.9)
-    
-    # 打乱顺序
-    indices = np.random.permutation(len(points))
-    return points[indices], labels[indices]
-    """生成笑脸形状的数据 - 修正版"""
-    np.random.seed(42)
-    
-    # 精确计算各部分点数，避免整数除法误差
-    n_face = n_samples // 2
-    n_eye = n_samples // 8
-    n_mouth = n_samples - n_face - 2 * n_eye  # 剩余点数给嘴巴
-    
-    points = []
-    labels = []
-    
-    # 1. 脸轮廓 (大圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_face)
-    radii = np.random.uniform(3.5, 4.5, n_face)  # 调整半径范围
-    face_x = 5 + radii * np.cos(angles)
-    face_y = 5 + radii * np.sin(angles)
-    points.extend(np.column_stack([face_x, face_y]))
-    labels.extend([0] * n_face)
-    
-    # 2. 左眼 (小圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_eye)
-    radii = np.random.uniform(0.4, 0.6, n_eye)  # 调整半径范围
-    left_eye_x = 3.5 + radii * np.cos(angles)
-    left_eye_y = 6 + radii * np.sin(angles)
-    points.extend(np.column_stack([left_eye_x, left_eye_y]))
-    labels.extend([1] * n_eye)
-    
-    # 3. 右眼 (小圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_eye)
-    radii = np.random.uniform(0.4, 0.6, n_eye)  # 调整半径范围
-    right_eye_x = 6.5 + radii * np.cos(angles)
-    right_eye_y = 6 + radii * np.sin(angles)
-    points.extend(np.column_stack([right_eye_x, right_eye_y]))
-    labels.extend([2] * n_eye)
-    
-    # 4. 嘴巴 (向下弧形) - 修正这里！
-    # 嘴巴应该是向下的弧形，角度从 0.2π 到 0.8π（下半圆）
-    angles = np.random.uniform(np.pi * 0.2, np.pi * 0.8, n_mouth)
-    radii = np.random.uniform(2.0, 2.5, n_mouth)  # 调整半径范围
-    mouth_x = 2 + radii * np.cos(angles)
-    mouth_y = 2 + radii * np.sin(angles)  # 保持y坐标计算不变
-    points.extend(np.column_stack([mouth_x, mouth_y]))
-    labels.extend([3] * n_mouth)
-    
-    points = np.array(points)
-    labels = np.array(labels)
-    
-    # 确保坐标在 0-10 范围内
-    points = np.clip(points, 0.1, 9.9)
-    
-    # 打乱顺序
-    indices = np.random.permutation(len(points))
-    return points[indices], labels[indices]
-    """生成笑脸形状的数据 - 修正嘴巴位置"""
-    np.random.seed(42)
-    
-    # 精确计算各部分点数
-    n_face = n_samples // 2
-    n_eye = n_samples // 8
-    n_mouth = n_samples - n_face - 2 * n_eye
-    
-    points = []
-    labels = []
-    
-    # 1. 脸轮廓 (大圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_face)
-    radii = np.random.uniform(3.5, 4.5, n_face)
-    face_x = 5 + radii * np.cos(angles)
-    face_y = 5 + radii * np.sin(angles)
-    points.extend(np.column_stack([face_x, face_y]))
-    labels.extend([0] * n_face)
-    
-    # 2. 左眼 (小圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_eye)
-    radii = np.random.uniform(0.4, 0.6, n_eye)
-    left_eye_x = 3.5 + radii * np.cos(angles)
-    left_eye_y = 6 + radii * np.sin(angles)
-    points.extend(np.column_stack([left_eye_x, left_eye_y]))
-    labels.extend([1] * n_eye)
-    
-    # 3. 右眼 (小圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_eye)
-    radii = np.random.uniform(0.4, 0.6, n_eye)
-    right_eye_x = 6.5 + radii * np.cos(angles)
-    right_eye_y = 6 + radii * np.sin(angles)
-    points.extend(np.column_stack([right_eye_x, right_eye_y]))
-    labels.extend([2] * n_eye)
-    
-    # 4. 嘴巴 - 尝试翻转Y坐标
-    # angles = np.random.uniform(np.pi * 0.8, np.pi * 1.2, n_mouth)
-    # radii = np.random.uniform(1.5, 2.5, n_mouth)
-    
-    # mouth_x = 5 + radii * np.cos(angles)
-    # mouth_y = 4.5 - radii * np.sin(angles)  # 用减号而不是加号！
-    
-    # points.extend(np.column_stack([mouth_x, mouth_y]))
-    # labels.extend([3] * n_mouth)
-    
-    
-    angles = np.random.uniform(np.pi * 0.2, np.pi * 0.8, n_mouth)
-    radii = np.random.uniform(2.0, 2.5, n_mouth)  # 调整半径范围
-    mouth_x = 5 + radii * np.cos(angles)
-    mouth_y = 5 + radii * np.sin(angles)  # 保持y坐标计算不变
-    points.extend(np.column_stack([mouth_x, mouth_y]))
-    labels.extend([3] * n_mouth)
-    
-    points = np.array(points)
-    labels = np.array(labels)
-    # 确保坐标在 0-10 范围内
-    points = np.clip(points, 0.1, 9.9)
-    
-    # 打乱顺序
-    indices = np.random.permutation(len(points))
-    return points[indices], labels[indices]
-    """生成笑脸形状的数据 - 修正版"""
-    np.random.seed(42)
-
-    # 精确计算各部分点数，避免整数除法误差
-    n_face = n_samples // 2
-    n_eye = n_samples // 8
-    n_mouth = n_samples - n_face - 2 * n_eye  # 剩余点数给嘴巴
-    
-    points = []
-    labels = []
-    
-    # 1. 脸轮廓 (大圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_face)
-    radii = np.random.uniform(3.5, 4.5, n_face)  # 调整半径范围
-    face_x = 5 + radii * np.cos(angles)
-    face_y = 5 + radii * np.sin(angles)
-    points.extend(np.column_stack([face_x, face_y]))
-    labels.extend([0] * n_face)
-    
-    # 2. 左眼 (小圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_eye)
-    radii = np.random.uniform(0.4, 0.6, n_eye)  # 调整半径范围
-    left_eye_x = 3.5 + radii * np.cos(angles)
-    left_eye_y = 6 + radii * np.sin(angles)
-    points.extend(np.column_stack([left_eye_x, left_eye_y]))
-    labels.extend([1] * n_eye)
-    
-    # 3. 右眼 (小圆)
-    angles = np.random.uniform(0, 2 * np.pi, n_eye)
-    radii = np.random.uniform(0.4, 0.6, n_eye)  # 调整半径范围
-    right_eye_x = 6.5 + radii * np.cos(angles)
-    right_eye_y = 6 + radii * np.sin(angles)
-    points.extend(np.column_stack([right_eye_x, right_eye_y]))
-    labels.extend([2] * n_eye)
-    
-    # 4. 嘴巴 (向下弧形) - 修正这里！
-    # 嘴巴应该是向下的弧形，角度从 0.2π 到 0.8π（下半圆）
-    angles = np.random.uniform(np.pi * 0.2, np.pi * 0.8, n_mouth)
-    radii = np.random.uniform(2.0, 2.5, n_mouth)  # 调整半径范围
-    mouth_x = 5 + radii * np.cos(angles)
-    mouth_y = 5 + radii * np.sin(angles)  # 保持y坐标计算不变
-    points.extend(np.column_stack([mouth_x, mouth_y]))
-    labels.extend([3] * n_mouth)
-    
-    points = np.array(points)
-    labels = np.array(labels)
-    
-    # 确保坐标在 0-10 范围内
-    points = np.clip(points, 0.1, 9.9)
-    
-    # 打乱顺序
-    indices = np.random.permutation(len(points))
-    return points[indices], labels[indices]     
-def generate_spiral_data(n_samples):
-    """生成螺旋分布数据"""
-    np.random.seed(42)
-    
-    n_samples_per_class = n_samples // 3
-    points = []
-    labels = []
-    
-    # 生成3个螺旋
-    for i in range(3):
-        n = n_samples_per_class
-        t = np.linspace(0, 4 * np.pi, n)
-        r = t * 0.5 + np.random.normal(0, 0.1, n)
-        
-        x = 5 + r * np.cos(t + i * 2 * np.pi / 3)
-        y = 5 + r * np.sin(t + i * 2 * np.pi / 3)
-        
-        points.extend(np.column_stack([x, y]))
-        labels.extend([i] * n)
-    
-    points = np.array(points)
-    labels = np.array(labels)
-    
-    # 打乱顺序
-    indices = np.random.permutation(len(points))
-    return points[indices], labels[indices]
-
-
-def generate_anisotropic_data(n_samples):
-    """生成异方差分布数据"""
-    np.random.seed(42)
-    
-    # 生成变换后的高斯分布
-    X, y = make_blobs(n_samples=n_samples, centers=3, random_state=42)
-    
-    # 应用各向异性变换
-    transformation = [[0.6, -0.6], [-0.4, 0.8]]
-    X_aniso = np.dot(X, transformation)
-    
-    # 移动到中心
-    X_aniso = (X_aniso - X_aniso.mean(axis=0)) * 2 + np.array([5, 5])
-    
-    return X_aniso, y
-
-
-def generate_noisy_data(n_samples):
-    """生成带噪声的数据"""
-    np.random.seed(42)
-    
-    # 生成正常聚类数据
-    n_cluster_samples = n_samples * 3 // 4
-    n_noise_samples = n_samples // 4
-    
-    # 生成3个高斯簇
-    points, labels = make_blobs(
-        n_samples=n_cluster_samples, 
-        centers=3, 
-        cluster_std=0.8, 
-        random_state=42
-    )
-    
-    # 添加噪声点
-    noise_points = np.random.uniform(0, 10, (n_noise_samples, 2))
-    noise_labels = np.full(n_noise_samples, -1)  # -1 表示噪声点
-    
-    all_points = np.vstack([points, noise_points])
-    all_labels = np.concatenate([labels, noise_labels])
-    
-    # 打乱顺序
-    indices = np.random.permutation(len(all_points))
-    return all_points[indices], all_labels[indices]
-
-def simulate_kmeans(points, k=3, init_method='random', custom_centroids=None):
-    """模拟K-Means算法"""
-    # 准备数据
+from scipy.special import logsumexp
+from scipy.cluster.hierarchy import linkage, leaves_list, cophenet
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from app.config import Config
+from app.utils.exceptions import NotFoundException
+from .dataset_service import DATASET_SPECS, load_dataset, dataset_key
+from .user_dataset_service import get_user_dataset_info
+from .density_service import get_density_index, dbscan_from_index, k_distance_curve
+from .geometry_service import GeometryCache
+from .metrics_service import compute_cluster_metrics, compare_labelings, find_knee
+from .payload_service import (
+    RESPONSE_FORMATS, FRAME_ENCODINGS, LOD_MODES, make_frame, build_payload, iter_payload, format_centroids
+)
+from .session_service import SimulationSession
+
+
+def _as_arrays(points, original_clusters=None):
+    """simulate_* 的输入可以是坐标数组，也可以是旧的点字典列表"""
+    if isinstance(points, np.ndarray):
+        if original_clusters is None:
+            original_clusters = np.full(len(points), -1, dtype=np.int32)
+        return points, np.asarray(original_clusters)
     X = np.array([[p['x'], p['y']] for p in points])
-    
+    return X, np.array([p.get('originalCluster', -1) for p in points])
+
+
+def _nearest_centroids(X, x_sq, centroids):
+    """把每个点分配到最近的质心，返回标签和到该质心的平方距离（精度与 X 的类型相同）"""
+    # ||x - c||² = ||x||² - 2x·c + ||c||²，一次矩阵乘法得到全部距离
+    centroids = centroids.astype(X.dtype, copy=False)
+    distances = X @ centroids.T
+    distances *= -2
+    distances += x_sq[:, None]
+    distances += np.einsum('ij,ij->i', centroids, centroids)[None, :]
+    labels = distances.argmin(axis=1)
+    return labels, np.maximum(distances[np.arange(len(X)), labels], 0)
+
+
+def _iter_lloyd(X, x_sq, centroids, max_iter, tol, assign=None):
+    """从给定初始质心运行Lloyd迭代，每完成一轮就产出该轮的状态（生成器）
+
+    每个状态包含 labels、centroids、inertia、n_iter、converged，
+    last 表示这是最后一轮（已收敛或达到最大迭代次数）。
+    assign 为 (X32, x_sq32) 时分配步骤使用 float32 距离，质心更新和SSE仍按 float64 计算。
+    """
+    k = len(centroids)
+    n_features = X.shape[1]
+    label_dtype = np.int16 if k <= np.iinfo(np.int16).max else np.int32
+    x_sq_total = float(x_sq.sum())
+    assign_X, assign_sq = assign if assign is not None else (X, x_sq)
+
+    for i in range(max_iter):
+        # 分配步骤
+        labels, _ = _nearest_centroids(assign_X, assign_sq, centroids)
+
+        # 更新步骤：用 bincount 按簇求和，空簇保留原质心
+        counts = np.bincount(labels, minlength=k)
+        sums = np.column_stack([
+            np.bincount(labels, weights=X[:, d], minlength=k) for d in range(n_features)
+        ])
+        new_centroids = centroids.copy()
+        non_empty = counts > 0
+        new_centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+
+        # 更新后的SSE可由簇内统计量直接得到，无需再算一次距离
+        inertia = x_sq_total - 2 * float((sums * new_centroids).sum()) \
+            + float((counts * np.einsum('ij,ij->i', new_centroids, new_centroids)).sum())
+
+        converged = float(((new_centroids - centroids) ** 2).sum()) <= tol
+        centroids = new_centroids
+        yield {
+            'labels': labels.astype(label_dtype),
+            'centroids': new_centroids,
+            'inertia': max(inertia, 0.0),
+            'n_iter': i + 1,
+            'converged': converged,
+            'last': converged or i + 1 == max_iter
+        }
+        if converged:
+            break
+
+
+def _collect_trace(init_centroids, states, keys=('labels', 'centroids', 'inertia')):
+    """把逐轮产出的状态收集成轨迹字典"""
+    trace = {'init_centroids': init_centroids.copy(), 'n_iter': 0, 'converged': False}
+    trace.update({key: [] for key in keys})
+    for state in states:
+        for key in keys:
+            trace[key].append(state[key])
+        trace['n_iter'] = state['n_iter']
+        trace['converged'] = state['converged']
+    return trace
+
+
+def _lloyd_trace(X, x_sq, centroids, max_iter, tol):
+    """从给定初始质心运行Lloyd迭代并记录每一轮的状态"""
+    return _collect_trace(centroids, _iter_lloyd(X, x_sq, centroids, max_iter, tol))
+
+
+def _trace_states(trace, keys=('labels', 'centroids', 'inertia')):
+    """把已记录的轨迹重新展开为逐轮状态，与 _iter_lloyd 的产出格式相同"""
+    n_frames = len(trace['labels'])
+    for i in range(n_frames):
+        last = i == n_frames - 1
+        state = {key: trace[key][i] for key in keys}
+        state.update({
+            'n_iter': i + 1,
+            'converged': trace['converged'] and last,
+            'last': last
+        })
+        yield state
+
+
+def _kmeans_tol(X, tol):
+    # 与sklearn一致，收敛阈值相对于数据方差
+    return tol * float(np.mean(np.var(X, axis=0)))
+
+
+def trace_kmeans(X, k, init_method='random', init_centroids=None, n_init=1,
+                 max_iter=100, tol=1e-4, random_state=42):
+    """向量化的K-Means：一次运行记录每轮迭代的标签、质心和SSE
+
+    返回字典：init_centroids 为初始质心，labels/centroids/inertia 为逐轮记录，
+    第 i 轮记录的是"按上一轮质心分配标签，再据此更新质心"之后的状态。
+    n_init > 1 时（仅非自定义初始化）运行多次，保留最终SSE最小的那条轨迹。
+    """
+    X = np.asarray(X, dtype=np.float64)
+    x_sq = np.einsum('ij,ij->i', X, X)
+    tol = _kmeans_tol(X, tol)
+
+    if init_centroids is not None:
+        return _lloyd_trace(X, x_sq, np.array(init_centroids, dtype=np.float64), max_iter, tol)
+
+    rng = np.random.default_rng(random_state)
+    best = None
+    for _ in range(max(1, n_init)):
+        centroids = _init_centroids(X, k, init_method, rng)
+        trace = _lloyd_trace(X, x_sq, centroids, max_iter, tol)
+        if best is None or trace['inertia'][-1] < best['inertia'][-1]:
+            best = trace
+    return best
+
+
+def _init_centroids(X, k, init_method, rng, sample_size=None):
+    """随机或K-Means++选取初始质心；给定 sample_size 时只在随机子样本上做K-Means++"""
+    if init_method == 'k-means++':
+        sample = X
+        if sample_size is not None and sample_size < len(X):
+            sample = X[rng.choice(len(X), sample_size, replace=False)]
+        centroids, _ = kmeans_plusplus(sample, k, random_state=int(rng.integers(np.iinfo(np.int32).max)))
+        return centroids
+    return X[rng.choice(len(X), k, replace=False)].copy()
+
+
+def _iter_minibatch(X, x_sq, centroids, batch_size, max_iter, frame_every, max_no_improvement, rng):
+    """小批量K-Means的迭代过程，每 frame_every 个批次产出一次全量标签和SSE（生成器）
+
+    最后一个批次（提前停止或达到最大轮数）总会产出一次，状态中的 last 为 True。
+    """
+    n_samples, n_features = X.shape
+    k = len(centroids)
+    centroids = centroids.copy()
+    label_dtype = np.int16 if k <= np.iinfo(np.int16).max else np.int32
+
+    def snapshot(n_batches, converged, last):
+        labels, min_distances = _nearest_centroids(X, x_sq, centroids)
+        return {
+            'labels': labels.astype(label_dtype),
+            'centroids': centroids.copy(),
+            'inertia': float(min_distances.sum()),
+            'batches': n_batches,
+            'n_iter': n_batches,
+            'converged': converged,
+            'last': last
+        }
+
+    counts = np.zeros(k)
+    n_steps = max(1, max_iter * n_samples // batch_size)
+    ewa_inertia = None
+    best_ewa = np.inf
+    no_improvement = 0
+    alpha = min(1.0, batch_size * 2.0 / (n_samples + 1))
+
+    for step in range(1, n_steps + 1):
+        batch = rng.integers(0, n_samples, batch_size)
+        labels, min_distances = _nearest_centroids(X[batch], x_sq[batch], centroids)
+
+        # 按簇累加本批次样本，质心向批次均值移动，步长随累计样本数递减
+        batch_counts = np.bincount(labels, minlength=k)
+        batch_sums = np.column_stack([
+            np.bincount(labels, weights=X[batch, d], minlength=k) for d in range(n_features)
+        ])
+        counts += batch_counts
+        updated = batch_counts > 0
+        centroids[updated] += (
+            batch_sums[updated] - batch_counts[updated, None] * centroids[updated]
+        ) / counts[updated, None]
+
+        # 提前停止：批次平均SSE的滑动平均不再下降
+        batch_inertia = float(min_distances.sum()) / batch_size
+        ewa_inertia = batch_inertia if ewa_inertia is None else ewa_inertia * (1 - alpha) + batch_inertia * alpha
+        if ewa_inertia < best_ewa:
+            best_ewa = ewa_inertia
+            no_improvement = 0
+        else:
+            no_improvement += 1
+        if no_improvement >= max_no_improvement:
+            yield snapshot(step, True, True)
+            return
+
+        if step % frame_every == 0 or step == n_steps:
+            yield snapshot(step, False, step == n_steps)
+
+
+def collect_frames(frame_iter):
+    """展开帧生成器，返回 (帧列表, 生成器结束时返回的指标)"""
+    frames = []
+    while True:
+        try:
+            frames.append(next(frame_iter))
+        except StopIteration as stop:
+            return frames, stop.value
+
+
+def iter_kmeans_frames(X, k=3, init_method='random', custom_centroids=None, mode='full', max_iter=100,
+                       batch_size=1024, frame_every=10):
+    """逐帧生成K-Means的模拟过程（生成器），结束时返回性能指标
+
+    全量模式每完成一轮迭代就产出一帧，不必等整个算法结束；
+    非自定义初始化需要从多次初始化中选出最优的一次，因此先完整运行再逐帧产出。
+    """
+    X = np.asarray(X, dtype=np.float64)
+
     # 如果有自定义质心，使用自定义初始化
-    if custom_centroids and len(custom_centroids) == k:
-        init_points = np.array([[c['x'], c['y']] for c in custom_centroids])
-        kmeans = KMeans(
-            n_clusters=k,
-            init=init_points,
-            n_init=1,  # 使用自定义质心时只运行一次
-            max_iter=100,
-            random_state=42
-        )
-    else:
-        # 运行K-Means
-        kmeans = KMeans(
-            n_clusters=k,
-            init=init_method,
-            n_init=10,
-            max_iter=100,
-            random_state=42
-        )
-    
-    # 模拟迭代过程
-    steps = []
-    
+    use_custom = bool(custom_centroids) and len(custom_centroids) == k
+    init_points = None
+    if use_custom:
+        init_points = np.array([[c['x'], c['y']] for c in custom_centroids], dtype=np.float64)
+
+    if mode not in KMEANS_MODES:
+        raise ValueError(f'不支持的K-Means模式: {mode}')
+    if max_iter < 1:
+        # 一轮迭代都没有时没有最终标签，无法计算指标
+        raise ValueError('max_iterations 必须为正整数')
+
+    unassigned = np.full(len(X), -1, dtype=np.int8)
     # 步骤1: 初始状态
-    steps.append({
-        'step': 1,
-        'description': '初始数据点（未分类）',
-        'points': [{'x': p['x'], 'y': p['y'], 'cluster': -1} for p in points],
-        'centroids': [],
-        'metrics': {}
+    yield make_frame('初始数据点（未分类）', unassigned, centroids=[])
+
+    # 运行真实的迭代过程，按轮产出状态
+    x_sq = np.einsum('ij,ij->i', X, X)
+    if mode == 'mini_batch':
+        batch_size = int(min(max(batch_size, 1), len(X)))
+        rng = np.random.default_rng(42)
+        if init_points is None:
+            init_points = _init_centroids(X, k, init_method, rng, sample_size=3 * batch_size)
+        states = _iter_minibatch(X, x_sq, init_points, batch_size, max_iter,
+                                 max(1, int(frame_every)), 10, rng)
+    elif use_custom:
+        states = _iter_lloyd(X, x_sq, init_points, max_iter, _kmeans_tol(X, 1e-4))
+    else:
+        trace = trace_kmeans(X, k, init_method=init_method, n_init=10, max_iter=max_iter)
+        init_points = trace['init_centroids']
+        states = _trace_states(trace)
+
+    # 步骤2: 初始质心
+    yield make_frame('使用自定义质心位置' if use_custom else '初始化质心位置',
+                     unassigned, centroids=init_points)
+
+    # 全量模式每一轮真实迭代对应一帧，小批量模式每 frame_every 个批次对应一帧
+    state = None
+    for state in states:
+        frame_metrics = {'inertia': round(state['inertia'], 4)}
+        if mode == 'mini_batch':
+            step_description = f'小批量 {state["batches"]}: 每批 {batch_size} 个样本更新质心'
+            frame_metrics['batches'] = state['batches']
+        else:
+            step_description = f'迭代 {state["n_iter"]}: 分配点到质心并更新质心位置'
+        if state['last']:
+            step_description = '收敛完成 - 算法结束' if state['converged'] else '达到最大迭代次数 - 算法结束'
+        yield make_frame(step_description, state['labels'], centroids=state['centroids'],
+                         metrics=frame_metrics)
+
+    # 计算性能指标（大数据量时轮廓系数自动改为抽样估计）
+    metrics = compute_cluster_metrics(X, state['labels'])
+    metrics.update({
+        'sse': round(state['inertia'], 2),
+        'iterations': state['n_iter']
     })
-    
-    # 如果有自定义质心，添加显示自定义质心的步骤
-    if custom_centroids and len(custom_centroids) == k:
-        steps.append({
-            'step': 2,
-            'description': '使用自定义质心位置',
-            'points': [{'x': p['x'], 'y': p['y'], 'cluster': -1} for p in points],
-            'centroids': [{'x': c['x'], 'y': c['y'], 'cluster': i} 
-                         for i, c in enumerate(custom_centroids)],
-            'metrics': {}
-        })
-    
-    kmeans.fit(X)
-    
-    # 模拟几次迭代
-    for i in range(min(5, kmeans.n_iter_)):
-        # 这里简化了实际的K-Means迭代过程
-        # 实际项目中应该实现完整的迭代跟踪
-        step_description = f'迭代 {i + 1}: 分配点到质心并更新质心位置'
-        if i == kmeans.n_iter_ - 1:
-            step_description = '收敛完成 - 算法结束'
-            
-        steps.append({
-            'step': len(steps) + 1,
-            'description': step_description,
-            'points': [{'x': p['x'], 'y': p['y'], 'cluster': int(l)} 
-                      for p, l in zip(points, kmeans.labels_)],
-            'centroids': [{'x': float(c[0]), 'y': float(c[1]), 'cluster': i} 
-                         for i, c in enumerate(kmeans.cluster_centers_)],
-            'metrics': {
-                'inertia': float(kmeans.inertia_)
-            }
+    if mode == 'mini_batch':
+        metrics.update({
+            'mode': mode,
+            'batch_size': batch_size
         })
-    
-    # 计算性能指标
-    silhouette = silhouette_score(X, kmeans.labels_)
-    
+    return metrics
+
+
+def simulate_kmeans(points, k=3, init_method='random', custom_centroids=None, response_format='dict',
+                    frame_encoding='full', mode='full', max_iter=100, batch_size=1024, frame_every=10):
+    """模拟K-Means算法（points 为坐标数组或点字典列表）
+
+    mode='mini_batch' 时使用小批量K-Means，每 frame_every 个批次输出一帧，适合大数据量演示。
+    """
+    X, _ = _as_arrays(points)
+    frames, metrics = collect_frames(iter_kmeans_frames(
+        X, k, init_method, custom_centroids, mode, max_iter, batch_size, frame_every
+    ))
+    return build_payload(X, frames, metrics, response_format=response_format,
+                         frame_encoding=frame_encoding)
+
+
+def _add_centroid(X, x_sq, centroids, rng):
+    """贪心K-Means++：按到现有质心距离的平方抽取若干候选，保留使总距离下降最多的一个作为新质心"""
+    _, min_sq = _nearest_centroids(X, x_sq, centroids)
+    n_trials = 2 + int(np.log(len(centroids) + 1))
+    total = float(min_sq.sum())
+    if total <= 0:
+        candidates = rng.choice(len(X), n_trials)
+    else:
+        candidates = rng.choice(len(X), n_trials, p=min_sq / total)
+    candidate_sq = np.maximum(
+        x_sq[:, None] - 2 * (X @ X[candidates].T) + x_sq[candidates][None, :], 0
+    )
+    potentials = np.minimum(min_sq[:, None], candidate_sq).sum(axis=0)
+    new_centroid = X[candidates[int(potentials.argmin())]].astype(np.float64)
+    return np.vstack([centroids, new_centroid])
+
+
+def _fit_lloyd(X, x_sq, centroids, max_iter, tol, assign):
+    # 只需要最终结果时，丢弃中间轮次的状态
+    state = None
+    for state in _iter_lloyd(X, x_sq, centroids, max_iter, tol, assign):
+        pass
+    return state
+
+
+def sweep_kmeans(X, k_max, k_min=1, n_init=3, max_iter=100, tol=1e-4, random_state=42, max_workers=None):
+    """在同一份数据上对 K=k_min..k_max 批量运行K-Means，返回SSE和质量指标随K变化的曲线
+
+    各个K共用预先算好的中心化数据、点的范数和 float32 副本（分配步骤用 float32 距离）。
+    每个K有两类候选：一是在线程池中并行运行的 n_init 次K-Means++冷启动，
+    二是在当前线程中顺序运行的热启动链（K 的初始质心为 K-1 的结果再贪心补一个质心）；
+    每个K取SSE最小的候选，最后用 compare_labelings 一次算出各K的质量指标（轮廓系数共用一遍分块距离计算）。
+    """
+    X = np.asarray(X, dtype=np.float64)
+    k_min, k_max = int(k_min), int(k_max)
+    if not 1 <= k_min <= k_max <= len(X):
+        raise ValueError('K的范围无效：需要 1 ≤ k_min ≤ k_max ≤ 数据点数')
+
+    # 中心化后 float32 的距离展开式 ||x||² - 2x·c + ||c||² 误差更小，SSE不受平移影响
+    mean = X.mean(axis=0)
+    Xc = X - mean
+    x_sq = np.einsum('ij,ij->i', Xc, Xc)
+    X32 = Xc.astype(np.float32)
+    assign = (X32, np.einsum('ij,ij->i', X32, X32))
+    tol = _kmeans_tol(X, tol)
+    k_values = list(range(k_min, k_max + 1))
+    seeds = np.random.SeedSequence(random_state).spawn(len(k_values) + 1)
+
+    def cold_fit(k, seed):
+        rng = np.random.default_rng(seed)
+        best = None
+        for _ in range(max(1, int(n_init))):
+            state = _fit_lloyd(Xc, x_sq, _init_centroids(Xc, k, 'k-means++', rng), max_iter, tol, assign)
+            if best is None or state['inertia'] < best['inertia']:
+                best = state
+        return best
+
+    with ThreadPoolExecutor(max_workers=max_workers or Config.KMEANS_SWEEP_WORKERS) as pool:
+        cold = {k: pool.submit(cold_fit, k, seed) for k, seed in zip(k_values, seeds)}
+
+        # 热启动链：每个K只需在上一个K的基础上少量迭代
+        chain_rng = np.random.default_rng(seeds[-1])
+        warm = {}
+        centroids = _init_centroids(Xc, k_min, 'k-means++', chain_rng)
+        for k in k_values:
+            if len(centroids) < k:
+                centroids = _add_centroid(X32, assign[1], centroids, chain_rng)
+            warm[k] = _fit_lloyd(Xc, x_sq, centroids, max_iter, tol, assign)
+            centroids = warm[k]['centroids']
+
+        fits = {}
+        for k in k_values:
+            cold_state = cold[k].result()
+            use_warm = warm[k]['inertia'] <= cold_state['inertia']
+            fits[k] = (warm[k] if use_warm else cold_state, use_warm)
+
+    # 各K的标签一起评分（大数据量时各K使用同一批抽样点估计轮廓系数）
+    rows = compare_labelings(X, [fits[k][0]['labels'] for k in k_values])
+    metrics = dict(zip(k_values, rows))
+
+    inertia = [round(fits[k][0]['inertia'], 4) for k in k_values]
+    silhouette = [metrics[k]['silhouette'] for k in k_values]
+    elbow = find_knee(k_values, inertia)
+    scored = [(s, k) for k, s in zip(k_values, silhouette) if s != 'N/A']
     return {
-        'steps': steps,
-        'metrics': {
-            'silhouette': round(silhouette, 4),
-            'sse': round(kmeans.inertia_, 2),
-            'iterations': kmeans.n_iter_
+        'k_values': k_values,
+        'inertia': inertia,
+        'silhouette': silhouette,
+        'calinski_harabasz': [metrics[k]['calinski_harabasz'] for k in k_values],
+        'davies_bouldin': [metrics[k]['davies_bouldin'] for k in k_values],
+        'silhouette_mode': [metrics[k]['silhouette_mode'] for k in k_values],
+        'iterations': [fits[k][0]['n_iter'] for k in k_values],
+        'warm_start': [fits[k][1] for k in k_values],
+        'centroids': [format_centroids(fits[k][0]['centroids'] + mean) for k in k_values],
+        'suggested_k': {
+            'elbow': None if elbow is None else k_values[elbow],
+            'silhouette': max(scored)[1] if scored else None
         }
     }
 
-def simulate_dbscan(points, epsilon=0.5, min_samples=5):
-    """模拟DBSCAN算法"""
-    X = np.array([[p['x'], p['y']] for p in points])
-    
-    # 标准化数据
-    X_scaled = StandardScaler().fit_transform(X)
-    
-    # 运行DBSCAN
-    dbscan = DBSCAN(eps=epsilon, min_samples=min_samples)
-    labels = dbscan.fit_predict(X_scaled)
-    
-    # 模拟DBSCAN的执行步骤
-    steps = []
-    
+
+def _iter_dbscan_expansion(radius_graph, core_mask):
+    """在预先算好的ε邻域图（CSR）上按广度优先扩展簇（生成器），每完成一轮扩展产出一次状态
+
+    每个未归类的核心点（按下标顺序）开启一个新簇；每轮扩展对当前波前的全部核心点一次性
+    取出邻接行，把尚未归类的邻居加入该簇，其中的核心点组成下一轮的波前。
+    边界点归属于最先到达它的簇，与sklearn的DBSCAN结果完全一致。
+    状态中的 labels 为同一个数组（原地更新），需要保留时由调用方复制。
+    """
+    n = len(core_mask)
+    labels = np.full(n, -1, dtype=np.int16 if n <= np.iinfo(np.int16).max else np.int32)
+    cluster = -1
+    for seed in np.flatnonzero(core_mask):
+        if labels[seed] != -1:
+            continue
+        cluster += 1
+        labels[seed] = cluster
+        frontier = np.array([seed])
+        size, wave = 1, 0
+        while len(frontier):
+            wave += 1
+            neighbors = radius_graph[frontier].indices
+            new_points = np.unique(neighbors[labels[neighbors] == -1])
+            labels[new_points] = cluster
+            size += len(new_points)
+            frontier = new_points[core_mask[new_points]]
+            yield {
+                'labels': labels,
+                'cluster': cluster,
+                'wave': wave,
+                'cluster_size': size,
+                'finished': len(frontier) == 0
+            }
+
+
+def iter_dbscan_frames(X, epsilon=0.5, min_samples=5, dataset_key=None, mode='result', frame_every=1,
+                       geometry=None):
+    """逐帧生成DBSCAN的模拟过程（生成器），结束时返回性能指标
+
+    mode='result' 时只展示核心点和最终结果：数据量不超过 DBSCAN_DENSITY_MAX_POINTS 时，
+    使用按 (dataset_key, min_samples) 缓存的密度结构直接提取标签，同一数据集上调整 ε 不需要重新拟合；
+    超过该点数时直接在标准化坐标上运行sklearn的DBSCAN。
+    mode='expansion' 时在邻域图上逐轮展示簇的扩展过程：每个簇扩展完成时输出一帧，
+    frame_every > 0 时每 frame_every 轮扩展也输出一帧，总帧数不超过 DBSCAN_TRACE_MAX_FRAMES。
+    KD树、k近邻和邻域图都取自 geometry（标准化坐标上的几何结构缓存，实验会话中保留的），
+    为空时在本次调用内新建；密度结构也保留在其中。
+    """
+    X = np.asarray(X, dtype=np.float64)
+
     # 步骤1: 初始状态
-    steps.append({
-        'step': 1,
-        'description': '初始数据点（未分类）',
-        'points': [{'x': p['x'], 'y': p['y'], 'cluster': -1} for p in points],
-        'metrics': {}
-    })
-    
+    yield make_frame('初始数据点（未分类）', np.full(len(X), -1, dtype=np.int8))
+
+    # 标准化数据
+    geometry = geometry or GeometryCache(StandardScaler().fit_transform(X))
+    X_scaled = geometry.X
+
+    if mode == 'expansion':
+        labels, core_points_mask = yield from _iter_dbscan_expansion_frames(
+            geometry, epsilon, min_samples, frame_every)
+        return _dbscan_metrics(X_scaled, labels)
+
+    if len(X) <= Config.DBSCAN_DENSITY_MAX_POINTS:
+        # 密度结构与 ε 无关，命中缓存时线性时间即可得到任意 ε 的结果
+        density_index = geometry.memo(f'density_index:{int(min_samples)}', lambda: get_density_index(
+            X_scaled, min_samples, dataset_key, geometry))
+        labels, core_points_mask = dbscan_from_index(density_index, epsilon)
+    else:
+        # 直接在坐标上拟合：sklearn 用KD树查询邻域，比在带距离的稀疏邻域图上 metric='precomputed'
+        # 拟合快数倍，也不必保留整张邻域图；核心点取自 core_sample_indices_
+        dbscan = DBSCAN(eps=epsilon, min_samples=min_samples).fit(X_scaled)
+        labels = dbscan.labels_
+        core_points_mask = np.zeros(len(X), dtype=bool)
+        core_points_mask[dbscan.core_sample_indices_] = True
+    noise_mask = labels == -1
+    border_mask = ~core_points_mask & ~noise_mask
+    n_clusters = int(labels.max()) + 1 if len(labels) else 0
+    n_noise = int(noise_mask.sum())
+
     # 步骤2: 识别核心点
-    core_points_mask = np.zeros(len(points), dtype=bool)
-    for i in range(len(points)):
-        distances = np.sqrt(np.sum((X_scaled - X_scaled[i])**2, axis=1))
-        neighbors_count = np.sum(distances <= epsilon)
-        core_points_mask[i] = neighbors_count >= min_samples
-    
-    steps.append({
-        'step': 2,
-        'description': '识别核心点（红色标记）',
-        'points': [{
-            'x': p['x'], 
-            'y': p['y'], 
-            'cluster': 0 if core_points_mask[i] else -1
-        } for i, p in enumerate(points)],
-        'metrics': {
-            'core_points': int(np.sum(core_points_mask))
-        }
+    yield make_frame('识别核心点（红色标记）', np.where(core_points_mask, 0, -1), metrics={
+        'core_points': int(core_points_mask.sum()),
+        'border_points': int(border_mask.sum()),
+        'noise_points': n_noise
     })
-    
     # 步骤3: 聚类结果
-    clustered_points = []
-    for i, point in enumerate(points):
-        clustered_points.append({
-            'x': point['x'],
-            'y': point['y'],
-            'cluster': int(labels[i]),
-            'originalCluster': point.get('originalCluster', -1)
-        })
-    
-    steps.append({
-        'step': 3,
-        'description': 'DBSCAN聚类完成',
-        'points': clustered_points,
-        'metrics': {
-            'clusters': len(set(labels)) - (1 if -1 in labels else 0),
-            'noise_points': list(labels).count(-1)
-        }
+    yield make_frame('DBSCAN聚类完成', labels, original=True, metrics={
+        'clusters': n_clusters,
+        'noise_points': n_noise
+    })
+    return _dbscan_metrics(X_scaled, labels)
+
+
+def _iter_dbscan_expansion_frames(geometry, epsilon, min_samples, frame_every):
+    # 扩展过程的各帧（核心点、逐轮扩展、最终结果），结束时返回 (标签, 核心点掩码)
+    # 一次半径查询得到邻域图，核心点识别和逐轮扩展共用
+    radius_graph = geometry.radius_graph(epsilon)
+    core_points_mask = np.diff(radius_graph.indptr) >= min_samples
+    yield make_frame('识别核心点（红色标记）', np.where(core_points_mask, 0, -1), metrics={
+        'core_points': int(core_points_mask.sum())
+    })
+
+    # 最终帧之外还要留出核心点一帧和初始一帧
+    budget = max(0, Config.DBSCAN_TRACE_MAX_FRAMES - 3)
+    labels = np.full(len(geometry), -1, dtype=np.int8)
+    for state in _iter_dbscan_expansion(radius_graph, core_points_mask):
+        labels = state['labels']
+        periodic = frame_every > 0 and state['wave'] % frame_every == 0
+        if budget and (state['finished'] or periodic):
+            budget -= 1
+            cluster = state['cluster']
+            if state['finished']:
+                step_description = f'簇 {cluster} 扩展完成（{state["cluster_size"]} 个点）'
+            else:
+                step_description = f'扩展簇 {cluster}：第 {state["wave"]} 轮（已加入 {state["cluster_size"]} 个点）'
+            yield make_frame(step_description, labels.copy(), metrics={
+                'clusters': cluster + 1,
+                'cluster_size': state['cluster_size'],
+                'assigned_points': int((labels >= 0).sum())
+            })
+
+    n_noise = int((labels == -1).sum())
+    yield make_frame('剩余未归类的点标记为噪声 - DBSCAN聚类完成', labels, original=True, metrics={
+        'clusters': int(labels.max()) + 1 if len(labels) else 0,
+        'noise_points': n_noise
     })
-    
-    # 计算性能指标
-    if len(set(labels)) > 1:
-        silhouette = silhouette_score(X_scaled, labels)
+    return labels, core_points_mask
+
+
+def _dbscan_metrics(X_scaled, labels):
+    """DBSCAN的性能指标（大数据量时轮廓系数自动改为抽样估计）"""
+    metrics = compute_cluster_metrics(X_scaled, labels)
+    metrics.update({
+        'clusters': int(labels.max()) + 1 if len(labels) else 0,
+        'noise_points': int((labels == -1).sum())
+    })
+    return metrics
+
+
+def simulate_dbscan(points, epsilon=0.5, min_samples=5, response_format='dict', frame_encoding='full',
+                    original_clusters=None):
+    """模拟DBSCAN算法（points 为坐标数组或点字典列表）"""
+    X, original_clusters = _as_arrays(points, original_clusters)
+    frames, metrics = collect_frames(iter_dbscan_frames(X, epsilon, min_samples))
+    return build_payload(X, frames, metrics, original_clusters, response_format, frame_encoding)
+
+def _gmm_m_step(X, resp, covariance_type, reg_covar):
+    """EM的M步：由责任度估计权重、均值和协方差（统一返回 (k, d, d) 的完整协方差矩阵）"""
+    n_samples, n_features = X.shape
+    nk = resp.sum(axis=0) + 10 * np.finfo(resp.dtype).eps
+    means = (resp.T @ X) / nk[:, None]
+    eye = np.eye(n_features)
+
+    if covariance_type == 'full':
+        diff = X[:, None, :] - means[None, :, :]
+        covariances = np.einsum('nk,nkd,nke->kde', resp, diff, diff) / nk[:, None, None]
+        covariances += reg_covar * eye
+    elif covariance_type == 'tied':
+        avg_X2 = X.T @ X
+        avg_means2 = (nk * means.T) @ means
+        tied = (avg_X2 - avg_means2) / nk.sum() + reg_covar * eye
+        covariances = np.broadcast_to(tied, (len(nk), n_features, n_features)).copy()
+    elif covariance_type in ('diag', 'spherical'):
+        avg_X2 = (resp.T @ (X * X)) / nk[:, None]
+        variances = avg_X2 - means ** 2 + reg_covar
+        if covariance_type == 'spherical':
+            variances = np.repeat(variances.mean(axis=1, keepdims=True), n_features, axis=1)
+        covariances = variances[:, :, None] * eye
     else:
-        silhouette = -1
-    
+        raise ValueError(f'不支持的协方差类型: {covariance_type}')
+
+    return nk / n_samples, means, covariances
+
+
+def _gmm_e_step(X, weights, means, covariances):
+    """EM的E步：返回每个点的平均对数似然和对数责任度"""
+    n_features = X.shape[1]
+    # 对所有分量一次性做Cholesky分解，马氏距离通过三角矩阵的逆批量计算
+    chol = np.linalg.cholesky(covariances)
+    chol_inv = np.linalg.inv(chol)
+    log_det = 2 * np.log(np.diagonal(chol, axis1=1, axis2=2)).sum(axis=1)
+    diff = X[:, None, :] - means[None, :, :]
+    z = np.einsum('kde,nke->nkd', chol_inv, diff)
+    mahalanobis = np.einsum('nkd,nkd->nk', z, z)
+
+    weighted_log_prob = -0.5 * (n_features * np.log(2 * np.pi) + log_det + mahalanobis) + np.log(weights)
+    log_prob_norm = logsumexp(weighted_log_prob, axis=1)
+    log_resp = weighted_log_prob - log_prob_norm[:, None]
+    return float(log_prob_norm.mean()), log_resp
+
+
+def _gmm_n_parameters(n_components, n_features, covariance_type):
+    """GMM的自由参数个数，用于计算BIC/AIC"""
+    if covariance_type == 'full':
+        cov_params = n_components * n_features * (n_features + 1) / 2.
+    elif covariance_type == 'tied':
+        cov_params = n_features * (n_features + 1) / 2.
+    elif covariance_type == 'diag':
+        cov_params = n_components * n_features
+    else:
+        cov_params = n_components
+    return int(cov_params + n_components * n_features + n_components - 1)
+
+
+def _gmm_information_criteria(lower_bound, n_samples, n_parameters):
+    """由每点平均对数似然计算 (BIC, AIC)"""
+    log_likelihood = lower_bound * n_samples
+    bic = -2 * log_likelihood + n_parameters * np.log(n_samples)
+    aic = -2 * log_likelihood + 2 * n_parameters
+    return bic, aic
+
+
+def _gmm_init_labels(X, n_components, random_state):
+    """GMM初始化用的K-Means标签，与协方差类型无关"""
+    return trace_kmeans(X, n_components, 'k-means++', max_iter=100,
+                        random_state=random_state)['labels'][-1]
+
+
+def _gmm_init(X, n_components, covariance_type, reg_covar, random_state, init_labels=None):
+    """与sklearn相同，用一次K-Means的标签作为硬责任度，再做一次M步得到初始参数"""
+    if init_labels is None:
+        init_labels = _gmm_init_labels(X, n_components, random_state)
+    resp = np.zeros((len(X), n_components))
+    resp[np.arange(len(X)), init_labels] = 1
+    return _gmm_m_step(X, resp, covariance_type, reg_covar)
+
+
+def _iter_em(X, weights, means, covariances, covariance_type, max_iter, tol, reg_covar):
+    """从给定初始参数运行EM，每完成一轮就产出该轮更新后的参数、标签和概率（生成器）
+
+    每个状态的 log_resp 为该轮的对数责任度，只在需要完整责任度时使用。
+    与sklearn相同，收敛判断的上一轮下界从 -inf 开始，第一轮EM不会被判为收敛。
+    """
+    n_components = len(weights)
+    label_dtype = np.int16 if n_components <= np.iinfo(np.int16).max else np.int32
+    _, log_resp = _gmm_e_step(X, weights, means, covariances)
+    lower_bound = -np.inf
+    for i in range(max_iter):
+        prev_lower_bound = lower_bound
+        weights, means, covariances = _gmm_m_step(X, np.exp(log_resp), covariance_type, reg_covar)
+        # 这一轮的E步同时给出新参数下的标签，也是下一轮M步的输入
+        lower_bound, log_resp = _gmm_e_step(X, weights, means, covariances)
+
+        converged = abs(lower_bound - prev_lower_bound) < tol
+        yield {
+            'means': means,
+            'covariances': covariances,
+            'weights': weights,
+            'labels': log_resp.argmax(axis=1).astype(label_dtype),
+            'probabilities': np.exp(log_resp.max(axis=1)).astype(np.float32),
+            'lower_bound': lower_bound,
+            'log_resp': log_resp,
+            'n_iter': i + 1,
+            'converged': converged,
+            'last': converged or i + 1 == max_iter
+        }
+        if converged:
+            break
+
+
+def iter_gmm_frames(X, n_components=3, covariance_type='full', max_iter=100, tol=1e-3):
+    """逐帧生成GMM的模拟过程（生成器），每完成一轮EM就产出一帧，结束时返回性能指标"""
+    if max_iter < 1:
+        # 一轮EM都没有时没有最终标签，无法计算指标
+        raise ValueError('max_iterations 必须为正整数')
+    X = np.asarray(X, dtype=np.float64)
+    unassigned = np.full(len(X), -1, dtype=np.int8)
+    zero_probability = np.zeros(len(X), dtype=np.int8)
+
+    # 步骤1: 初始状态
+    yield make_frame('初始数据点（未分类）', unassigned, centroids=[], probability=zero_probability)
+
+    # 步骤2: 初始化参数
+    reg_covar = 1e-6
+    weights, means, covariances = _gmm_init(X, n_components, covariance_type, reg_covar, 42)
+    yield make_frame('初始化高斯分布参数', unassigned, centroids=means, probability=zero_probability)
+
+    # EM算法迭代：每一轮真实迭代对应一帧
+    state = None
+    for state in _iter_em(X, weights, means, covariances, covariance_type, max_iter, tol, reg_covar):
+        step_description = f'EM迭代 {state["n_iter"]}: 更新高斯分布参数'
+        if state['last']:
+            step_description = '收敛完成 - 算法结束' if state['converged'] else '达到最大迭代次数 - 算法结束'
+        yield make_frame(
+            step_description,
+            state['labels'],
+            centroids=state['means'],
+            probability=state['probabilities'].astype(np.float64).round(6),
+            original=True,
+            metrics={'log_likelihood': float(state['lower_bound'])}
+        )
+
+    # 计算性能指标（大数据量时轮廓系数自动改为抽样估计）
+    metrics = compute_cluster_metrics(X, state['labels'])
+    n_parameters = _gmm_n_parameters(n_components, X.shape[1], covariance_type)
+    bic, aic = _gmm_information_criteria(state['lower_bound'], len(X), n_parameters)
+
+    metrics.update({
+        'bic': round(float(bic), 2),
+        'aic': round(float(aic), 2),
+        'iterations': state['n_iter'],
+        'converged': state['converged']
+    })
+    return metrics
+
+
+def simulate_gmm(points, n_components=3, covariance_type='full', max_iter=100, tol=1e-3,
+                 response_format='dict', frame_encoding='full', original_clusters=None):
+    """模拟高斯混合模型(GMM)算法（points 为坐标数组或点字典列表）"""
+    X, original_clusters = _as_arrays(points, original_clusters)
+    frames, metrics = collect_frames(iter_gmm_frames(X, n_components, covariance_type, max_iter, tol))
+    return build_payload(X, frames, metrics, original_clusters, response_format, frame_encoding)
+
+# GMM支持的协方差类型
+GMM_COVARIANCE_TYPES = ('full', 'tied', 'diag', 'spherical')
+
+# 模型选择的准则
+GMM_CRITERIA = ('bic', 'aic')
+
+
+def sweep_gmm(X, n_components_values, covariance_types=GMM_COVARIANCE_TYPES, criterion='bic',
+              max_iter=100, tol=1e-3, reg_covar=1e-6, random_state=42, max_workers=None):
+    """在同一份数据上对 (分量数, 协方差类型) 网格批量拟合GMM，返回BIC/AIC曲面和最优模型的参数
+
+    初始化用的K-Means标签只与分量数有关，每个分量数只计算一次，由各协方差类型共用
+    （与 simulate_gmm 的初始化相同，网格中每个单元的结果与单独模拟一致）。
+    K-Means和EM拟合都在线程池中并行运行；协方差矩阵奇异导致拟合失败的单元记为 None。
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n_components_values = sorted({int(k) for k in n_components_values})
+    covariance_types = list(dict.fromkeys(covariance_types))
+    if not n_components_values or not 1 <= n_components_values[0] <= n_components_values[-1] <= len(X):
+        raise ValueError('分量数的范围无效：需要 1 ≤ 分量数 ≤ 数据点数')
+    for covariance_type in covariance_types:
+        if covariance_type not in GMM_COVARIANCE_TYPES:
+            raise ValueError(f'不支持的协方差类型: {covariance_type}')
+    if criterion not in GMM_CRITERIA:
+        raise ValueError(f'不支持的模型选择准则: {criterion}')
+
+    def fit(init_future, n_components, covariance_type):
+        try:
+            weights, means, covariances = _gmm_init(X, n_components, covariance_type, reg_covar,
+                                                    random_state, init_labels=init_future.result())
+            state = None
+            for state in _iter_em(X, weights, means, covariances, covariance_type, max_iter, tol, reg_covar):
+                state.pop('log_resp')
+        except np.linalg.LinAlgError:
+            return None
+        n_parameters = _gmm_n_parameters(n_components, X.shape[1], covariance_type)
+        bic, aic = _gmm_information_criteria(state['lower_bound'], len(X), n_parameters)
+        state.update({'bic': float(bic), 'aic': float(aic)})
+        return state
+
+    with ThreadPoolExecutor(max_workers=max_workers or Config.GMM_SWEEP_WORKERS) as pool:
+        init_futures = {k: pool.submit(_gmm_init_labels, X, k, random_state) for k in n_components_values}
+        fit_futures = {
+            (k, covariance_type): pool.submit(fit, init_futures[k], k, covariance_type)
+            for k in n_components_values for covariance_type in covariance_types
+        }
+        fits = {cell: future.result() for cell, future in fit_futures.items()}
+
+    def surface(key, digits=2):
+        return {
+            covariance_type: [
+                None if fits[k, covariance_type] is None else round(fits[k, covariance_type][key], digits)
+                for k in n_components_values
+            ]
+            for covariance_type in covariance_types
+        }
+
+    valid = [cell for cell, state in fits.items() if state is not None]
+    if not valid:
+        raise ValueError('所有模型都拟合失败')
+    best_k, best_type = min(valid, key=lambda cell: fits[cell][criterion])
+    best = fits[best_k, best_type]
     return {
-        'steps': steps,
-        'metrics': {
-            'silhouette': round(silhouette, 4) if silhouette != -1 else 'N/A',
-            'clusters': len(set(labels)) - (1 if -1 in labels else 0),
-            'noise_points': list(labels).count(-1)
+        'n_components': n_components_values,
+        'covariance_types': covariance_types,
+        'criterion': criterion,
+        'bic': surface('bic'),
+        'aic': surface('aic'),
+        'log_likelihood': surface('lower_bound', 6),
+        'iterations': surface('n_iter', 0),
+        'converged': {
+            covariance_type: [None if fits[k, covariance_type] is None else fits[k, covariance_type]['converged']
+                              for k in n_components_values]
+            for covariance_type in covariance_types
+        },
+        'best': {
+            'n_components': best_k,
+            'covariance_type': best_type,
+            'bic': round(best['bic'], 2),
+            'aic': round(best['aic'], 2),
+            'weights': best['weights'].round(6).tolist(),
+            'means': format_centroids(best['means']),
+            'covariances': best['covariances'].round(6).tolist()
         }
     }
 
-def simulate_gmm(points, n_components=3, covariance_type='full', max_iter=100, tol=1e-3):
-    """模拟高斯混合模型(GMM)算法"""
-    X = np.array([[p['x'], p['y']] for p in points])
-    
-    # 运行GMM
-    gmm = GaussianMixture(
-        n_components=n_components,
-        covariance_type=covariance_type,
-        max_iter=max_iter,
-        tol=tol,
-        random_state=42
-    )
-    gmm.fit(X)
-    labels = gmm.predict(X)
-    probabilities = gmm.predict_proba(X)
-    
-    # 模拟GMM的执行步骤
-    steps = []
-    
+
+# 层次聚类支持的链接方式
+AGGLOMERATIVE_LINKAGES = ('ward', 'complete', 'average', 'single')
+
+# 层次聚类动画最多展示的切割层级数（其余层级由客户端按合并表自行切割）
+AGGLOMERATIVE_MAX_FRAMES = 6
+
+
+def trace_agglomerative(X, linkage_method='ward', geometry=None):
+    """凝聚式层次聚类：一次计算出完整的合并表（scipy的linkage矩阵）
+
+    只计算一次压缩形式的点对距离（n(n-1)/2 个浮点数），ward/complete/average 使用最近邻链算法，
+    single 使用最小生成树，都不需要完整的 n×n 距离矩阵；同时返回共表相关系数衡量树状图对原始距离的保持程度。
+    点对距离取自 geometry（X 上的几何结构缓存），同一会话中换用其它链接方式时不再重新计算。
+    """
+    if linkage_method not in AGGLOMERATIVE_LINKAGES:
+        raise ValueError(f'不支持的链接方式: {linkage_method}')
+    geometry = geometry or GeometryCache(X)
+    distances = geometry.pdist()
+    Z = linkage(distances, method=linkage_method)
+    return Z, _cophenetic_correlation(Z, distances)
+
+
+def _cophenetic_correlation(Z, distances):
+    """共表相关系数：用点积直接计算皮尔逊相关，避免生成多份 n(n-1)/2 大小的临时数组"""
+    if len(distances) < 2:
+        return 1.0
+    tree_distances = cophenet(Z)
+    m = len(distances)
+    mean_a, mean_b = distances.mean(), tree_distances.mean()
+    cov = np.dot(distances, tree_distances) / m - mean_a * mean_b
+    var_a = np.dot(distances, distances) / m - mean_a ** 2
+    var_b = np.dot(tree_distances, tree_distances) / m - mean_b ** 2
+    if var_a <= 0 or var_b <= 0:
+        return 1.0
+    return float(cov / np.sqrt(var_a * var_b))
+
+
+def cut_dendrogram(Z, n_clusters):
+    """执行合并表的前 n - n_clusters 次合并，恰好得到 n_clusters 个簇（合并距离相同时也不会少）
+
+    簇按其中最小的点下标编号，与客户端按合并表还原的结果一致。
+    """
+    n = len(Z) + 1
+    n_merges = n - int(min(max(n_clusters, 1), n))
+    # 第 i 次合并把 left、right 两个节点连到新节点 n + i，切割结果即为前几次合并构成的连通分量
+    merged = np.arange(n, n + n_merges)
+    rows = np.concatenate([Z[:n_merges, 0], Z[:n_merges, 1]]).astype(np.int64)
+    cols = np.concatenate([merged, merged])
+    graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(2 * n - 1, 2 * n - 1))
+    _, components = connected_components(graph, directed=False)
+    _, first, inverse = np.unique(components[:n], return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+    return rank[inverse]
+
+
+def _agglomerative_levels(n_points, n_clusters):
+    """动画中展示的簇数：从 n_clusters 开始每次翻倍，最多展示 AGGLOMERATIVE_MAX_FRAMES 个层级"""
+    levels = [n_clusters]
+    while levels[-1] * 2 < n_points and len(levels) < AGGLOMERATIVE_MAX_FRAMES:
+        levels.append(levels[-1] * 2)
+    return levels[::-1]
+
+
+def iter_agglomerative_frames(X, n_clusters=3, linkage_method='ward', geometry=None):
+    """逐帧生成层次聚类的模拟过程（生成器），结束时返回性能指标
+
+    合并表只在第二帧附带一次；之后只展示少数几个切割层级（簇数逐级减半），
+    而不是每次合并一帧，任意层级的切割都可以由客户端根据合并表完成。
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n = len(X)
+    n_clusters = int(min(max(int(n_clusters), 1), n))
+
     # 步骤1: 初始状态
-    steps.append({
-        'step': 1,
-        'description': '初始数据点（未分类）',
-        'points': [{'x': p['x'], 'y': p['y'], 'cluster': -1, 'probability': 0} for p in points],
-        'centroids': [],
-        'metrics': {}
+    yield make_frame('初始数据点（未分类）', np.full(n, -1, dtype=np.int8))
+
+    Z, cophenetic = trace_agglomerative(X, linkage_method, geometry)
+    dendrogram = {
+        'left': Z[:, 0].astype(np.int64),
+        'right': Z[:, 1].astype(np.int64),
+        'distance': Z[:, 2],
+        'size': Z[:, 3].astype(np.int64),
+        'leaves': leaves_list(Z)
+    }
+
+    levels = _agglomerative_levels(n, n_clusters)
+    labels = None
+    for i, level in enumerate(levels):
+        labels = cut_dendrogram(Z, level)
+        # 该层级对应的合并距离：第 n - level 次合并之后、下一次合并之前
+        height = float(Z[n - level - 1, 2]) if level < n else 0.0
+        if level == n_clusters:
+            step_description = f'切割树状图得到 {n_clusters} 个簇 - 算法结束'
+        else:
+            step_description = f'合并到 {level} 个簇（合并距离 {height:.3f}）'
+        yield make_frame(
+            step_description,
+            labels,
+            original=True,
+            metrics={'n_clusters': level, 'merge_distance': round(height, 6)},
+            dendrogram=dendrogram if i == 0 else None
+        )
+
+    # 计算性能指标（大数据量时轮廓系数自动改为抽样估计）
+    metrics = compute_cluster_metrics(X, labels)
+    metrics.update({
+        'linkage': linkage_method,
+        'cophenetic_correlation': round(cophenetic, 4)
     })
-    
-    # 步骤2: 初始化参数
-    # 随机选择初始均值
-    np.random.seed(42)
-    indices = np.random.choice(len(X), n_components, replace=False)
-    initial_means = X[indices]
-    
-    steps.append({
-        'step': 2,
-        'description': '初始化高斯分布参数',
-        'points': [{'x': p['x'], 'y': p['y'], 'cluster': -1, 'probability': 0} for p in points],
-        'centroids': [{'x': float(m[0]), 'y': float(m[1]), 'cluster': i} 
-                     for i, m in enumerate(initial_means)],
-        'metrics': {}
+    return metrics
+
+
+def simulate_agglomerative(points, n_clusters=3, linkage_method='ward', response_format='dict',
+                           frame_encoding='full', original_clusters=None):
+    """模拟凝聚式层次聚类（points 为坐标数组或点字典列表）"""
+    X, original_clusters = _as_arrays(points, original_clusters)
+    frames, metrics = collect_frames(iter_agglomerative_frames(X, n_clusters, linkage_method))
+    return build_payload(X, frames, metrics, original_clusters, response_format, frame_encoding)
+
+
+# 支持模拟的算法
+SIMULATION_ALGORITHMS = ('kmeans', 'dbscan', 'gmm', 'agglomerative')
+
+# K-Means的运行模式：full 为全量Lloyd迭代，mini_batch 为小批量K-Means
+KMEANS_MODES = ('full', 'mini_batch')
+
+# K-Means的质心初始化方法（与 get_supported_centroid_methods 一致）
+KMEANS_INIT_METHODS = ('random', 'k-means++', 'custom')
+
+# DBSCAN的运行模式：result 只展示核心点和最终结果，expansion 逐轮展示簇的扩展过程
+DBSCAN_MODES = ('result', 'expansion')
+
+# 数据来源参数：实验会话和多算法对比中由所有算法共用，不能按算法单独指定
+DATASET_KEYS = ('point_count', 'data_type', 'seed', 'dataset_id')
+
+# 多算法对比的响应中，各算法结果里完全相同的这些字段只在顶层发送一次
+BATCH_SHARED_FIELDS = ('coordinates', 'original_clusters', 'original_grid', 'lod')
+
+
+def _dataset_params(data):
+    """数据来源参数：内置数据集为点数、数据类型和随机种子，上传的数据集为其ID（点数取自数据集本身）"""
+    if data.get('dataset_id'):
+        try:
+            info = get_user_dataset_info(data['dataset_id'])
+        except NotFoundException as e:
+            raise ValueError(e.message)
+        return {'dataset_id': info['id'], 'point_count': info['n_points']}
+    params = {
+        'point_count': data.get('point_count', 100),
+        'data_type': data.get('data_type', 'uniform'),
+        'seed': data.get('seed', 42)
+    }
+    # 提交异步任务或开始流式响应之前就拒绝不支持的数据类型
+    if params['data_type'] not in DATASET_SPECS:
+        raise ValueError(f'不支持的数据类型: {params["data_type"]}')
+    return params
+
+
+def _load(params, session=None):
+    # 坐标数组和原始簇标签：有实验会话时直接取会话中保留的数据集
+    return load_dataset(params) if session is None else session.arrays()
+
+
+def parse_session_params(data):
+    """实验会话的参数：只包含数据来源（之后每次模拟的算法参数随请求提交）"""
+    params = _dataset_params(data)
+    if int(params['point_count']) < 1:
+        raise ValueError('point_count 必须为正整数')
+    return params
+
+
+def _positive_int(data, key, default):
+    """取出正整数参数（补全默认值），不是正整数时抛出 ValueError"""
+    try:
+        value = int(data.get(key, default))
+    except (TypeError, ValueError):
+        raise ValueError(f'{key} 必须为正整数')
+    if value < 1:
+        raise ValueError(f'{key} 必须为正整数')
+    return value
+
+
+def _positive_float(data, key, default):
+    """取出正数参数（补全默认值），不是有限正数时抛出 ValueError"""
+    try:
+        value = float(data.get(key, default))
+    except (TypeError, ValueError):
+        raise ValueError(f'{key} 必须为正数')
+    if not 0 < value < np.inf:
+        raise ValueError(f'{key} 必须为正数')
+    return value
+
+
+def _parse_viewport(viewport):
+    """视口大小 [宽, 高]（像素），决定LOD渲染的点数或网格大小"""
+    try:
+        width, height = (int(value) for value in viewport)
+    except (TypeError, ValueError):
+        raise ValueError('viewport 必须是 [宽, 高] 两个整数')
+    if not (1 <= width <= 4096 and 1 <= height <= 4096):
+        raise ValueError('viewport 的宽和高必须在 1 到 4096 之间')
+    return [width, height]
+
+
+def frame_budget(params):
+    """帧预算（见 payload_service.apply_frame_budget）
+
+    请求没有指定任何上限时使用配置中的默认预算（SIMULATION_DEFAULT_MAX_FRAMES/MAX_BYTES），
+    默认预算也都为 0 时返回 None。
+    """
+    if params.get('max_frames') is None and params.get('max_bytes') is None:
+        budget = {'max_frames': Config.SIMULATION_DEFAULT_MAX_FRAMES or None,
+                  'max_bytes': Config.SIMULATION_DEFAULT_MAX_BYTES or None}
+        return budget if any(value is not None for value in budget.values()) else None
+    return {'max_frames': params.get('max_frames'), 'max_bytes': params.get('max_bytes')}
+
+
+def render_options(params):
+    """渲染响应体的参数（响应格式、帧编码方式和LOD选项），供 build_payload/iter_payload 使用"""
+    lod = params.get('lod', 'none')
+    return {
+        'response_format': params['response_format'],
+        'frame_encoding': params['frame_encoding'],
+        'lod': None if lod == 'none' else {'mode': lod, 'viewport': params['viewport']}
+    }
+
+
+def parse_simulation_params(algorithm, data):
+    """从请求体中取出某个算法用到的全部参数（补全默认值），结果可直接作为缓存键的一部分"""
+    if algorithm not in SIMULATION_ALGORITHMS:
+        raise ValueError('不支持的算法类型')
+
+    params = _dataset_params(data)
+    params.update({
+        # 响应格式：dict（默认，逐点字典）或 columnar（按列编码的紧凑格式）
+        'response_format': data.get('response_format', 'dict'),
+        # 帧编码方式：full（默认，每帧完整快照）或 delta（关键帧 + 稀疏差异）
+        'frame_encoding': data.get('frame_encoding', 'full'),
+        # 细节层次：auto（默认，点数超过视口容量时抽样）、none、subsample 或 grid（密度网格）
+        'lod': data.get('lod', 'auto')
     })
-    
-    # 模拟EM算法迭代
-    for i in range(min(5, gmm.n_iter_)):
-        # 这里简化了实际的EM迭代过程
-        step_description = f'EM迭代 {i + 1}: 更新高斯分布参数'
-        if i == gmm.n_iter_ - 1:
-            step_description = '收敛完成 - 算法结束'
-            
-        # 为每个点分配簇和概率
-        gmm_iter = GaussianMixture(
-            n_components=n_components,
-            covariance_type=covariance_type,
-            max_iter=i + 1,
-            tol=tol,
-            random_state=42
-        )
-        gmm_iter.fit(X)
-        labels_iter = gmm_iter.predict(X)
-        probs_iter = gmm_iter.predict_proba(X)
-        
-        step_points = []
-        for j, point in enumerate(points):
-            max_prob = np.max(probs_iter[j]) if j < len(probs_iter) else 0
-            step_points.append({
-                'x': point['x'],
-                'y': point['y'],
-                'cluster': int(labels_iter[j]) if j < len(labels_iter) else -1,
-                'probability': float(max_prob),
-                'originalCluster': point.get('originalCluster', -1)
+    if params['response_format'] not in RESPONSE_FORMATS:
+        raise ValueError(f'不支持的响应格式: {params["response_format"]}')
+    if params['frame_encoding'] not in FRAME_ENCODINGS:
+        raise ValueError(f'不支持的帧编码方式: {params["frame_encoding"]}')
+    if params['lod'] not in LOD_MODES:
+        raise ValueError(f'不支持的LOD模式: {params["lod"]}')
+    # 帧预算：最多保留的帧数和响应体的字节数（只对非流式响应生效）
+    for key, minimum in (('max_frames', 2), ('max_bytes', 1)):
+        value = data.get(key)
+        if value is not None:
+            value = int(value)
+            if value < minimum:
+                raise ValueError(f'{key} 不能小于 {minimum}')
+            params[key] = value
+    if params['lod'] != 'none':
+        params['viewport'] = _parse_viewport(data.get('viewport', [600, 600]))
+        if params['lod'] == 'grid' and params['frame_encoding'] != 'full':
+            raise ValueError('密度网格模式只支持 full 帧编码')
+
+    if algorithm == 'kmeans':
+        params.update({
+            'k_value': _positive_int(data, 'k_value', 3),
+            'centroid_method': data.get('centroid_method', 'random'),
+            'custom_centroids': data.get('custom_centroids'),  # 自定义质心
+            'mode': data.get('mode', 'full'),
+            'max_iterations': _positive_int(data, 'max_iterations', 100)
+        })
+        if params['mode'] not in KMEANS_MODES:
+            raise ValueError(f'不支持的K-Means模式: {params["mode"]}')
+        if params['centroid_method'] not in KMEANS_INIT_METHODS:
+            raise ValueError(f'不支持的质心初始化方法: {params["centroid_method"]}')
+        if params['k_value'] > int(params['point_count']):
+            raise ValueError('k_value 不能大于数据点数')
+        if params['mode'] == 'mini_batch':
+            params.update({
+                'batch_size': _positive_int(data, 'batch_size', 1024),
+                'frame_every': _positive_int(data, 'frame_every', 10)  # 每隔多少个批次输出一帧
             })
-        
-        steps.append({
-            'step': len(steps) + 1,
-            'description': step_description,
-            'points': step_points,
-            'centroids': [{'x': float(m[0]), 'y': float(m[1]), 'cluster': i} 
-                         for i, m in enumerate(gmm_iter.means_)],
-            'metrics': {
-                'log_likelihood': float(gmm_iter.lower_bound_)
-            }
+    elif algorithm == 'dbscan':
+        params.update({
+            'epsilon': _positive_float(data, 'epsilon', 0.5),
+            'min_points': _positive_int(data, 'min_points', 5),
+            'mode': data.get('mode', 'result')
         })
-    
-    # 最终结果
-    final_points = []
-    for i, point in enumerate(points):
-        max_prob = np.max(probabilities[i]) if i < len(probabilities) else 0
-        final_points.append({
-            'x': point['x'],
-            'y': point['y'],
-            'cluster': int(labels[i]),
-            'probability': float(max_prob),
-            'originalCluster': point.get('originalCluster', -1)
+        if params['mode'] not in DBSCAN_MODES:
+            raise ValueError(f'不支持的DBSCAN模式: {params["mode"]}')
+        if params['mode'] == 'expansion':
+            # 每隔多少轮扩展输出一帧，0 表示只在簇完成时输出
+            try:
+                params['frame_every'] = int(data.get('frame_every', 1))
+            except (TypeError, ValueError):
+                raise ValueError('frame_every 必须为非负整数')
+            if params['frame_every'] < 0:
+                raise ValueError('frame_every 必须为非负整数')
+    elif algorithm == 'gmm':  # 删除层次聚类，增加GMM
+        params.update({
+            'k_value': _positive_int(data, 'k_value', 3),
+            'covariance_type': data.get('covariance_type', 'full'),
+            'max_iterations': _positive_int(data, 'max_iterations', 100),
+            'tolerance': _positive_float(data, 'tolerance', 0.001)
         })
-    
-    # 计算性能指标
-    silhouette = silhouette_score(X, labels)
-    bic = gmm.bic(X)
-    aic = gmm.aic(X)
-    
-    return {
-        'steps': steps,
-        'metrics': {
-            'silhouette': round(silhouette, 4),
-            'bic': round(bic, 2),
-            'aic': round(aic, 2),
-            'iterations': gmm.n_iter_,
-            'converged': gmm.converged_
-        }
-    }
+        if params['covariance_type'] not in GMM_COVARIANCE_TYPES:
+            raise ValueError(f'不支持的协方差类型: {params["covariance_type"]}')
+        if params['k_value'] > int(params['point_count']):
+            raise ValueError('k_value 不能大于数据点数')
+    elif algorithm == 'agglomerative':
+        params.update({
+            'n_clusters': int(data.get('n_clusters', 3)),
+            'linkage_method': data.get('linkage_method', 'ward')
+        })
+        if params['linkage_method'] not in AGGLOMERATIVE_LINKAGES:
+            raise ValueError(f'不支持的链接方式: {params["linkage_method"]}')
+        if params['n_clusters'] < 1:
+            raise ValueError('n_clusters 必须为正整数')
+        if int(params['point_count']) > Config.AGGLOMERATIVE_MAX_POINTS:
+            raise ValueError(f'层次聚类的数据点数不能超过 {Config.AGGLOMERATIVE_MAX_POINTS}')
+    return params
+
+
+def parse_sweep_params(data):
+    """K值扫描的参数（补全默认值），结果可直接作为缓存键的一部分"""
+    params = _dataset_params(data)
+    params.update({
+        'k_min': int(data.get('k_min', 1)),
+        'k_max': int(data.get('k_max', 10)),
+        'n_init': int(data.get('n_init', 3)),
+        'max_iterations': int(data.get('max_iterations', 100))
+    })
+    if params['k_max'] > Config.KMEANS_SWEEP_MAX_K:
+        raise ValueError(f'K值扫描的上限不能超过 {Config.KMEANS_SWEEP_MAX_K}')
+    if int(params['point_count']) > Config.SIMULATION_SYNC_MAX_POINTS:
+        raise ValueError(f'K值扫描的数据点数不能超过 {Config.SIMULATION_SYNC_MAX_POINTS}')
+    if params['n_init'] < 1 or params['max_iterations'] < 1:
+        raise ValueError('n_init 和 max_iterations 必须为正整数')
+    return params
+
+
+def run_kmeans_sweep(params, session=None):
+    """按 parse_sweep_params 得到的参数生成数据并运行K值扫描"""
+    points, _ = _load(params, session)
+    return sweep_kmeans(points, params['k_max'], params['k_min'], params['n_init'], params['max_iterations'])
+
+
+def parse_gmm_sweep_params(data):
+    """GMM模型选择的参数（补全默认值），结果可直接作为缓存键的一部分"""
+    params = _dataset_params(data)
+    params.update({
+        'k_min': int(data.get('k_min', 1)),
+        'k_max': int(data.get('k_max', 10)),
+        'covariance_types': list(data.get('covariance_types', GMM_COVARIANCE_TYPES)),
+        'criterion': data.get('criterion', 'bic'),
+        'max_iterations': int(data.get('max_iterations', 100)),
+        'tolerance': float(data.get('tolerance', 0.001))
+    })
+    if params['k_max'] > Config.GMM_SWEEP_MAX_COMPONENTS:
+        raise ValueError(f'GMM分量数的上限不能超过 {Config.GMM_SWEEP_MAX_COMPONENTS}')
+    if int(params['point_count']) > Config.SIMULATION_SYNC_MAX_POINTS:
+        raise ValueError(f'GMM模型选择的数据点数不能超过 {Config.SIMULATION_SYNC_MAX_POINTS}')
+    if params['k_min'] > params['k_max']:
+        raise ValueError('k_min 不能大于 k_max')
+    if params['max_iterations'] < 1:
+        raise ValueError('max_iterations 必须为正整数')
+    return params
+
+
+def run_gmm_sweep(params, session=None):
+    """按 parse_gmm_sweep_params 得到的参数生成数据并运行GMM模型选择"""
+    points, _ = _load(params, session)
+    return sweep_gmm(points, range(params['k_min'], params['k_max'] + 1), params['covariance_types'],
+                     params['criterion'], params['max_iterations'], params['tolerance'])
+
+
+def parse_k_distance_params(data):
+    """k距离图的参数（补全默认值），结果可直接作为缓存键的一部分"""
+    params = _dataset_params(data)
+    params.update({
+        'min_points': int(data.get('min_points', 5)),
+        'max_points': int(data.get('max_points', 500))  # 返回曲线的最大点数
+    })
+    if params['min_points'] < 1 or params['max_points'] < 2:
+        raise ValueError('min_points 必须为正整数，max_points 不能小于 2')
+    # 近邻数超过点数时第 min_points 近邻距离不存在（为 inf，无法序列化为JSON）
+    if params['min_points'] > int(params['point_count']):
+        raise ValueError('min_points 不能大于数据点数')
+    if int(params['point_count']) > Config.DBSCAN_K_DISTANCE_MAX_POINTS:
+        raise ValueError(f'k距离图的数据点数不能超过 {Config.DBSCAN_K_DISTANCE_MAX_POINTS}')
+    return params
+
+
+def run_k_distance(params, session=None):
+    """在与 simulate_dbscan 相同的标准化空间中计算k距离图和建议的 ε（有会话时复用其KD树和核心距离）"""
+    if session is not None:
+        geometry = session.geometry('scaled')
+    else:
+        points, _ = load_dataset(params)
+        geometry = GeometryCache(StandardScaler().fit_transform(points))
+    return k_distance_curve(geometry.X, params['min_points'], params['max_points'], geometry)
+
+
+def parse_batch_params(data):
+    """多算法对比的参数：共用的数据来源和渲染选项，以及每组算法参数（runs）
+
+    runs 中每一项为 {'algorithm': 算法名, ...该算法的参数}，可以覆盖共用的渲染选项，
+    但不能覆盖数据来源。结果可直接作为缓存键的一部分。
+    """
+    runs = data.get('runs')
+    if not isinstance(runs, list) or not runs:
+        raise ValueError('runs 必须是非空的算法参数列表')
+    if len(runs) > Config.SIMULATION_BATCH_MAX_RUNS:
+        raise ValueError(f'一次最多对比 {Config.SIMULATION_BATCH_MAX_RUNS} 组算法参数')
+
+    shared = {key: value for key, value in data.items() if key != 'runs'}
+    params = {'dataset': _dataset_params(shared), 'runs': []}
+    if int(params['dataset']['point_count']) > Config.SIMULATION_SYNC_MAX_POINTS:
+        raise ValueError(f'多算法对比的数据点数不能超过 {Config.SIMULATION_SYNC_MAX_POINTS}')
+    for run in runs:
+        if not isinstance(run, dict) or 'algorithm' not in run:
+            raise ValueError('runs 中的每一项都必须指定 algorithm')
+        run_data = dict(shared, **{key: value for key, value in run.items() if key not in DATASET_KEYS})
+        params['runs'].append({
+            'algorithm': run['algorithm'],
+            'params': parse_simulation_params(run['algorithm'], run_data)
+        })
+    return params
+
+
+def _run_batch_item(run, session):
+    # 多算法对比中的一组：返回 (与单独模拟相同的结果, 最终标签)
+    points, original_clusters, frame_iter = simulation_frames(run['algorithm'], run['params'], session)
+    frames, metrics = collect_frames(frame_iter)
+    result = build_payload(points, frames, metrics, original_clusters, **render_options(run['params']),
+                           frame_budget=frame_budget(run['params']))
+    return result, frames[-1]['labels']
+
+
+def run_batch(params, session=None):
+    """按 parse_batch_params 得到的参数在同一数据集上并发运行多组算法，返回全部结果和指标对比表
+
+    数据集只生成一次：没有实验会话时创建一个只在本次请求内使用的临时会话，各组共用
+    其中的坐标、标准化副本和KD树（并发运行前预先算好）。各组结果与单独模拟时相同，
+    其中完全相同的 BATCH_SHARED_FIELDS 字段移到顶层只发送一次。对比表在原始坐标空间中
+    统一计算，各组的轮廓系数共用一遍距离计算（见 metrics_service.compare_labelings）。
+    """
+    session = session or SimulationSession(None, params['dataset'])
+    points, original_clusters = session.arrays()
+    if any(run['algorithm'] == 'dbscan' for run in params['runs']):
+        session.geometry('scaled').tree()
+
+    with ThreadPoolExecutor(max_workers=Config.SIMULATION_BATCH_WORKERS) as pool:
+        outcomes = list(pool.map(lambda run: _run_batch_item(run, session), params['runs']))
+    results = [result for result, _ in outcomes]
+
+    response = {'dataset': params['dataset']}
+    for field in BATCH_SHARED_FIELDS:
+        values = [result[field] for result in results if field in result]
+        if len(values) > 1 and all(value == values[0] for value in values):
+            response[field] = values[0]
+            for result in results:
+                result.pop(field, None)
+
+    comparison = compare_labelings(points, [labels for _, labels in outcomes], original_clusters)
+    response['runs'] = [
+        {'algorithm': run['algorithm'], 'params': run['params'], 'result': result}
+        for run, result in zip(params['runs'], results)
+    ]
+    response['comparison'] = [
+        dict(row, run=i, algorithm=run['algorithm']) for i, (run, row) in enumerate(zip(params['runs'], comparison))
+    ]
+    return response
+
+
+def simulation_frames(algorithm, params, session=None):
+    """按 parse_simulation_params 得到的参数生成数据，返回 (坐标数组, 原始簇标签, 帧生成器)
+
+    K-Means的结果不附带原始簇标签，此时第二项为 None。
+    session 为实验会话时，数据集及其派生结构取自会话（params 中的数据来源须与会话一致）。
+    """
+    # 生成数据点（坐标数组和原始簇标签，命中缓存时不重新生成；上传的数据集以内存映射打开）
+    points, original_clusters = _load(params, session)
+
+    if algorithm == 'kmeans':
+        mini_batch = {}
+        if params['mode'] == 'mini_batch':
+            mini_batch = {'batch_size': params['batch_size'], 'frame_every': params['frame_every']}
+        frames = iter_kmeans_frames(points, params['k_value'], params['centroid_method'],
+                                    params['custom_centroids'], mode=params['mode'],
+                                    max_iter=params['max_iterations'], **mini_batch)
+        return points, None, frames
+    if algorithm == 'dbscan':
+        frames = iter_dbscan_frames(points, params['epsilon'], params['min_points'], dataset_key(params),
+                                    mode=params['mode'], frame_every=params.get('frame_every', 1),
+                                    geometry=None if session is None else session.geometry('scaled'))
+        return points, original_clusters, frames
+    if algorithm == 'gmm':
+        frames = iter_gmm_frames(points, params['k_value'], params['covariance_type'],
+                                 params['max_iterations'], params['tolerance'])
+        return points, original_clusters, frames
+    if algorithm == 'agglomerative':
+        frames = iter_agglomerative_frames(points, params['n_clusters'], params['linkage_method'],
+                                           None if session is None else session.geometry('raw'))
+        return points, original_clusters, frames
+    raise ValueError('不支持的算法类型')
+
+
+def estimate_frame_count(algorithm, params):
+    """估计一次模拟最多产出的帧数，用于计算异步任务的进度"""
+    if algorithm == 'dbscan':
+        return Config.DBSCAN_TRACE_MAX_FRAMES if params['mode'] == 'expansion' else 3
+    if algorithm == 'agglomerative':
+        return len(_agglomerative_levels(int(params['point_count']), params['n_clusters'])) + 1
+    if algorithm == 'kmeans' and params['mode'] == 'mini_batch':
+        batch_size = max(1, min(int(params['batch_size']), int(params['point_count'])))
+        n_steps = max(1, int(params['max_iterations']) * int(params['point_count']) // batch_size)
+        return n_steps // max(1, int(params['frame_every'])) + 3
+    return int(params['max_iterations']) + 2
+
+
+def run_simulation(algorithm, params, session=None):
+    """按 parse_simulation_params 得到的参数生成数据并运行对应的模拟，返回完整响应体"""
+    points, original_clusters, frame_iter = simulation_frames(algorithm, params, session)
+    frames, metrics = collect_frames(frame_iter)
+    return build_payload(points, frames, metrics, original_clusters, **render_options(params),
+                         frame_budget=frame_budget(params))
+
+
+def stream_simulation(algorithm, params, session=None):
+    """与 run_simulation 相同，但边计算边逐段产出响应（见 payload_service.iter_payload）"""
+    points, original_clusters, frame_iter = simulation_frames(algorithm, params, session)
+    return iter_payload(points, frame_iter, original_clusters, **render_options(params))
 
 def get_supported_data_types():
     """获取支持的数据类型"""
@@ -692,13 +1360,13 @@ def get_supported_data_types():
             'value': 'gaussian',
             'label': '高斯分布',
             'description': '数据点呈高斯分布，形成自然簇',
-            'supported_algorithms': ['kmeans', 'gmm']
+            'supported_algorithms': ['kmeans', 'gmm', 'agglomerative']
         },
         {
             'value': 'moons',
             'label': '月牙分布',
             'description': '数据点形成月牙形结构',
-            'supported_algorithms': ['dbscan']
+            'supported_algorithms': ['dbscan', 'agglomerative']
         },
         {
             'value': 'circles',
@@ -722,7 +1390,7 @@ def get_supported_data_types():
             'value': 'anisotropic',
             'label': '异方差分布',
             'description': '不同方向方差不同的高斯分布',
-            'supported_algorithms': ['kmeans', 'gmm']
+            'supported_algorithms': ['kmeans', 'gmm', 'agglomerative']
         },
         {
             'value': 'noisy',
@@ -0,0 +1,222 @@
+import numpy as np
+
+from app.config import Config
+from app.utils.cache_utils import LRUCache
+from .user_dataset_service import load_user_dataset
+
+# 数据集的声明式描述：每种数据类型由若干形状组成，weight 为该形状占总点数的比例，
+# label 为原始簇标签（-1 表示噪声）。所有数据都落在前端画布的 [0, 10] × [0, 10] 范围内。
+#   blob   高斯团：center 中心，std 标准差（标量或 (sx, sy)），transform 为作用于偏移量的 2×2 线性变换
+#   arc    圆弧/圆环：center 中心，radius 半径（标量或 (最小, 最大) 均匀分布），
+#          angles 角度范围（缺省为整圆），jitter 坐标上的高斯扰动
+#   spiral 阿基米德螺线：center 中心，turns 圈数，growth 每弧度半径增量，phase 起始相位，jitter 半径扰动
+#   noise  均匀噪声：low/high 为矩形范围
+# 数据集级别的 clip 为坐标裁剪范围。
+BLOB_CENTERS = ((2.5, 2.5), (7.5, 3.0), (5.0, 7.5))
+
+DATASET_SPECS = {
+    'uniform': {
+        'shapes': [
+            {'kind': 'noise', 'weight': 1, 'label': 0, 'low': (0, 0), 'high': (10, 10)}
+        ]
+    },
+    'gaussian': {
+        'shapes': [
+            {'kind': 'blob', 'weight': 1, 'label': i, 'center': center, 'std': 0.8}
+            for i, center in enumerate(BLOB_CENTERS)
+        ]
+    },
+    'moons': {
+        'shapes': [
+            {'kind': 'arc', 'weight': 1, 'label': 0, 'center': (3.75, 4.4), 'radius': 2.5,
+             'angles': (0, np.pi), 'jitter': 0.25},
+            {'kind': 'arc', 'weight': 1, 'label': 1, 'center': (6.25, 5.65), 'radius': 2.5,
+             'angles': (np.pi, 2 * np.pi), 'jitter': 0.25}
+        ]
+    },
+    'circles': {
+        'shapes': [
+            {'kind': 'arc', 'weight': 1, 'label': 0, 'center': (5, 5), 'radius': 4, 'jitter': 0.2},
+            {'kind': 'arc', 'weight': 1, 'label': 1, 'center': (5, 5), 'radius': 2, 'jitter': 0.2}
+        ]
+    },
+    'smiley': {
+        'shapes': [
+            # 脸轮廓、两只眼睛和向下弯的嘴巴
+            {'kind': 'arc', 'weight': 4, 'label': 0, 'center': (5, 5), 'radius': (3.5, 4.5)},
+            {'kind': 'arc', 'weight': 1, 'label': 1, 'center': (3.5, 6), 'radius': (0.4, 0.6)},
+            {'kind': 'arc', 'weight': 1, 'label': 2, 'center': (6.5, 6), 'radius': (0.4, 0.6)},
+            {'kind': 'arc', 'weight': 2, 'label': 3, 'center': (5, 4.5), 'radius': (1.5, 2.0),
+             'angles': (np.pi, 2 * np.pi)}
+        ],
+        'clip': (0.1, 9.9)
+    },
+    'spiral': {
+        'shapes': [
+            {'kind': 'spiral', 'weight': 1, 'label': i, 'center': (5, 5), 'turns': 2, 'growth': 0.35,
+             'phase': i * 2 * np.pi / 3, 'jitter': 0.1}
+            for i in range(3)
+        ]
+    },
+    'anisotropic': {
+        # 拉伸并旋转，使各簇呈倾斜的长条形
+        'shapes': [
+            {'kind': 'blob', 'weight': 1, 'label': i, 'center': center, 'std': 1.0,
+             'transform': ((0.6, -0.6), (-0.4, 0.8))}
+            for i, center in enumerate(((2.5, 3.0), (7.5, 3.5), (5.0, 7.5)))
+        ]
+    },
+    'noisy': {
+        'shapes': [
+            {'kind': 'blob', 'weight': 1, 'label': i, 'center': center, 'std': 0.8}
+            for i, center in enumerate(BLOB_CENTERS)
+        ] + [
+            {'kind': 'noise', 'weight': 1, 'label': -1, 'low': (0, 0), 'high': (10, 10)}
+        ]
+    }
+}
+
+
+def _pair(value):
+    """标量扩展为 (value, value)"""
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (2,))
+
+
+def _sample_blob(rng, n, shape):
+    points = rng.normal(0, _pair(shape.get('std', 1.0)), size=(n, 2))
+    if shape.get('transform') is not None:
+        points = points @ np.asarray(shape['transform'], dtype=np.float64)
+    points += _pair(shape['center'])
+    return points
+
+
+def _sample_arc(rng, n, shape):
+    start, end = shape.get('angles', (0, 2 * np.pi))
+    angles = rng.uniform(start, end, n)
+    r_min, r_max = _pair(shape['radius'])
+    radii = rng.uniform(r_min, r_max, n) if r_max > r_min else np.full(n, r_min)
+    points = np.column_stack([np.cos(angles), np.sin(angles)])
+    points *= radii[:, None]
+    points += _pair(shape['center'])
+    if shape.get('jitter'):
+        points += rng.normal(0, shape['jitter'], size=(n, 2))
+    return points
+
+
+def _sample_spiral(rng, n, shape):
+    t = rng.uniform(0, 2 * np.pi * shape.get('turns', 1), n)
+    radii = shape.get('growth', 1.0) * t
+    if shape.get('jitter'):
+        radii += rng.normal(0, shape['jitter'], n)
+    angles = t + shape.get('phase', 0.0)
+    points = np.column_stack([np.cos(angles), np.sin(angles)])
+    points *= radii[:, None]
+    points += _pair(shape['center'])
+    return points
+
+
+def _sample_noise(rng, n, shape):
+    return rng.uniform(_pair(shape.get('low', 0)), _pair(shape.get('high', 10)), size=(n, 2))
+
+
+SHAPE_SAMPLERS = {
+    'blob': _sample_blob,
+    'arc': _sample_arc,
+    'ring': _sample_arc,
+    'spiral': _sample_spiral,
+    'noise': _sample_noise
+}
+
+
+def shape_counts(n_samples, weights):
+    """按权重把总点数分给各个形状（最大余数法，总和恰好为 n_samples）"""
+    weights = np.asarray(weights, dtype=np.float64)
+    quotas = n_samples * weights / weights.sum()
+    counts = np.floor(quotas).astype(np.int64)
+    remainder = n_samples - int(counts.sum())
+    if remainder:
+        counts[np.argsort(counts - quotas, kind='stable')[:remainder]] += 1
+    return counts
+
+
+def generate_shapes(n_samples, shapes, seed=42, clip=None):
+    """按声明式的形状列表生成数据集，返回 (坐标数组, 原始簇标签数组)
+
+    使用独立的 np.random.default_rng(seed)，不触碰全局随机状态，可在多个请求中并发调用。
+    结果直接写入预先分配的数组：先生成一个随机排列，每个形状的点写到排列中对应的位置，
+    生成完即为打乱后的顺序，无需再复制一次。
+    """
+    n_samples = int(n_samples)
+    rng = np.random.default_rng(seed)
+    points = np.empty((n_samples, 2), dtype=np.float64)
+    labels = np.empty(n_samples, dtype=np.int32)
+    order = rng.permutation(n_samples)
+
+    start = 0
+    counts = shape_counts(n_samples, [shape.get('weight', 1) for shape in shapes])
+    for shape, count in zip(shapes, counts):
+        if count == 0:
+            continue
+        sampler = SHAPE_SAMPLERS.get(shape['kind'])
+        if sampler is None:
+            raise ValueError(f"不支持的形状类型: {shape['kind']}")
+        index = order[start:start + count]
+        points[index] = sampler(rng, int(count), shape)
+        labels[index] = shape.get('label', -1)
+        start += count
+
+    if clip is not None:
+        np.clip(points, clip[0], clip[1], out=points)
+    return points, labels
+
+
+def _generate_dataset(n_samples, data_type, seed):
+    """生成不同类型的数据点，返回只读的坐标数组和原始簇标签数组"""
+    spec = DATASET_SPECS[data_type]
+    points, labels = generate_shapes(n_samples, spec['shapes'], seed, clip=spec.get('clip'))
+    # 缓存中的数组在多个请求间共享，设为只读防止被意外修改
+    points.setflags(write=False)
+    labels.setflags(write=False)
+    return points, labels
+
+
+def dataset_nbytes(dataset):
+    """数据集缓存条目占用的字节数"""
+    points, labels = dataset
+    return points.nbytes + labels.nbytes
+
+
+# 数据集缓存：键为 (样本数, 数据类型, 随机种子)，按占用内存淘汰
+dataset_cache = LRUCache(max_bytes=Config.DATASET_CACHE_MAX_BYTES, sizeof=dataset_nbytes)
+
+
+def generate_dataset(n_samples, data_type='uniform', seed=42):
+    """生成（或从缓存读取）数据集，返回只读的坐标数组和原始簇标签数组；不支持的数据类型抛出 ValueError"""
+    if data_type not in DATASET_SPECS:
+        raise ValueError(f'不支持的数据类型: {data_type}')
+    key = (int(n_samples), data_type, int(seed))
+    return dataset_cache.get_or_create(key, lambda: _generate_dataset(*key))
+
+
+def load_dataset(params):
+    """按参数取得数据集：带 dataset_id 时打开用户上传的数据集，否则生成（或从缓存读取）内置数据集"""
+    if params.get('dataset_id'):
+        return load_user_dataset(params['dataset_id'])
+    return generate_dataset(params['point_count'], params['data_type'], params['seed'])
+
+
+def dataset_key(params):
+    """标识数据集内容的键，用于缓存由数据集派生的结构"""
+    if params.get('dataset_id'):
+        return ('upload', params['dataset_id'])
+    return (int(params['point_count']), params['data_type'], int(params['seed']))
+
+
+def generate_data_points(n_samples, data_type='uniform', seed=42):
+    """生成不同类型的数据点（前端需要的点字典格式）"""
+    points, labels = generate_dataset(n_samples, data_type, seed)
+    labels = labels.tolist()
+    return [
+        {'x': x, 'y': y, 'cluster': label, 'originalCluster': label}
+        for (x, y), label in zip(points.tolist(), labels)
+    ]
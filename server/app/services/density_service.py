@@ -0,0 +1,173 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from app.config import Config
+from app.utils.cache_utils import LRUCache
+from .geometry_service import GeometryCache
+from .metrics_service import find_knee
+
+
+def k_distance_curve(X, min_samples, max_points=500, geometry=None):
+    """k距离图：所有点的核心距离（第 min_samples 个近邻距离，含自身）升序排列
+
+    用KD树查询，不构造距离矩阵；按排名均匀抽取约 max_points 个点用于绘图（首尾和拐点总会保留）。
+    拐点在完整曲线上检测，其距离即为建议的 ε：ε 取该值时拐点之前的点都是核心点。
+    geometry 为 X 上的几何结构缓存，提供时复用其中的KD树和k近邻。
+    """
+    geometry = geometry or GeometryCache(X)
+    distances = np.sort(geometry.core_distances(min_samples))
+    n = len(distances)
+    knee = find_knee(np.arange(n), distances)
+    ranks = np.linspace(0, n - 1, min(max_points, n)).round().astype(np.int64)
+    if knee is not None:
+        ranks = np.append(ranks, knee)
+    ranks = np.unique(ranks)
+    return {
+        'k': int(min_samples),
+        'n_points': n,
+        'ranks': ranks.tolist(),
+        'distances': distances[ranks].round(6).tolist(),
+        'knee_rank': knee,
+        'suggested_epsilon': None if knee is None else round(float(distances[knee]), 4)
+    }
+
+
+def _reachability_tree(X, core):
+    """在互达距离 max(core_p, core_q, d(p, q)) 上运行Prim算法（OPTICS式的密度排序）
+
+    返回访问顺序、每个点加入时的可达距离（即可达图），以及最小生成树的 n-1 条边。
+    每一步只对尚未访问的点做一次向量化的距离计算，内存为 O(n)；
+    已访问的点用"与末尾交换再缩短"的方式移出，剩余数组始终连续。
+    """
+    n = len(X)
+    ordering = np.empty(n, dtype=np.int64)
+    reachability = np.empty(n, dtype=np.float64)
+    parents = np.empty(n, dtype=np.int64)
+    ordering[0], reachability[0], parents[0] = 0, np.inf, -1
+
+    remaining = np.arange(1, n)
+    points = X[1:].copy()
+    remaining_core = core[1:].copy()
+    best = np.full(n - 1, np.inf)
+    best_parent = np.zeros(n - 1, dtype=np.int64)
+
+    current = 0
+    for step in range(1, n):
+        size = n - step
+        diff = points[:size] - X[current]
+        weights = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+        np.maximum(weights, remaining_core[:size], out=weights)
+        np.maximum(weights, core[current], out=weights)
+
+        improved = weights < best[:size]
+        best[:size][improved] = weights[improved]
+        best_parent[:size][improved] = current
+
+        j = int(best[:size].argmin())
+        current = int(remaining[j])
+        ordering[step], reachability[step], parents[step] = current, best[j], best_parent[j]
+
+        last = size - 1
+        for array in (remaining, points, remaining_core, best, best_parent):
+            array[j] = array[last]
+
+    return ordering, reachability, parents
+
+
+def _border_reach(X, core, tree, nearest):
+    """每个点被其它点"密度可达"所需的最小 ε：min_{q≠p} max(core_q, d(p, q))，以及取到最小值的点 q
+
+    非核心点 p 在某个 ε 下是边界点，当且仅当该值不超过 ε，此时 q 是 ε 邻域内的核心点。
+    先用最近邻（nearest 为至少含2列的k近邻 (距离, 下标)）给出上界，再只在上界半径内查询，避免计算全部点对。
+    """
+    n = len(X)
+    if n < 2:
+        return np.full(n, np.inf), np.full(n, -1, dtype=np.int64)
+    distances, indices = nearest
+    upper = np.maximum(distances[:, 1], core[indices[:, 1]])
+    # 半径略微放大，避免浮点误差把取到上界的那个近邻排除在外（多出的点不影响最小值）
+    upper = upper * (1 + 1e-9) + 1e-12
+
+    neighbors, neighbor_distances = tree.query_radius(X, r=upper, return_distance=True)
+    counts = np.fromiter((len(row) for row in neighbors), dtype=np.int64, count=n)
+    rows = np.repeat(np.arange(n), counts)
+    cols = np.concatenate(neighbors)
+    reach = np.maximum(np.concatenate(neighbor_distances), core[cols])
+    reach[cols == rows] = np.inf
+
+    # 按行取最小值：先按 (行, 可达距离) 排序，每行第一个即为最小
+    order = np.lexsort((reach, rows))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    first = order[starts]
+    return reach[first], cols[first]
+
+
+def build_density_index(X, min_samples, geometry=None):
+    """预先计算与 ε 无关的密度结构，之后任意 ε 的DBSCAN标签都可以线性时间得到
+
+    核心距离和边界点的上界共用一次k近邻查询；geometry 为 X 上的几何结构缓存，提供时复用其中的KD树和k近邻。
+    """
+    geometry = geometry or GeometryCache(X)
+    X = geometry.X
+    nearest = geometry.knn(max(min_samples, 2))
+    core = geometry.core_distances(min_samples)
+    ordering, reachability, parents = _reachability_tree(X, core)
+    border_reach, border_core = _border_reach(X, core, geometry.tree(), nearest)
+    return {
+        'min_samples': int(min_samples),
+        'core_distances': core,
+        'ordering': ordering,
+        'reachability': reachability,
+        'parents': parents,
+        'border_reach': border_reach,
+        'border_core': border_core
+    }
+
+
+def density_index_nbytes(index):
+    return sum(value.nbytes for value in index.values() if isinstance(value, np.ndarray))
+
+
+# 密度结构缓存：键为 (数据集键, min_samples)
+density_cache = LRUCache(max_bytes=Config.DBSCAN_DENSITY_CACHE_MAX_BYTES, sizeof=density_index_nbytes)
+
+
+def get_density_index(X, min_samples, dataset_key=None, geometry=None):
+    """读取（或计算并缓存）密度结构；没有数据集键时只计算不缓存"""
+    if dataset_key is None:
+        return build_density_index(X, min_samples, geometry)
+    key = (dataset_key, int(min_samples))
+    return density_cache.get_or_create(key, lambda: build_density_index(X, min_samples, geometry))
+
+
+def dbscan_from_index(index, eps):
+    """从密度结构中提取给定 ε 的DBSCAN结果，返回 (标签, 核心点掩码)
+
+    核心点：核心距离不超过 ε；簇：生成树中权重不超过 ε 的边连通的核心点；
+    边界点：border_reach 不超过 ε 的非核心点，归入对应核心点的簇；其余为噪声（-1）。
+    簇按其中最小的核心点下标编号，与sklearn的DBSCAN一致。只有同时处在多个簇
+    ε 邻域内的边界点，归属可能与sklearn不同（sklearn取决于扩展顺序）。
+    """
+    core = index['core_distances'] <= eps
+    n = len(core)
+    labels = np.full(n, -1, dtype=np.int64)
+    if not core.any():
+        return labels, core
+
+    keep = index['reachability'] <= eps
+    keep[0] = False
+    children = index['ordering'][keep]
+    parents = index['parents'][keep]
+    graph = coo_matrix((np.ones(len(children), dtype=np.int8), (children, parents)), shape=(n, n))
+    _, components = connected_components(graph, directed=False)
+
+    core_points = np.flatnonzero(core)
+    _, first, inverse = np.unique(components[core_points], return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind='stable')] = np.arange(len(first))
+    labels[core_points] = rank[inverse]
+
+    border = ~core & (index['border_reach'] <= eps)
+    labels[border] = labels[index['border_core'][border]]
+    return labels, core
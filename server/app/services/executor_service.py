@@ -0,0 +1,136 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.config import Config
+from .clustering_service import run_simulation
+from .simulation_cache_service import simulation_body, json_options
+
+# 模拟的执行后端：thread 在请求线程内计算，process 交给预热好的进程池
+SIMULATION_BACKENDS = ('thread', 'process')
+
+
+def _init_worker(blas_threads):
+    """工作进程初始化：导入sklearn并跑一次小规模聚类，使首个请求不必承担导入和初始化开销"""
+    import numpy as np
+    from sklearn.cluster import DBSCAN, kmeans_plusplus
+
+    if blas_threads:
+        # 并行度来自进程数，每个进程内的BLAS线程数需要限制，避免线程过量竞争
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(blas_threads)
+
+    X = np.random.default_rng(0).random((64, 2))
+    kmeans_plusplus(X, 2, random_state=0)
+    DBSCAN(eps=0.3, min_samples=3).fit(X)
+    run_simulation('kmeans', {
+        'point_count': 64, 'data_type': 'uniform', 'seed': 0,
+        'response_format': 'columnar', 'frame_encoding': 'full',
+        'k_value': 2, 'centroid_method': 'random', 'custom_centroids': None,
+        'mode': 'full', 'max_iterations': 5
+    })
+
+
+def _worker_ready(delay):
+    # 预热任务：稍作停留，让每个工作进程都领到一个任务从而全部启动
+    time.sleep(delay)
+    return multiprocessing.current_process().pid
+
+
+def _simulate_in_worker(algorithm, params, options):
+    """在工作进程中运行模拟并直接序列化，返回响应体（bytes）
+
+    数据集在工作进程中按参数生成（并使用进程自己的数据集缓存），进程间只传递参数和
+    一个字节串，不会pickle逐点字典列表。
+    """
+    return simulation_body(algorithm, run_simulation(algorithm, params), options)
+
+
+class SimulationExecutor:
+    """模拟的执行器：按配置在当前线程或进程池中运行模拟，返回序列化后的响应体
+
+    进程池使用 spawn 方式启动（不继承父进程中的线程和连接），应用启动时由 start()
+    预先拉起全部工作进程并导入sklearn。进程池异常退出时自动重建，当次请求退回线程内计算。
+    """
+
+    def __init__(self, backend='thread', max_workers=None, start_method='spawn', blas_threads=1):
+        if backend not in SIMULATION_BACKENDS:
+            raise ValueError(f'不支持的模拟执行后端: {backend}')
+        self.backend = backend
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.start_method = start_method
+        self.blas_threads = blas_threads
+        self._executor = None
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    @classmethod
+    def from_config(cls, config=Config):
+        return cls(
+            backend=config.SIMULATION_BACKEND,
+            max_workers=config.SIMULATION_PROCESS_WORKERS,
+            start_method=config.SIMULATION_PROCESS_START_METHOD,
+            blas_threads=config.SIMULATION_PROCESS_BLAS_THREADS
+        )
+
+    @property
+    def uses_processes(self):
+        return self.backend == 'process'
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_worker,
+                        initargs=(self.blas_threads,)
+                    )
+        return self._executor
+
+    def start(self, wait=False):
+        """预先启动全部工作进程（线程后端时什么也不做）"""
+        if not self.uses_processes:
+            return
+        futures = [self._pool().submit(_worker_ready, 0.2) for _ in range(self.max_workers)]
+        if wait:
+            for future in futures:
+                future.result()
+
+    def run(self, algorithm, params, session=None):
+        """运行一次模拟并返回响应体（bytes）；需要在应用上下文中调用
+
+        带实验会话的模拟总在当前线程中计算：会话的常驻数据只存在于本进程。
+        """
+        if not self.uses_processes or session is not None:
+            return simulation_body(algorithm, run_simulation(algorithm, params, session))
+        try:
+            return self._pool().submit(_simulate_in_worker, algorithm, params, json_options()).result()
+        except BrokenProcessPool:
+            self._reset()
+            self.fallbacks += 1
+            return simulation_body(algorithm, run_simulation(algorithm, params))
+
+    def _reset(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        self._reset()
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'max_workers': self.max_workers if self.uses_processes else None,
+            'started': self._executor is not None,
+            'fallbacks': self.fallbacks
+        }
+
+
+# 全局执行器实例
+simulation_executor = SimulationExecutor.from_config()
@@ -0,0 +1,86 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.spatial.distance import pdist
+from sklearn.neighbors import KDTree
+
+
+class GeometryCache:
+    """一份坐标数组上的几何结构缓存：KD树、k近邻、核心距离、ε邻域图和压缩形式的点对距离
+
+    每种结构在第一次用到时计算，之后直接复用，同一次模拟中的拟合、过程追踪和指标计算共用一个实例。
+    store 为实验会话（提供 memo/peek/discard）时结构保留在会话中，多次请求之间共用，并计入会话的内存上限；
+    prefix 区分同一会话中不同坐标空间的结构。点对距离矩阵的分块不缓存：二维数据上
+    重新计算一块距离比从缓存中按下标取出更快。
+    """
+
+    def __init__(self, X, store=None, prefix=''):
+        self.X = np.ascontiguousarray(X, dtype=np.float64)
+        self.store = store
+        self.prefix = prefix
+        self._items = {}
+
+    def __len__(self):
+        return len(self.X)
+
+    def memo(self, name, compute):
+        """读取结构，没有时调用 compute() 计算并保留"""
+        if self.store is not None:
+            return self.store.memo(self.prefix + name, compute)
+        if name not in self._items:
+            self._items[name] = compute()
+        return self._items[name]
+
+    def peek(self, name):
+        """读取已经算好的结构，没有时返回 None（不触发计算）"""
+        if self.store is not None:
+            return self.store.peek(self.prefix + name)
+        return self._items.get(name)
+
+    def discard(self, name):
+        """丢弃已经算好的结构（不存在时忽略）"""
+        if self.store is not None:
+            self.store.discard(self.prefix + name)
+        else:
+            self._items.pop(name, None)
+
+    def tree(self):
+        return self.memo('tree', lambda: KDTree(self.X))
+
+    def knn(self, k):
+        """每个点的前 k 个最近邻（含自身）：(距离, 下标)，每行按距离升序；k 超过点数时取全部点"""
+        k = int(min(max(k, 1), len(self.X)))
+        return self.memo(f'knn:{k}', lambda: self.tree().query(self.X, k=k))
+
+    def core_distances(self, min_samples):
+        """每个点的核心距离：到第 min_samples 个最近邻（含自身）的距离，与DBSCAN的核心点判定一致"""
+        distances, _ = self.knn(min_samples)
+        core = distances[:, -1].copy()
+        if min_samples > len(self.X):
+            core[:] = np.inf
+        return core
+
+    def radius_graph(self, epsilon):
+        """用KD树做一次半径查询，得到稀疏的ε邻域图（CSR格式，包含点自身，只记录邻接关系）
+
+        只保留最近一次 ε 的邻域图：拖动 ε 时每个值都要重新查询，保留旧的邻域图只会占用内存。
+        """
+        epsilon = float(epsilon)
+
+        def compute():
+            indices = self.tree().query_radius(self.X, r=epsilon)
+            n = len(self.X)
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum([len(row) for row in indices], out=indptr[1:])
+            indices = np.concatenate(indices).astype(np.int32)
+            return epsilon, csr_matrix((np.ones(len(indices), dtype=bool), indices, indptr), shape=(n, n))
+
+        cached = self.peek('radius_graph')
+        if cached is not None and cached[0] != epsilon:
+            self.discard('radius_graph')
+        cached_epsilon, graph = self.memo('radius_graph', compute)
+        # 并发请求换用了其它 ε 时不与之争用保留位置，只计算本次的邻域图
+        return graph if cached_epsilon == epsilon else compute()[1]
+
+    def pdist(self):
+        """压缩形式的点对距离（n(n-1)/2 个浮点数），层次聚类的合并表和共表相关系数共用"""
+        return self.memo('pdist', lambda: pdist(self.X))
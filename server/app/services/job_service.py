@@ -0,0 +1,195 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import Config
+from app.utils.exceptions import NotFoundException, QueueFullException
+from .clustering_service import (
+    simulation_frames, collect_frames, estimate_frame_count, render_options, frame_budget
+)
+from .payload_service import build_payload
+from .simulation_cache_service import make_cache_key, simulation_cache, simulation_body
+from .executor_service import simulation_executor
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_FINISHED = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class SimulationJob:
+    """一个异步模拟任务：记录状态、进度和结果（序列化后的响应体）"""
+
+    def __init__(self, user_id, algorithm, params, session=None):
+        self.id = uuid.uuid4().hex
+        self.user_id = str(user_id)
+        self.algorithm = algorithm
+        self.params = params
+        self.session = session
+        self.status = JOB_QUEUED
+        self.frames_done = 0
+        self.frames_expected = estimate_frame_count(algorithm, params)
+        self.body = None
+        self.cache_status = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    @property
+    def progress(self):
+        """完成比例：按已产出的帧数估计，结束前最多到 0.99"""
+        if self.status == JOB_SUCCEEDED:
+            return 1.0
+        if not self.frames_expected:
+            return 0.0
+        return round(min(self.frames_done / self.frames_expected, 0.99), 4)
+
+    def to_dict(self):
+        info = {
+            'job_id': self.id,
+            'algorithm': self.algorithm,
+            'status': self.status,
+            'progress': self.progress,
+            'frames_done': self.frames_done,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.error is not None:
+            info['error'] = self.error
+        return info
+
+
+class SimulationJobQueue:
+    """异步模拟任务队列：固定大小的线程池执行模拟，排队和运行中的任务总数有上限
+
+    任务结束后保留 result_ttl 秒供客户端取回结果，过期后自动清理。
+    计算结果同时写入模拟结果缓存，与同步接口共享。
+    """
+
+    def __init__(self, max_workers=2, max_depth=16, result_ttl=600):
+        self.max_workers = max_workers
+        self.max_depth = max_depth
+        self.result_ttl = result_ttl
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config=Config):
+        return cls(
+            max_workers=config.SIMULATION_JOB_WORKERS,
+            max_depth=config.SIMULATION_JOB_MAX_DEPTH,
+            result_ttl=config.SIMULATION_JOB_RESULT_TTL
+        )
+
+    def _pool(self):
+        # 线程池在第一次提交任务时才创建，避免导入模块时就启动线程
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='simulation-job')
+        return self._executor
+
+    def pending_count(self):
+        """排队中和运行中的任务数"""
+        return sum(1 for job in list(self._jobs.values()) if job.status not in JOB_FINISHED)
+
+    def submit(self, app, user_id, algorithm, params, session=None):
+        """提交任务并立即返回；队列已满时抛出 QueueFullException"""
+        job = SimulationJob(user_id, algorithm, params, session)
+        with self._lock:
+            self._purge_expired()
+            if self.pending_count() >= self.max_depth:
+                raise QueueFullException('模拟任务队列已满，请稍后重试')
+            self._jobs[job.id] = job
+            job.future = self._pool().submit(self._run, app, job)
+        return job
+
+    def get(self, job_id, user_id):
+        """查询任务；不存在或不属于该用户时抛出 NotFoundException"""
+        job = self._jobs.get(job_id)
+        if job is None or job.user_id != str(user_id):
+            raise NotFoundException('任务不存在或已过期')
+        return job
+
+    def cancel(self, job_id, user_id):
+        """取消尚未开始的任务，返回是否取消成功"""
+        job = self.get(job_id, user_id)
+        with self._lock:
+            if job.status == JOB_QUEUED and job.future.cancel():
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+                return True
+        return False
+
+    def _run(self, app, job):
+        with app.app_context():
+            with self._lock:
+                if job.status != JOB_QUEUED:
+                    return
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+
+            def compute():
+                if simulation_executor.uses_processes and job.session is None:
+                    # 进程池中运行时无法逐帧汇报，进度在完成时直接跳到 1
+                    return simulation_executor.run(job.algorithm, job.params)
+                points, original_clusters, frame_iter = simulation_frames(job.algorithm, job.params, job.session)
+                frames, metrics = collect_frames(self._track(job, frame_iter))
+                result = build_payload(points, frames, metrics, original_clusters, **render_options(job.params),
+                                       frame_budget=frame_budget(job.params))
+                return simulation_body(job.algorithm, result)
+
+            try:
+                key = make_cache_key(job.algorithm, job.params)
+                job.body, job.cache_status = simulation_cache.get_or_compute(key, compute)
+                status = JOB_SUCCEEDED
+            except Exception as e:
+                app.logger.error(f"模拟任务 {job.id} 失败: {e}")
+                job.error = str(e)
+                status = JOB_FAILED
+            # 先记录结束时间再更新状态，清理过期任务时不会读到空的结束时间
+            job.finished_at = time.time()
+            job.status = status
+            # 结束后不再引用实验会话，会话被删除或过期时其常驻数据可以及时释放
+            job.session = None
+
+    @staticmethod
+    def _track(job, frame_iter):
+        # 透传帧生成器，同时累计已完成的帧数作为进度
+        while True:
+            try:
+                frame = next(frame_iter)
+            except StopIteration as stop:
+                return stop.value
+            job.frames_done += 1
+            yield frame
+
+    def _purge_expired(self):
+        # 调用方需持有锁
+        deadline = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.status in JOB_FINISHED and job.finished_at < deadline]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self):
+        statuses = {}
+        for job in list(self._jobs.values()):
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            'max_workers': self.max_workers,
+            'max_depth': self.max_depth,
+            'pending': self.pending_count(),
+            'jobs': statuses
+        }
+
+
+# 全局任务队列实例
+simulation_jobs = SimulationJobQueue.from_config()
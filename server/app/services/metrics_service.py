@@ -0,0 +1,303 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.spatial.distance import cdist
+from sklearn.metrics import adjusted_rand_score
+from sklearn.metrics.pairwise import euclidean_distances
+
+from app.config import Config
+
+# 轮廓系数的计算方式
+SILHOUETTE_MODES = ('auto', 'exact', 'sampled')
+
+# 95% 置信区间对应的正态分位数
+Z_95 = 1.959963984540054
+
+
+def _chunk_rows(n_columns, working_memory):
+    """每块的行数，使每行 n_columns 个浮点数的一块占用不超过 working_memory 字节"""
+    return max(1, int(working_memory // (8 * max(n_columns, 1))))
+
+
+def _silhouette_chunk(cluster_sums, own, cluster_sizes, ref_counts, in_reference):
+    # 由一块点到各簇的距离之和计算这些点的轮廓系数
+    row_index = np.arange(len(own))
+    own_counts = ref_counts[own] - in_reference
+    a = cluster_sums[row_index, own] / np.maximum(own_counts, 1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_others = cluster_sums / ref_counts
+    mean_others[row_index, own] = np.inf
+    b = mean_others.min(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = (b - a) / np.maximum(a, b)
+    s[(cluster_sizes[own] <= 1) | (own_counts <= 0)] = 0
+    return np.nan_to_num(s)
+
+
+def silhouette_values_many(X, labelings, indices=None, reference=None, working_memory=None):
+    """同时计算多组标签下 indices 指定的点的轮廓系数，返回 (标签组数, 点数) 的数组
+
+    各组的簇指示矩阵（稀疏，每个参考点每组一个非零元）横向拼接，每块距离矩阵只计算一次，
+    一次稀疏矩阵乘法即得到每个点到各组各簇的距离之和。块的行数按距离矩阵和簇距离和两部分
+    的列数（参考点数 + 各组簇数）确定，簇数很多（如 DBSCAN 的大量小簇）时内存仍受控。
+    其余约定与 silhouette_values 相同。
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n_samples = len(X)
+    if indices is None:
+        indices = np.arange(n_samples)
+    if reference is None:
+        reference = np.arange(n_samples)
+
+    groups = []
+    offset = 0
+    for labels in labelings:
+        _, labels = np.unique(labels, return_inverse=True)
+        n_clusters = int(labels.max()) + 1
+        ref_counts = np.bincount(labels[reference], minlength=n_clusters).astype(np.float64)
+        groups.append((labels, np.bincount(labels, minlength=n_clusters), ref_counts, offset))
+        offset += n_clusters
+    # 转置存储（簇 × 参考点），与距离块的转置相乘得到 簇 × 行 的距离和
+    columns = np.concatenate([start + labels[reference] for labels, _, _, start in groups])
+    rows_of = np.tile(np.arange(len(reference)), len(groups))
+    indicator = csr_matrix((np.ones(len(columns)), (columns, rows_of)), shape=(offset, len(reference)))
+    # 查询点本身也在参考点中时，计算簇内平均距离需要排除自身
+    in_reference = np.zeros(n_samples, dtype=bool)
+    in_reference[reference] = True
+
+    working_memory = working_memory or Config.METRICS_WORKING_MEMORY
+    # 每行：距离矩阵一行、各组簇距离和一行，以及计算单组轮廓系数时的同样大小的临时数组
+    chunk = _chunk_rows(len(reference) + 2 * offset, working_memory)
+    X_ref = X[reference]
+
+    values = np.empty((len(groups), len(indices)))
+    for start in range(0, len(indices), chunk):
+        rows = indices[start:start + chunk]
+        distances = euclidean_distances(X[rows], X_ref)
+        # 每个点到各簇的距离之和：一次矩阵乘法按簇对距离求和
+        cluster_sums = np.asarray(indicator @ distances.T).T
+        for i, (labels, cluster_sizes, ref_counts, first) in enumerate(groups):
+            values[i, start:start + len(rows)] = _silhouette_chunk(
+                cluster_sums[:, first:first + len(cluster_sizes)], labels[rows], cluster_sizes, ref_counts,
+                in_reference[rows])
+    return values
+
+
+def silhouette_values(X, labels, indices=None, reference=None, working_memory=None):
+    """计算 indices 指定的点的轮廓系数
+
+    点到各簇的平均距离用 reference 指定的参考点估计（为空时使用全部点，即精确值）。
+    距离矩阵按行分块计算，内存占用为 O(块大小 × 参考点数)。
+    与 sklearn 一致，-1（噪声）也视为一个普通的簇，单点簇的轮廓系数为 0。
+    """
+    return silhouette_values_many(X, [labels], indices, reference, working_memory)[0]
+
+
+def _cluster_centroids(X, labels):
+    # 簇标签编码为 0..k-1 后的 (标签, 各簇点数, 簇中心)
+    _, labels = np.unique(labels, return_inverse=True)
+    counts = np.bincount(labels)
+    centroids = np.column_stack([np.bincount(labels, weights=X[:, d]) for d in range(X.shape[1])])
+    return labels, counts, centroids / counts[:, None]
+
+
+def calinski_harabasz(X, labels):
+    """Calinski-Harabasz 指数（与 sklearn 一致），按簇用 bincount 聚合，不逐簇循环"""
+    X = np.asarray(X, dtype=np.float64)
+    labels, counts, centroids = _cluster_centroids(X, labels)
+    n_samples, n_labels = len(X), len(counts)
+    extra = float((counts * ((centroids - X.mean(axis=0)) ** 2).sum(axis=1)).sum())
+    intra = float(((X - centroids[labels]) ** 2).sum())
+    return 1.0 if intra == 0 else extra * (n_samples - n_labels) / (intra * (n_labels - 1))
+
+
+def davies_bouldin(X, labels, working_memory=None):
+    """Davies-Bouldin 指数（与 sklearn 一致）
+
+    簇中心之间的距离按行分块计算，内存为 O(块大小 × 簇数)；sklearn 会生成完整的
+    簇数 × 簇数 矩阵，DBSCAN 产生上万个小簇时会耗尽内存。
+    """
+    X = np.asarray(X, dtype=np.float64)
+    labels, counts, centroids = _cluster_centroids(X, labels)
+    intra = np.bincount(labels, weights=np.sqrt(((X - centroids[labels]) ** 2).sum(axis=1))) / counts
+    if np.allclose(intra, 0):
+        return 0.0
+
+    chunk = _chunk_rows(len(centroids), working_memory or Config.METRICS_WORKING_MEMORY)
+    scores = np.empty(len(centroids))
+    all_coincide = True
+    for start in range(0, len(centroids), chunk):
+        # cdist 按坐标差计算，重合的簇中心距离恰好为 0（与 sklearn 的 pairwise_distances 一致）
+        distances = cdist(centroids[start:start + chunk], centroids)
+        all_coincide = all_coincide and np.allclose(distances, 0)
+        distances[distances == 0] = np.inf
+        scores[start:start + chunk] = ((intra[start:start + chunk, None] + intra[None, :]) / distances).max(axis=1)
+    return 0.0 if all_coincide else float(scores.mean())
+
+
+def silhouette_exact(X, labels, working_memory=None):
+    """分块计算的精确轮廓系数"""
+    return float(silhouette_values(X, labels, working_memory=working_memory).mean())
+
+
+def _stratified_sample(labels, size, rng):
+    """按簇分层抽样，每个簇按比例抽取（至少保留1个点）"""
+    if size >= len(labels):
+        return np.arange(len(labels))
+    indices = []
+    clusters, counts = np.unique(labels, return_counts=True)
+    for cluster, count in zip(clusters, counts):
+        members = np.flatnonzero(labels == cluster)
+        take = max(1, int(round(size * count / len(labels))))
+        indices.append(rng.choice(members, size=min(take, count), replace=False))
+    return np.sort(np.concatenate(indices))
+
+
+def silhouette_sampled(X, labels, sample_size, reference_size=None, random_state=42, working_memory=None):
+    """抽样估计轮廓系数
+
+    随机抽取 sample_size 个点计算轮廓系数，点到各簇的平均距离由按簇分层抽取的
+    reference_size 个参考点估计，计算量为 O(sample_size × reference_size)，与总点数无关。
+    样本点的轮廓系数可视为独立样本，给出均值的正态近似95%置信区间。
+    返回 (估计值, (置信下限, 置信上限))。
+    """
+    labels = np.asarray(labels)
+    reference_size = reference_size or Config.METRICS_REFERENCE_SIZE
+    rng = np.random.default_rng(random_state)
+    indices = np.sort(rng.choice(len(X), size=min(sample_size, len(X)), replace=False))
+    reference = _stratified_sample(labels, reference_size, rng)
+    values = silhouette_values(X, labels, indices, reference, working_memory)
+    return _mean_ci(values, len(X))
+
+
+def _mean_ci(values, n_total):
+    # 样本轮廓系数的均值及其正态近似95%置信区间
+    mean = float(values.mean())
+    # 有限总体修正：样本越接近全体，区间越窄
+    fpc = np.sqrt(max(n_total - len(values), 0) / max(n_total - 1, 1))
+    half_width = Z_95 * float(values.std(ddof=1)) / np.sqrt(len(values)) * fpc if len(values) > 1 else 0.0
+    return mean, (mean - half_width, mean + half_width)
+
+
+def _undefined_metrics():
+    # 簇数不足 2 或每个点各成一簇时，指标无意义
+    return {
+        'silhouette': 'N/A',
+        'silhouette_mode': 'none',
+        'calinski_harabasz': 'N/A',
+        'davies_bouldin': 'N/A'
+    }
+
+
+def compute_cluster_metrics(X, labels, mode='auto', exact_max_points=None, sample_size=None,
+                            random_state=42):
+    """计算聚类质量指标：轮廓系数、Calinski-Harabasz 指数和 Davies-Bouldin 指数
+
+    mode='auto' 时数据量不超过 exact_max_points 用精确的轮廓系数，否则抽样估计；
+    返回结果中的 silhouette_mode 说明实际采用的方式。簇数不足 2 或每个点各成一簇时，
+    指标无意义，返回 'N/A'。
+    """
+    if mode not in SILHOUETTE_MODES:
+        raise ValueError(f'不支持的轮廓系数计算方式: {mode}')
+    exact_max_points = exact_max_points or Config.METRICS_EXACT_MAX_POINTS
+    sample_size = sample_size or Config.METRICS_SAMPLE_SIZE
+
+    X = np.asarray(X, dtype=np.float64)
+    labels = np.asarray(labels)
+    n_labels = len(np.unique(labels))
+    if n_labels < 2 or n_labels >= len(X):
+        return _undefined_metrics()
+
+    if mode == 'auto':
+        mode = 'exact' if len(X) <= exact_max_points else 'sampled'
+
+    metrics = {}
+    if mode == 'exact' or sample_size >= len(X):
+        metrics['silhouette'] = round(silhouette_exact(X, labels), 4)
+        metrics['silhouette_mode'] = 'exact'
+    else:
+        estimate, (low, high) = silhouette_sampled(X, labels, sample_size, random_state=random_state)
+        metrics['silhouette'] = round(estimate, 4)
+        metrics['silhouette_mode'] = 'sampled'
+        metrics['silhouette_ci'] = [round(float(low), 4), round(float(high), 4)]
+        metrics['silhouette_sample_size'] = int(sample_size)
+
+    # 这两个指标只需簇中心和簇内统计量；簇中心之间的距离按块计算
+    metrics['calinski_harabasz'] = round(calinski_harabasz(X, labels), 4)
+    metrics['davies_bouldin'] = round(davies_bouldin(X, labels), 4)
+    return metrics
+
+
+def compare_labelings(X, labelings, original_labels=None, exact_max_points=None, sample_size=None,
+                      reference_size=None, random_state=42):
+    """在同一坐标空间中对比多组聚类结果，返回每组的指标列表
+
+    每组的字段与 compute_cluster_metrics 相同，另加簇数、噪声点数，原始簇标签至少有两类时
+    再加调整兰德指数（adjusted_rand）。各组的轮廓系数共用一遍分块距离计算；数据量超过
+    exact_max_points 时各组使用同一批样本点和参考点（参考点均匀抽取，不按某一组标签分层）。
+    """
+    exact_max_points = exact_max_points or Config.METRICS_EXACT_MAX_POINTS
+    sample_size = sample_size or Config.METRICS_SAMPLE_SIZE
+    reference_size = reference_size or Config.METRICS_REFERENCE_SIZE
+
+    X = np.asarray(X, dtype=np.float64)
+    n = len(X)
+    labelings = [np.asarray(labels) for labels in labelings]
+    exact = n <= exact_max_points or sample_size >= n
+    indices = reference = None
+    if not exact:
+        rng = np.random.default_rng(random_state)
+        indices = np.sort(rng.choice(n, size=sample_size, replace=False))
+        reference = np.sort(rng.choice(n, size=min(reference_size, n), replace=False))
+
+    defined = [i for i, labels in enumerate(labelings) if 2 <= len(np.unique(labels)) < n]
+    values = silhouette_values_many(X, [labelings[i] for i in defined], indices, reference) if defined else []
+    scores = dict(zip(defined, values))
+    with_truth = original_labels is not None and len(np.unique(original_labels)) >= 2
+
+    rows = []
+    for i, labels in enumerate(labelings):
+        row = {
+            'clusters': int(len(np.unique(labels[labels >= 0]))),
+            'noise_points': int((labels == -1).sum())
+        }
+        if i in scores:
+            if exact:
+                row['silhouette'] = round(float(scores[i].mean()), 4)
+                row['silhouette_mode'] = 'exact'
+            else:
+                estimate, (low, high) = _mean_ci(scores[i], n)
+                row['silhouette'] = round(estimate, 4)
+                row['silhouette_mode'] = 'sampled'
+                row['silhouette_ci'] = [round(float(low), 4), round(float(high), 4)]
+                row['silhouette_sample_size'] = int(sample_size)
+            row['calinski_harabasz'] = round(calinski_harabasz(X, labels), 4)
+            row['davies_bouldin'] = round(davies_bouldin(X, labels), 4)
+        else:
+            row.update(_undefined_metrics())
+        if with_truth:
+            row['adjusted_rand'] = round(float(adjusted_rand_score(original_labels, labels)), 4)
+        rows.append(row)
+    return rows
+
+
+def find_knee(x, y):
+    """曲线的拐点（肘部）下标：把曲线归一化到单位正方形后，离首尾两点连线最远的点
+
+    对下降的凸曲线（如SSE随K变化）和上升的凸曲线（如k距离图）都适用；点数少于3时返回 None。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) < 3:
+        return None
+    x_span = x[-1] - x[0]
+    y_span = y.max() - y.min()
+    if x_span == 0 or y_span == 0:
+        return None
+    xn = (x - x[0]) / x_span
+    yn = (y - y.min()) / y_span
+    # 点到首尾连线的距离（省略分母常数）
+    dx, dy = xn[-1] - xn[0], yn[-1] - yn[0]
+    distances = np.abs(dy * (xn - xn[0]) - dx * (yn - yn[0]))
+    return int(distances.argmax())
@@ -0,0 +1,585 @@
+import base64
+import json
+import numpy as np
+
+# 模拟结果支持的响应格式：dict 为默认的逐点字典格式，columnar 为按列编码的紧凑格式
+RESPONSE_FORMATS = ('dict', 'columnar')
+
+# 帧编码方式：full 为每帧完整快照，delta 为关键帧 + 稀疏差异
+FRAME_ENCODINGS = ('full', 'delta')
+
+# 变化点超过该比例时，差异不比关键帧小，直接发送关键帧
+DELTA_KEYFRAME_RATIO = 0.25
+
+# 细节层次（LOD）：none 发送全部点，subsample 发送分层抽样的子集，grid 发送每个簇的二维直方图，
+# auto 在点数超过视口容量时自动改为 subsample
+LOD_MODES = ('auto', 'none', 'subsample', 'grid')
+
+# 抽样时每个点在视口中大约占 LOD_POINT_PIXELS × LOD_POINT_PIXELS 像素，据此确定抽样点数的上限
+LOD_POINT_PIXELS = 4
+
+# 密度网格每个格子对应的像素数
+LOD_GRID_CELL_PIXELS = 6
+
+# 分层抽样时空间分层的网格大小（每个方向的格子数）
+LOD_STRATA_BINS = 64
+
+
+def make_frame(description, labels, centroids=None, probability=None, original=False, metrics=None,
+               dendrogram=None):
+    """构造一帧模拟状态（内部使用数组表示，渲染时再转换为具体的响应格式）
+
+    centroids 为 None 时该帧不包含质心字段；probability 为每个点的最大隶属概率；
+    original 表示该帧的点需要附带原始簇标签；dendrogram 为层次聚类的合并表（见 format_dendrogram）。
+    """
+    return {
+        'description': description,
+        'labels': np.asarray(labels),
+        'centroids': None if centroids is None else np.asarray(centroids, dtype=np.float64).reshape(-1, 2),
+        'probability': None if probability is None else np.asarray(probability),
+        'original': original,
+        'metrics': metrics or {},
+        'dendrogram': dendrogram
+    }
+
+
+def format_points(coords, labels, **extra):
+    """把坐标列表和标签数组组装成前端需要的点字典列表"""
+    labels = np.asarray(labels).tolist()
+    if not extra:
+        return [{'x': x, 'y': y, 'cluster': c} for (x, y), c in zip(coords, labels)]
+    extra = {key: np.asarray(value).tolist() for key, value in extra.items()}
+    return [
+        {'x': x, 'y': y, 'cluster': c, **{key: value[i] for key, value in extra.items()}}
+        for i, ((x, y), c) in enumerate(zip(coords, labels))
+    ]
+
+
+def format_centroids(centroids):
+    """把质心数组转换为前端需要的格式"""
+    return [{'x': float(c[0]), 'y': float(c[1]), 'cluster': i}
+            for i, c in enumerate(np.asarray(centroids))]
+
+
+def format_dendrogram(dendrogram, response_format):
+    """渲染层次聚类的合并表（与scipy的linkage矩阵相同的约定）
+
+    第 i 次合并把编号为 left[i] 和 right[i] 的两个簇合并为编号 n + i 的新簇，
+    编号小于 n 的是单个数据点；distance 为合并距离，size 为新簇的点数，
+    leaves 为树状图从左到右的叶子顺序。客户端按顺序执行前 n - m 次合并即可得到 m 个簇。
+    """
+    n_points = len(dendrogram['leaves'])
+    if response_format == 'dict':
+        return {
+            'left': dendrogram['left'].tolist(),
+            'right': dendrogram['right'].tolist(),
+            'distance': dendrogram['distance'].round(6).tolist(),
+            'size': dendrogram['size'].tolist(),
+            'leaves': dendrogram['leaves'].tolist()
+        }
+    return {
+        'left': encode_indices(dendrogram['left'], 2 * n_points),
+        'right': encode_indices(dendrogram['right'], 2 * n_points),
+        'distance': encode_array(dendrogram['distance'], np.float32),
+        'size': encode_indices(dendrogram['size'], n_points + 1),
+        'leaves': encode_indices(dendrogram['leaves'], n_points)
+    }
+
+
+def label_dtype(labels):
+    """选择能容纳全部标签（含 -1）的最小整数类型"""
+    labels = np.asarray(labels)
+    if labels.size == 0:
+        return np.dtype('<i1')
+    low, high = int(labels.min()), int(labels.max())
+    for dtype in ('<i1', '<i2', '<i4'):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    raise ValueError('标签超出 int32 范围')
+
+
+def encode_array(array, dtype):
+    """把数组按指定的小端类型编码为 base64，前端可直接用 TypedArray 读取"""
+    array = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {
+        'dtype': array.dtype.name,
+        'shape': list(array.shape),
+        'data': base64.b64encode(array.tobytes()).decode('ascii')
+    }
+
+
+def encode_labels(labels):
+    """标签编码为 int8/int16（按取值范围自动选择）"""
+    return encode_array(labels, label_dtype(labels))
+
+
+def quantize_probability(probability):
+    """概率量化为 0-255 的 uint8 等级"""
+    return np.rint(np.clip(np.asarray(probability, dtype=np.float64), 0, 1) * 255).astype(np.uint8)
+
+
+def encode_probability(probability):
+    """概率量化为 uint8，还原方式为 value / scale"""
+    return {**encode_array(quantize_probability(probability), np.uint8), 'scale': 255}
+
+
+def encode_indices(indices, n_points):
+    """点下标编码为 uint16/uint32（按点数自动选择）"""
+    dtype = np.uint16 if n_points <= np.iinfo(np.uint16).max + 1 else np.uint32
+    return encode_array(indices, dtype)
+
+
+def diff_frames(prev, frame):
+    """计算相邻两帧之间的稀疏差异
+
+    返回变化点的下标、新标签（及新概率），以及移动过的质心下标；当两帧结构不同
+    或变化点过多（差异不比关键帧小）时返回 None，表示应发送完整关键帧。
+    概率按 uint8 量化等级比较，变化小于 1/255 的点视为未变化。
+    """
+    if prev is None or len(frame['labels']) != len(prev['labels']):
+        return None
+    if (frame['probability'] is None) != (prev['probability'] is None):
+        return None
+    if frame['centroids'] is None and prev['centroids'] is not None:
+        return None
+
+    changed = frame['labels'] != prev['labels']
+    if frame['probability'] is not None:
+        changed |= quantize_probability(frame['probability']) != quantize_probability(prev['probability'])
+    indices = np.flatnonzero(changed)
+    if len(indices) > DELTA_KEYFRAME_RATIO * len(changed):
+        return None
+
+    delta = {
+        'indices': indices,
+        'labels': frame['labels'][indices],
+        'probability': None if frame['probability'] is None else frame['probability'][indices],
+        'centroids': None,
+        'moved_centroids': None
+    }
+    current, previous = frame['centroids'], prev['centroids']
+    if current is not None:
+        if previous is not None and current.shape == previous.shape:
+            delta['moved_centroids'] = np.flatnonzero(np.any(current != previous, axis=1))
+        else:
+            # 质心数量变化（如从无到有）时整体替换
+            delta['centroids'] = current
+    return delta
+
+
+def _grid_cells(X, bins, extent):
+    """每个点所在的网格编号（行优先：gy * bins_x + gx）"""
+    x_min, x_max, y_min, y_max = extent
+    bins_x, bins_y = bins
+    gx = ((X[:, 0] - x_min) / max(x_max - x_min, 1e-12) * bins_x).astype(np.int64)
+    gy = ((X[:, 1] - y_min) / max(y_max - y_min, 1e-12) * bins_y).astype(np.int64)
+    np.clip(gx, 0, bins_x - 1, out=gx)
+    np.clip(gy, 0, bins_y - 1, out=gy)
+    return gy * bins_x + gx
+
+
+def _extent(X):
+    low, high = X.min(axis=0), X.max(axis=0)
+    return [float(low[0]), float(high[0]), float(low[1]), float(high[1])]
+
+
+def stratified_subsample(X, size, bins=LOD_STRATA_BINS, seed=0):
+    """按空间网格分层抽取 size 个点，返回升序的下标
+
+    每个格子内的点随机排序，点的优先级为其在格子内的相对位置（名次 / 格内点数），
+    取优先级最小的 size 个点：各格子按点数比例分配名额，稀疏区域（离群点、噪声）
+    的第一个点优先级为 0，不会因为比例太小而整片消失。
+    """
+    n = len(X)
+    if size >= n:
+        return np.arange(n)
+    cells = _grid_cells(X, (bins, bins), _extent(X))
+    order = np.lexsort((np.random.default_rng(seed).random(n), cells))
+    counts = np.bincount(cells, minlength=bins * bins)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    sorted_cells = cells[order]
+    priority = np.empty(n)
+    priority[order] = (np.arange(n) - starts[sorted_cells]) / counts[sorted_cells]
+    return np.sort(np.argpartition(priority, size - 1)[:size])
+
+
+def plan_lod(X, lod):
+    """按LOD选项和视口大小确定渲染方式；返回 None 表示发送全部点
+
+    lod 为 {'mode': LOD_MODES 之一, 'viewport': [宽, 高]}（像素）。
+    subsample 在点数超过视口容量时返回抽样下标，grid 返回网格大小、范围和每个点的网格编号。
+    """
+    if not lod or lod.get('mode', 'none') == 'none':
+        return None
+    mode = lod['mode']
+    if mode not in LOD_MODES:
+        raise ValueError(f'不支持的LOD模式: {mode}')
+    width, height = lod.get('viewport') or (600, 600)
+    n = len(X)
+
+    if mode == 'grid':
+        bins = [max(1, int(width) // LOD_GRID_CELL_PIXELS), max(1, int(height) // LOD_GRID_CELL_PIXELS)]
+        extent = _extent(X) if n else [0.0, 1.0, 0.0, 1.0]
+        return {'mode': 'grid', 'bins': bins, 'extent': extent, 'cells': _grid_cells(X, bins, extent)}
+
+    capacity = max(1, int(width) // LOD_POINT_PIXELS) * max(1, int(height) // LOD_POINT_PIXELS)
+    if n <= capacity:
+        return None
+    return {'mode': 'subsample', 'indices': stratified_subsample(X, capacity)}
+
+
+def _subsample_frames(frame_iter, indices):
+    # 透传帧生成器，每帧只保留抽中的点；质心和指标不变（仍由全部数据计算）
+    while True:
+        try:
+            frame = next(frame_iter)
+        except StopIteration as stop:
+            return stop.value
+        yield {
+            **frame,
+            'labels': frame['labels'][indices],
+            'probability': None if frame['probability'] is None else frame['probability'][indices]
+        }
+
+
+def grid_histogram(cells, n_cells, labels, probability=None):
+    """按 (簇标签, 网格) 统计点数，只返回非空的组合；带概率时同时给出每个组合的平均概率"""
+    labels = np.asarray(labels, dtype=np.int64)
+    offset = int(labels.min()) if labels.size else 0
+    keys, inverse, counts = np.unique((labels - offset) * n_cells + cells,
+                                      return_inverse=True, return_counts=True)
+    histogram = {
+        'cells': keys % n_cells,
+        'clusters': keys // n_cells + offset,
+        'counts': counts
+    }
+    if probability is not None:
+        histogram['probability'] = np.bincount(inverse, weights=probability, minlength=len(keys)) / counts
+    return histogram
+
+
+def _render_grid(histogram, response_format, n_cells):
+    """渲染一个直方图：dict 格式为列表，columnar 格式为 base64 编码的数组"""
+    if response_format == 'dict':
+        grid = {key: value.tolist() for key, value in histogram.items() if key != 'probability'}
+        if 'probability' in histogram:
+            grid['probability'] = histogram['probability'].round(4).tolist()
+        return grid
+    count_dtype = np.uint16 if histogram['counts'].max(initial=0) <= np.iinfo(np.uint16).max else np.uint32
+    grid = {
+        'cells': encode_indices(histogram['cells'], n_cells),
+        'clusters': encode_labels(histogram['clusters']),
+        'counts': encode_array(histogram['counts'], count_dtype)
+    }
+    if 'probability' in histogram:
+        grid['probability'] = encode_probability(histogram['probability'])
+    return grid
+
+
+def _render_grid_step(index, frame, plan, response_format):
+    """渲染一帧密度网格：每个簇在各网格中的点数（及平均概率），不再逐点发送"""
+    n_cells = plan['bins'][0] * plan['bins'][1]
+    step = {
+        'step': index + 1,
+        'description': frame['description'],
+        'grid': _render_grid(grid_histogram(plan['cells'], n_cells, frame['labels'], frame['probability']),
+                             response_format, n_cells)
+    }
+    if frame['centroids'] is not None:
+        step['centroids'] = format_centroids(frame['centroids'])
+    if frame['dendrogram'] is not None:
+        step['dendrogram'] = format_dendrogram(frame['dendrogram'], response_format)
+    step['metrics'] = frame['metrics']
+    return step
+
+
+def _render_dict_keyframe(coords, frame, original_clusters, with_original):
+    """渲染一帧完整的逐点字典"""
+    extra = {}
+    if frame['probability'] is not None:
+        extra['probability'] = frame['probability']
+    if with_original and original_clusters is not None:
+        extra['originalCluster'] = original_clusters
+
+    step = {
+        'description': frame['description'],
+        'points': format_points(coords, frame['labels'], **extra)
+    }
+    if frame['centroids'] is not None:
+        step['centroids'] = format_centroids(frame['centroids'])
+    return step
+
+
+def _render_columnar_keyframe(frame):
+    """渲染一帧完整的按列编码数据：坐标不再重复，只携带标签和概率数组"""
+    step = {
+        'description': frame['description'],
+        'labels': encode_labels(frame['labels'])
+    }
+    if frame['probability'] is not None:
+        step['probability'] = encode_probability(frame['probability'])
+    if frame['centroids'] is not None:
+        step['centroids'] = format_centroids(frame['centroids'])
+    return step
+
+
+def _render_delta(frame, delta, response_format, n_points):
+    """渲染一帧稀疏差异"""
+    if response_format == 'dict':
+        changes = {
+            'indices': delta['indices'].tolist(),
+            'clusters': delta['labels'].tolist()
+        }
+        if delta['probability'] is not None:
+            changes['probability'] = delta['probability'].tolist()
+    else:
+        changes = {
+            'indices': encode_indices(delta['indices'], n_points),
+            'clusters': encode_labels(delta['labels'])
+        }
+        if delta['probability'] is not None:
+            changes['probability'] = encode_probability(delta['probability'])
+
+    step = {
+        'description': frame['description'],
+        'changes': changes
+    }
+    if delta['centroids'] is not None:
+        step['centroids'] = format_centroids(delta['centroids'])
+    elif delta['moved_centroids'] is not None:
+        step['moved_centroids'] = [
+            {'x': float(frame['centroids'][i, 0]), 'y': float(frame['centroids'][i, 1]), 'cluster': int(i)}
+            for i in delta['moved_centroids']
+        ]
+    return step
+
+
+def _render_step(coords, n_points, index, frame, prev, original_clusters, response_format, frame_encoding):
+    """按响应格式和帧编码方式渲染一帧（delta 编码时与上一帧比较）"""
+    delta = diff_frames(prev, frame) if frame_encoding == 'delta' else None
+    if delta is not None:
+        step = _render_delta(frame, delta, response_format, n_points)
+    elif response_format == 'dict':
+        # 差异编码时原始簇标签只能随关键帧下发，因此关键帧总是附带
+        with_original = frame['original'] or frame_encoding == 'delta'
+        step = _render_dict_keyframe(coords, frame, original_clusters, with_original)
+    else:
+        step = _render_columnar_keyframe(frame)
+
+    step = {'step': index + 1, **step}
+    if frame_encoding == 'delta':
+        step['keyframe'] = delta is None
+    if frame['dendrogram'] is not None:
+        step['dendrogram'] = format_dendrogram(frame['dendrogram'], response_format)
+    step['metrics'] = frame['metrics']
+    return step
+
+
+def _render_header(X, original_clusters, response_format, frame_encoding):
+    """渲染响应中与帧无关的部分（列式格式的坐标、原始簇标签等）"""
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f'不支持的响应格式: {response_format}')
+    if frame_encoding not in FRAME_ENCODINGS:
+        raise ValueError(f'不支持的帧编码方式: {frame_encoding}')
+
+    if response_format == 'dict':
+        header = {}
+    else:
+        header = {
+            'format': 'columnar',
+            'encoding': 'base64',
+            'n_points': len(X),
+            'coordinates': encode_array(X, np.float32)
+        }
+        if original_clusters is not None:
+            header['original_clusters'] = encode_labels(original_clusters)
+    if frame_encoding == 'delta':
+        header['frame_encoding'] = 'delta'
+    return header
+
+
+def _render_grid_header(X, original_clusters, plan, response_format, frame_encoding):
+    """密度网格模式的头部：网格大小和范围，以及原始簇标签的直方图（不发送坐标）"""
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f'不支持的响应格式: {response_format}')
+    if frame_encoding != 'full':
+        raise ValueError('密度网格模式只支持 full 帧编码')
+    header = {'format': 'columnar', 'encoding': 'base64'} if response_format == 'columnar' else {}
+    header['lod'] = {
+        'mode': 'grid',
+        'n_points': len(X),
+        'bins': plan['bins'],
+        'extent': plan['extent']
+    }
+    if original_clusters is not None:
+        n_cells = plan['bins'][0] * plan['bins'][1]
+        header['original_grid'] = _render_grid(grid_histogram(plan['cells'], n_cells, original_clusters),
+                                               response_format, n_cells)
+    return header
+
+
+def iter_payload(X, frame_iter, original_clusters=None, response_format='dict', frame_encoding='full',
+                 lod=None):
+    """边计算边渲染：依次产出 ('header', 头部)、每帧的 ('step', 步骤) 和最后的 ('metrics', 指标)
+
+    frame_iter 为帧生成器，生成器结束时的返回值即为最终指标。
+    把全部片段按顺序拼回去（steps 放入列表），结果与 build_payload 完全相同。
+    lod 见 plan_lod：聚类始终在全部数据上进行，只有渲染的点数受视口大小限制。
+    """
+    plan = plan_lod(X, lod)
+    if plan is not None and plan['mode'] == 'grid':
+        yield 'header', _render_grid_header(X, original_clusters, plan, response_format, frame_encoding)
+        index = 0
+        while True:
+            try:
+                frame = next(frame_iter)
+            except StopIteration as stop:
+                yield 'metrics', stop.value
+                return
+            yield 'step', _render_grid_step(index, frame, plan, response_format)
+            index += 1
+
+    n_total = len(X)
+    if plan is not None:
+        indices = plan['indices']
+        X = X[indices]
+        if original_clusters is not None:
+            original_clusters = np.asarray(original_clusters)[indices]
+        frame_iter = _subsample_frames(frame_iter, indices)
+
+    header = _render_header(X, original_clusters, response_format, frame_encoding)
+    if plan is not None:
+        header['lod'] = {
+            'mode': 'subsample',
+            'n_points': n_total,
+            'n_sampled': len(X),
+            # 抽中的点在完整数据集中的下标（升序）
+            'indices': plan['indices'].tolist() if response_format == 'dict'
+            else encode_indices(plan['indices'], n_total)
+        }
+    yield 'header', header
+
+    coords = X.tolist() if response_format == 'dict' else None
+    prev = None
+    index = 0
+    while True:
+        try:
+            frame = next(frame_iter)
+        except StopIteration as stop:
+            metrics = stop.value
+            break
+        yield 'step', _render_step(coords, len(X), index, frame, prev, original_clusters,
+                                   response_format, frame_encoding)
+        prev = frame
+        index += 1
+    yield 'metrics', metrics
+
+
+def _iter_frames(frames, metrics):
+    # 把已完成的帧列表包装成帧生成器，结束时返回指标
+    yield from frames
+    return metrics
+
+
+def frame_changes(X, frames):
+    """每一帧相对上一帧的变化量（第一帧为 inf）：标签改变的点的比例 + 质心最大位移（相对数据范围）
+    + 平均概率变化；结构不同（如质心从无到有）的相邻两帧记为 1
+    """
+    scale = float(np.hypot(*np.ptp(X, axis=0))) if len(X) else 1.0
+    scale = scale or 1.0
+    changes = [np.inf]
+    for prev, frame in zip(frames, frames[1:]):
+        change = 0.0
+        if len(frame['labels']) == len(prev['labels']) and len(frame['labels']):
+            change += float(np.mean(frame['labels'] != prev['labels']))
+        current, previous = frame['centroids'], prev['centroids']
+        if current is not None and previous is not None and current.shape == previous.shape:
+            if len(current):
+                change += float(np.sqrt(((current - previous) ** 2).sum(axis=1)).max()) / scale
+        elif current is not None or previous is not None:
+            change += 1.0
+        if frame['probability'] is not None and prev['probability'] is not None:
+            change += float(np.abs(frame['probability'].astype(np.float64) - prev['probability']).mean())
+        changes.append(change)
+    return changes
+
+
+def _pinned_frames(frames):
+    # 必须保留的帧：第一帧、最后一帧和携带层次聚类合并表的帧（客户端按合并表切割树状图）
+    return sorted({0, len(frames) - 1} | {i for i, frame in enumerate(frames) if frame['dendrogram'] is not None})
+
+
+def select_frames(X, frames, max_frames):
+    """在 max_frames 帧以内保留第一帧、最后一帧、携带合并表的帧和变化最大的中间帧，返回保留帧的下标（升序）"""
+    n_frames = len(frames)
+    if max_frames is None or n_frames <= max_frames:
+        return list(range(n_frames))
+    pinned = _pinned_frames(frames)
+    keep = max(0, max(2, int(max_frames)) - len(pinned))
+    changes = frame_changes(X, frames)
+    # 变化量相同时保留较早的帧
+    candidates = [i for i in range(1, n_frames - 1) if i not in pinned]
+    middle = sorted(candidates, key=lambda i: (-changes[i], i))[:keep]
+    return sorted(pinned + middle)
+
+
+def _payload_size(X, frames, metrics, original_clusters, response_format, frame_encoding, lod):
+    # 与 simulation_body 的序列化方式一致（默认分隔符带空格，非ASCII字符转义），保证估计不偏小
+    payload = build_payload(X, frames, metrics, original_clusters, response_format, frame_encoding, lod)
+    return len(json.dumps(payload, default=str).encode('utf-8'))
+
+
+def apply_frame_budget(X, frames, metrics, original_clusters=None, response_format='dict', frame_encoding='full',
+                       lod=None, max_frames=None, max_bytes=None):
+    """按帧数和字节数预算精简帧序列，返回 (保留的帧, 预算信息)
+
+    字节预算按"只有头部和指标"与"再加一帧完整关键帧"（第一帧和最后一帧中较大的一帧）两次实际渲染的
+    大小之差估计每帧的开销（已计入响应格式和LOD；差异编码的帧不会比关键帧大），换算成帧数后与 max_frames 取较小者。
+    无论预算多小都至少保留第一帧、最后一帧和携带层次聚类合并表的帧。
+    """
+    limit = None if max_frames is None else int(max_frames)
+    if max_bytes is not None and len(frames) > 2:
+        base = _payload_size(X, [], metrics, original_clusters, response_format, frame_encoding, lod)
+        per_frame = max(_payload_size(X, [frames[i]], metrics, original_clusters, response_format,
+                                      frame_encoding, lod) for i in _pinned_frames(frames)) - base
+        by_bytes = (int(max_bytes) - base) // max(per_frame, 1)
+        limit = by_bytes if limit is None else min(limit, by_bytes)
+
+    kept = select_frames(X, frames, limit)
+    info = {
+        'total_frames': len(frames),
+        'kept_frames': len(kept),
+        # 保留的帧在完整轨迹中的序号（从 1 开始），与 steps 一一对应
+        'source_steps': [i + 1 for i in kept]
+    }
+    return [frames[i] for i in kept], info
+
+
+def build_payload(X, frames, metrics, original_clusters=None, response_format='dict', frame_encoding='full',
+                  lod=None, frame_budget=None):
+    """把模拟帧序列渲染为指定格式的响应体
+
+    frame_encoding='delta' 时第一帧为完整关键帧，之后的帧只携带变化点的下标和新标签，
+    以及移动过的质心；客户端按顺序把差异叠加到上一帧即可还原任意一帧。
+    frame_budget 为 {'max_frames': 帧数上限, 'max_bytes': 字节数上限}（见 apply_frame_budget），
+    给出时响应中附带 frame_budget 字段说明保留了哪些帧。
+    """
+    payload = {}
+    steps = []
+    budget_info = None
+    if frame_budget:
+        frames, budget_info = apply_frame_budget(X, frames, metrics, original_clusters, response_format,
+                                                 frame_encoding, lod, **frame_budget)
+    for kind, content in iter_payload(X, _iter_frames(frames, metrics), original_clusters,
+                                      response_format, frame_encoding, lod):
+        if kind == 'header':
+            payload.update(content)
+            if budget_info is not None:
+                payload['frame_budget'] = budget_info
+        elif kind == 'step':
+            steps.append(content)
+        else:
+            payload['steps'] = steps
+            payload['metrics'] = content
+    return payload
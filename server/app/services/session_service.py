@@ -0,0 +1,265 @@
+import json
+import threading
+import time
+import uuid
+
+from flask import current_app
+from scipy.sparse import issparse
+from sklearn.neighbors import KDTree
+from sklearn.preprocessing import StandardScaler
+
+from app.config import Config
+from app.utils.cache_utils import estimate_nbytes
+from app.utils.exceptions import NotFoundException, QuotaExceededException
+from .dataset_service import load_dataset, dataset_key
+from .geometry_service import GeometryCache
+from .simulation_cache_service import simulation_cache
+
+# 会话元数据在 Redis 中的键前缀
+SESSION_KEY_PREFIX = 'simulation-session:'
+
+# 几何结构的坐标空间：raw 为原始坐标（K-Means、GMM、层次聚类），scaled 为标准化坐标（DBSCAN、k距离图）
+GEOMETRY_SPACES = ('raw', 'scaled')
+
+
+def _nbytes(value):
+    """常驻数据占用的字节数（KD树和稀疏矩阵按其内部数组累加）"""
+    if isinstance(value, KDTree):
+        return sum(array.nbytes for array in value.get_arrays())
+    if issparse(value):
+        return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    if isinstance(value, tuple):
+        return sum(_nbytes(item) for item in value)
+    return estimate_nbytes(value)
+
+
+class SimulationSession:
+    """一次实验的服务端会话：绑定一个数据集，并保留由它派生的结构供后续模拟复用
+
+    常驻数据（坐标和原始簇标签、标准化副本、各坐标空间的几何结构和DBSCAN的密度结构等）在第一次使用时
+    计算并保留，同一会话上调整参数重新模拟时不必重新生成数据、标准化或建树。
+    常驻数据可以随时被释放（内存不足时由会话存储淘汰），之后再用到时重新计算，结果不变。
+    """
+
+    def __init__(self, user_id, dataset, session_id=None, created_at=None, on_grow=None):
+        self.id = session_id or uuid.uuid4().hex
+        self.user_id = str(user_id)
+        self.dataset = dataset  # 数据来源参数（见 clustering_service.parse_session_params）
+        self.created_at = created_at or time.time()
+        self.last_used = time.time()
+        self._on_grow = on_grow
+        self._warm = {}
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        """数据集键，与全局的密度结构缓存共用"""
+        return dataset_key(self.dataset)
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size in list(self._warm.values()))
+
+    def memo(self, name, compute):
+        """读取常驻数据，没有时调用 compute() 计算并保留
+
+        compute 在锁外执行（与 LRUCache.get_or_create 相同，并发时可能重复计算）；
+        保留前先向会话存储申请空间，超出用户的内存上限时只返回结果而不保留。
+        """
+        entry = self._warm.get(name)
+        if entry is not None:
+            return entry[0]
+        value = compute()
+        size = _nbytes(value)
+        if self._on_grow is None or self._on_grow(self, size):
+            with self._lock:
+                self._warm[name] = (value, size)
+        return value
+
+    def peek(self, name):
+        """读取常驻数据，没有时返回 None（不触发计算）"""
+        entry = self._warm.get(name)
+        return None if entry is None else entry[0]
+
+    def discard(self, name):
+        """丢弃一项常驻数据（如被新的 ε 取代的邻域图），不存在时忽略"""
+        with self._lock:
+            self._warm.pop(name, None)
+
+    def arrays(self):
+        """坐标数组和原始簇标签"""
+        return self.memo('dataset', lambda: load_dataset(self.dataset))
+
+    def scaled(self):
+        """标准化后的坐标，与 DBSCAN 和k距离图使用的空间一致"""
+        return self.memo('scaled', lambda: StandardScaler().fit_transform(self.arrays()[0]))
+
+    def geometry(self, space='scaled'):
+        """某个坐标空间上的几何结构缓存（KD树、k近邻、ε邻域图等），结构保留在会话中"""
+        if space not in GEOMETRY_SPACES:
+            raise ValueError(f'不支持的坐标空间: {space}')
+        X = self.scaled() if space == 'scaled' else self.arrays()[0]
+        return GeometryCache(X, store=self, prefix=f'{space}:')
+
+    def release(self):
+        """释放全部常驻数据，会话本身仍然有效"""
+        with self._lock:
+            self._warm.clear()
+
+    def to_dict(self, ttl):
+        return {
+            'session_id': self.id,
+            'dataset': self.dataset,
+            'n_points': int(self.dataset['point_count']),
+            'warm': sorted(str(name) for name in list(self._warm)),
+            'nbytes': self.nbytes,
+            'created_at': self.created_at,
+            'expires_at': self.last_used + ttl
+        }
+
+
+class SimulationSessionStore:
+    """实验会话的存储：会话空闲超过 ttl 秒后过期，每个用户的常驻数据不超过 max_user_bytes
+
+    常驻数据是NumPy数组和KD树，只能保存在进程内存中；配置了 Redis 时，会话元数据
+    （所属用户和数据来源）同时写入 Redis，其它工作进程收到同一会话ID的请求时据此重建会话，
+    常驻数据在该进程内重新计算。内存上限在每个进程内分别执行：超出时先释放该用户
+    最久未使用的其它会话的常驻数据，会话ID不受影响。
+    """
+
+    def __init__(self, ttl=1800, max_user_bytes=256 * 1024 * 1024, max_user_sessions=8, cache=None):
+        self.ttl = ttl
+        self.max_user_bytes = max_user_bytes
+        self.max_user_sessions = max_user_sessions
+        self.cache = cache
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.releases = 0
+
+    @classmethod
+    def from_config(cls, config=Config):
+        return cls(
+            ttl=config.SIMULATION_SESSION_TTL,
+            max_user_bytes=config.SIMULATION_SESSION_MAX_USER_BYTES,
+            max_user_sessions=config.SIMULATION_SESSION_MAX_COUNT,
+            cache=simulation_cache
+        )
+
+    def _redis(self):
+        return self.cache.redis_client() if self.cache is not None else None
+
+    def _redis_call(self, method, *args, **kwargs):
+        """调用 Redis 命令；Redis 不可用或出错时返回 None（退回只使用进程内会话）"""
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            return getattr(client, method)(*args, **kwargs)
+        except Exception as e:
+            try:
+                current_app.logger.warning(f"模拟会话: Redis不可用，只使用进程内会话: {e}")
+            except RuntimeError:
+                pass
+            return None
+
+    def _user_sessions(self, user_id):
+        # 调用方需持有锁
+        return [session for session in self._sessions.values() if session.user_id == str(user_id)]
+
+    def _reserve(self, session, size):
+        """为会话新增 size 字节的常驻数据腾出空间，返回是否可以保留"""
+        with self._lock:
+            others = sorted((other for other in self._user_sessions(session.user_id) if other is not session),
+                            key=lambda other: other.last_used)
+            used = session.nbytes + sum(other.nbytes for other in others)
+            for other in others:
+                if used + size <= self.max_user_bytes:
+                    break
+                if other.nbytes:
+                    used -= other.nbytes
+                    other.release()
+                    self.releases += 1
+            return used + size <= self.max_user_bytes
+
+    def _purge_expired(self):
+        # 调用方需持有锁
+        deadline = time.time() - self.ttl
+        expired = [session_id for session_id, session in self._sessions.items() if session.last_used < deadline]
+        for session_id in expired:
+            del self._sessions[session_id]
+
+    def create(self, user_id, dataset):
+        """创建会话并预热数据集、标准化副本和标准化坐标上的KD树
+
+        会话数超过上限，或数据集本身就超过用户的内存上限时抛出 QuotaExceededException。
+        """
+        with self._lock:
+            self._purge_expired()
+            if len(self._user_sessions(user_id)) >= self.max_user_sessions:
+                raise QuotaExceededException(f'每个用户最多同时保留 {self.max_user_sessions} 个实验会话')
+        session = SimulationSession(user_id, dataset, on_grow=self._reserve)
+        points, labels = load_dataset(dataset)
+        if points.nbytes + labels.nbytes > self.max_user_bytes:
+            raise QuotaExceededException('数据集超过了实验会话的内存上限')
+        with self._lock:
+            self._sessions[session.id] = session
+        session.geometry().tree()
+
+        metadata = {'user_id': session.user_id, 'dataset': dataset, 'created_at': session.created_at}
+        self._redis_call('setex', SESSION_KEY_PREFIX + session.id, self.ttl, json.dumps(metadata))
+        return session
+
+    def _restore(self, session_id):
+        """按 Redis 中的元数据重建其它进程创建的会话（不含常驻数据）"""
+        data = self._redis_call('get', SESSION_KEY_PREFIX + session_id)
+        if data is None:
+            return None
+        metadata = json.loads(data)
+        session = SimulationSession(metadata['user_id'], metadata['dataset'], session_id=session_id,
+                                    created_at=metadata['created_at'], on_grow=self._reserve)
+        with self._lock:
+            return self._sessions.setdefault(session_id, session)
+
+    def get(self, session_id, user_id):
+        """取得会话并刷新过期时间；不存在、已过期或不属于该用户时抛出 NotFoundException"""
+        with self._lock:
+            self._purge_expired()
+            session = self._sessions.get(session_id)
+        if session is None and isinstance(session_id, str):
+            session = self._restore(session_id)
+        if session is None or session.user_id != str(user_id):
+            raise NotFoundException('实验会话不存在或已过期')
+        session.last_used = time.time()
+        self._redis_call('expire', SESSION_KEY_PREFIX + session.id, self.ttl)
+        return session
+
+    def list(self, user_id):
+        """本进程中该用户的全部会话（按创建时间排序）"""
+        with self._lock:
+            self._purge_expired()
+            sessions = self._user_sessions(user_id)
+        return sorted(sessions, key=lambda session: session.created_at)
+
+    def delete(self, session_id, user_id):
+        """删除会话并释放其常驻数据"""
+        session = self.get(session_id, user_id)
+        with self._lock:
+            self._sessions.pop(session.id, None)
+        session.release()
+        self._redis_call('delete', SESSION_KEY_PREFIX + session.id)
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            'ttl': self.ttl,
+            'max_user_bytes': self.max_user_bytes,
+            'sessions': len(sessions),
+            'users': len({session.user_id for session in sessions}),
+            'nbytes': sum(session.nbytes for session in sessions),
+            'releases': self.releases
+        }
+
+
+# 全局会话存储实例
+simulation_sessions = SimulationSessionStore.from_config()
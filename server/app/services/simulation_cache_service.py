@@ -0,0 +1,266 @@
+import hashlib
+import json
+import threading
+import time
+import zlib
+
+from flask import current_app
+
+from app.config import Config
+from app.utils.cache_utils import LRUCache
+
+try:
+    import redis
+except ImportError:  # redis 为可选依赖，缺失时只使用进程内缓存
+    redis = None
+
+# 响应格式变化时递增，使旧缓存自动失效
+CACHE_VERSION = 5
+
+# Redis 连接失败后，间隔多久再尝试重连（秒）
+REDIS_RETRY_INTERVAL = 30
+
+# 同一个键正在计算时，其它请求最多等待多久（秒），超时后自行计算
+COMPUTE_WAIT_TIMEOUT = 60
+REDIS_POLL_INTERVAL = 0.05
+
+
+def make_cache_key(algorithm, params):
+    """由算法名和参数生成规范化的缓存键（参数顺序不影响结果）"""
+    canonical = json.dumps(
+        {'algorithm': algorithm, 'params': params},
+        sort_keys=True,
+        separators=(',', ':'),
+        ensure_ascii=False,
+        default=str
+    )
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f'simulation:v{CACHE_VERSION}:{digest}'
+
+
+def json_options():
+    """当前应用JSON序列化的选项，传给工作进程后与 current_app.json.dumps 的输出一致"""
+    provider = current_app.json
+    return {
+        'ensure_ascii': getattr(provider, 'ensure_ascii', True),
+        'sort_keys': getattr(provider, 'sort_keys', True)
+    }
+
+
+def simulation_body(algorithm, result, options=None):
+    """把模拟结果序列化为响应体（bytes），同步接口和异步任务共用，保证缓存内容一致
+
+    options 为 json_options() 的结果，在没有应用上下文的工作进程中使用。
+    """
+    response = {
+        'status': 'success',
+        'algorithm': algorithm
+    }
+    response.update(result)
+    if options is not None:
+        return json.dumps(response, **options).encode('utf-8')
+    return current_app.json.dumps(response).encode('utf-8')
+
+
+class SimulationCache:
+    """模拟结果缓存：优先使用 Redis，Redis 不可用时退回进程内LRU
+
+    所有模型都固定 random_state，相同参数的模拟结果完全一致，因此缓存的是
+    序列化后的响应体（bytes），命中时连JSON编码也可以省掉。
+    """
+
+    def __init__(self, redis_url=None, ttl=3600, max_items=256, max_bytes=128 * 1024 * 1024,
+                 max_entry_bytes=16 * 1024 * 1024, enabled=True):
+        self.redis_url = redis_url
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.enabled = enabled
+        self.local = LRUCache(max_items=max_items, max_bytes=max_bytes, sizeof=len, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._redis_client = None
+        self._redis_retry_at = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    @classmethod
+    def from_config(cls, config=Config):
+        return cls(
+            redis_url=config.SIMULATION_CACHE_REDIS_URL,
+            ttl=config.SIMULATION_CACHE_TTL,
+            max_items=config.SIMULATION_CACHE_MAX_ITEMS,
+            max_bytes=config.SIMULATION_CACHE_MAX_BYTES,
+            max_entry_bytes=config.SIMULATION_CACHE_MAX_ENTRY_BYTES,
+            enabled=config.SIMULATION_CACHE_ENABLED
+        )
+
+    def _redis(self):
+        """获取 Redis 客户端；未安装、未配置或暂时不可用时返回 None"""
+        if redis is None or not self.redis_url:
+            return None
+        if self._redis_client is not None:
+            return self._redis_client
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        with self._lock:
+            if self._redis_client is None:
+                try:
+                    client = redis.Redis.from_url(self.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+                    client.ping()
+                    self._redis_client = client
+                except Exception as e:
+                    self._redis_failed(e)
+        return self._redis_client
+
+    def _redis_failed(self, error):
+        self.errors += 1
+        self._redis_client = None
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+        try:
+            current_app.logger.warning(f"模拟结果缓存: Redis不可用，使用进程内缓存: {error}")
+        except RuntimeError:
+            pass
+
+    def redis_client(self):
+        """共享的 Redis 客户端（实验会话等其它服务复用同一连接）；不可用时返回 None"""
+        return self._redis()
+
+    @property
+    def backend(self):
+        return 'redis' if self._redis() is not None else 'memory'
+
+    def _lookup(self, key):
+        """依次查找 Redis 和进程内缓存（不计入命中统计）"""
+        client = self._redis()
+        if client is not None:
+            try:
+                data = client.get(key)
+                if data is not None:
+                    return zlib.decompress(data)
+            except Exception as e:
+                self._redis_failed(e)
+        return self.local.get(key)
+
+    def _count(self, body):
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def get(self, key):
+        """读取缓存的响应体，未命中返回 None"""
+        if not self.enabled:
+            return None
+        return self._count(self._lookup(key))
+
+    def set(self, key, body):
+        """写入响应体；超过单条上限的结果不缓存"""
+        if not self.enabled or len(body) > self.max_entry_bytes:
+            return False
+        client = self._redis()
+        if client is not None:
+            try:
+                client.setex(key, self.ttl, zlib.compress(body))
+                return True
+            except Exception as e:
+                self._redis_failed(e)
+        return self.local.set(key, body)
+
+    def get_or_compute(self, key, compute):
+        """读取缓存，未命中时调用 compute() 生成响应体并写入缓存
+
+        同一个键同时只计算一次：本进程内的并发请求等待第一个请求的结果，
+        使用 Redis 时再用 SET NX 锁让其它进程的请求轮询等待，
+        这样全班同时点击"运行"也只会真正计算一次。返回 (body, 'hit'|'miss')。
+        """
+        if not self.enabled:
+            return compute(), 'miss'
+
+        body = self._lookup(key)
+        if body is not None:
+            return self._count(body), 'hit'
+
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+
+        if not owner:
+            # 本进程已有请求在计算同一个键，等待其结果
+            event.wait(COMPUTE_WAIT_TIMEOUT)
+            body = self._count(self._lookup(key))
+            if body is not None:
+                return body, 'hit'
+            return compute(), 'miss'
+
+        locked = False
+        try:
+            locked, body = self._acquire_redis_lock(key)
+            if body is not None:
+                return self._count(body), 'hit'
+            self._count(None)
+            body = compute()
+            self.set(key, body)
+            return body, 'miss'
+        finally:
+            if locked:
+                self._release_redis_lock(key)
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _acquire_redis_lock(self, key):
+        """获取 Redis 计算锁；锁被其它进程持有时轮询等待其结果
+
+        返回 (是否持有锁, 等到的响应体)。Redis 不可用时视为无需加锁。
+        """
+        client = self._redis()
+        if client is None:
+            return False, None
+        try:
+            if client.set(f'{key}:lock', 1, nx=True, ex=COMPUTE_WAIT_TIMEOUT):
+                return True, None
+            deadline = time.monotonic() + COMPUTE_WAIT_TIMEOUT
+            while time.monotonic() < deadline:
+                data = client.get(key)
+                if data is not None:
+                    return False, zlib.decompress(data)
+                if not client.exists(f'{key}:lock'):
+                    break
+                time.sleep(REDIS_POLL_INTERVAL)
+        except Exception as e:
+            self._redis_failed(e)
+        return False, None
+
+    def _release_redis_lock(self, key):
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            client.delete(f'{key}:lock')
+        except Exception as e:
+            self._redis_failed(e)
+
+    def clear(self):
+        """清空进程内缓存（Redis中的条目依赖TTL过期）"""
+        self.local.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'backend': self.backend,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0,
+            'redis_errors': self.errors,
+            'local': self.local.stats()
+        }
+
+
+# 全局缓存实例
+simulation_cache = SimulationCache.from_config()
@@ -0,0 +1,196 @@
+import io
+import json
+import os
+import re
+import time
+import uuid
+
+import numpy as np
+from werkzeug.utils import secure_filename
+
+from app.config import Config
+from app.utils.exceptions import NotFoundException, QuotaExceededException
+
+# 用户上传数据集支持的文件格式
+USER_DATASET_EXTENSIONS = ('csv', 'npy')
+
+# 数据集ID为32位十六进制串（uuid4），查找文件前先校验，防止路径穿越
+_DATASET_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# 上传的坐标统一缩放到前端画布的 [0, 10] × [0, 10] 范围
+CANVAS_SIZE = 10.0
+
+
+def _user_folder(user_id):
+    return os.path.join(Config.USER_DATASET_FOLDER, str(int(user_id)))
+
+
+def _paths(folder, dataset_id):
+    """数据集的三个文件：元数据、坐标和原始簇标签"""
+    base = os.path.join(folder, dataset_id)
+    return f'{base}.json', f'{base}.points.npy', f'{base}.labels.npy'
+
+
+def _parse_csv(content):
+    """解析CSV：每行 x,y 或 x,y,label，第一行不是数字时视为表头跳过"""
+    text = content.decode('utf-8-sig')
+    lines = text.lstrip().splitlines()
+    skiprows = 0
+    if lines:
+        try:
+            [float(value) for value in lines[0].split(',')]
+        except ValueError:
+            skiprows = 1
+    try:
+        return np.loadtxt(io.StringIO('\n'.join(lines)), delimiter=',', skiprows=skiprows,
+                          dtype=np.float64, ndmin=2)
+    except ValueError as e:
+        raise ValueError(f'CSV文件格式错误: {e}')
+
+
+def _parse_npy(content):
+    try:
+        return np.load(io.BytesIO(content), allow_pickle=False)
+    except ValueError as e:
+        raise ValueError(f'NPY文件格式错误: {e}')
+
+
+def _validate(array):
+    """校验数组并拆分为 (坐标, 原始簇标签, 是否带标签)；坐标为 (n, 2)，第三列（可选）为整数标签"""
+    if array.ndim != 2 or array.shape[1] not in (2, 3):
+        raise ValueError('数据集必须是 n×2（x, y）或 n×3（x, y, 标签）的数值表格')
+    if not np.issubdtype(array.dtype, np.number):
+        raise ValueError('数据集只能包含数值')
+    n = len(array)
+    if n < 2:
+        raise ValueError('数据集至少需要2个数据点')
+    if n > Config.USER_DATASET_MAX_POINTS:
+        raise ValueError(f'数据点数不能超过 {Config.USER_DATASET_MAX_POINTS}')
+
+    array = array.astype(np.float64, copy=False)
+    if not np.isfinite(array).all():
+        raise ValueError('数据集中包含缺失值或无穷大')
+    points = np.ascontiguousarray(array[:, :2])
+    if array.shape[1] == 3:
+        labels = array[:, 2]
+        if not np.array_equal(labels, np.round(labels)) or np.abs(labels).max() > np.iinfo(np.int32).max:
+            raise ValueError('第三列必须是整数簇标签')
+        return points, labels.astype(np.int32), True
+    return points, np.zeros(n, dtype=np.int32), False
+
+
+def _fit_canvas(points):
+    """等比例缩放平移到画布范围内（两个坐标轴使用同一缩放系数，点之间的距离关系不变）"""
+    low = points.min(axis=0)
+    span = float((points.max(axis=0) - low).max())
+    scale = CANVAS_SIZE / span if span > 0 else 1.0
+    return (points - low) * scale, {'low': low.tolist(), 'scale': scale}
+
+
+def _save_array(path, array):
+    # 先写临时文件再改名，其它进程不会读到写了一半的文件
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+def _read_info(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def list_user_datasets(user_id):
+    """列出用户上传的全部数据集（按上传时间排序）"""
+    folder = _user_folder(user_id)
+    if not os.path.isdir(folder):
+        return []
+    infos = [_read_info(os.path.join(folder, name)) for name in os.listdir(folder) if name.endswith('.json')]
+    return sorted(infos, key=lambda info: info['created_at'])
+
+
+def save_user_dataset(user_id, file, name=None):
+    """校验并保存上传的CSV/NPY数据集，返回元数据
+
+    文件只在上传时解析一次，之后以 .npy 格式保存，模拟时通过内存映射打开。
+    每个用户的数据集个数和占用的总字节数都有上限，超出时抛出 QuotaExceededException。
+    """
+    filename = secure_filename(file.filename or '')
+    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    if ext not in USER_DATASET_EXTENSIONS:
+        raise ValueError(f'只支持以下格式的数据集: {", ".join(USER_DATASET_EXTENSIONS)}')
+
+    content = file.read(Config.USER_DATASET_MAX_FILE_BYTES + 1)
+    if len(content) > Config.USER_DATASET_MAX_FILE_BYTES:
+        raise QuotaExceededException(f'数据集文件不能超过 {Config.USER_DATASET_MAX_FILE_BYTES // (1024 * 1024)}MB')
+
+    array = _parse_csv(content) if ext == 'csv' else _parse_npy(content)
+    points, labels, has_labels = _validate(array)
+    points, transform = _fit_canvas(points)
+    nbytes = points.nbytes + labels.nbytes
+
+    existing = list_user_datasets(user_id)
+    if len(existing) >= Config.USER_DATASET_MAX_COUNT:
+        raise QuotaExceededException(f'每个用户最多保存 {Config.USER_DATASET_MAX_COUNT} 个数据集')
+    if sum(info['nbytes'] for info in existing) + nbytes > Config.USER_DATASET_QUOTA_BYTES:
+        raise QuotaExceededException('数据集占用的存储空间已达上限，请先删除不用的数据集')
+
+    folder = _user_folder(user_id)
+    os.makedirs(folder, exist_ok=True)
+    dataset_id = uuid.uuid4().hex
+    info_path, points_path, labels_path = _paths(folder, dataset_id)
+    info = {
+        'id': dataset_id,
+        'user_id': str(user_id),
+        'name': name or filename,
+        'n_points': len(points),
+        'has_labels': has_labels,
+        'n_clusters': len(np.unique(labels[labels >= 0])) if has_labels else None,
+        'nbytes': nbytes,
+        'transform': transform,  # 原始坐标 = 画布坐标 / scale + low
+        'created_at': time.time()
+    }
+    _save_array(points_path, points)
+    _save_array(labels_path, labels)
+    # 元数据最后写入：元数据存在即表示数据文件已完整
+    with open(info_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False)
+    return info
+
+
+def _find(dataset_id):
+    """按ID查找数据集所在的用户目录，找不到时抛出 NotFoundException"""
+    if not isinstance(dataset_id, str) or not _DATASET_ID_PATTERN.match(dataset_id):
+        raise NotFoundException('数据集不存在')
+    root = Config.USER_DATASET_FOLDER
+    if os.path.isdir(root):
+        for user_dir in os.listdir(root):
+            folder = os.path.join(root, user_dir)
+            if os.path.exists(_paths(folder, dataset_id)[0]):
+                return folder
+    raise NotFoundException('数据集不存在')
+
+
+def get_user_dataset_info(dataset_id):
+    """读取数据集的元数据；数据集ID本身即访问凭证，教师可以把ID分享给学生使用"""
+    return _read_info(_paths(_find(dataset_id), dataset_id)[0])
+
+
+def load_user_dataset(dataset_id):
+    """以只读内存映射打开数据集，返回 (坐标数组, 原始簇标签数组)
+
+    数据不会被复制到进程内存，多个工作进程打开同一数据集时共享操作系统的页缓存。
+    """
+    _, points_path, labels_path = _paths(_find(dataset_id), dataset_id)
+    return np.load(points_path, mmap_mode='r'), np.load(labels_path, mmap_mode='r')
+
+
+def delete_user_dataset(user_id, dataset_id):
+    """删除用户自己的数据集（正在使用它的模拟不受影响）"""
+    folder = _find(dataset_id)
+    info_path, points_path, labels_path = _paths(folder, dataset_id)
+    if _read_info(info_path)['user_id'] != str(user_id):
+        raise NotFoundException('数据集不存在')
+    for path in (info_path, points_path, labels_path):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,135 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def estimate_nbytes(value):
+    """估算缓存值占用的内存（NumPy数组按 nbytes 计算，容器递归累加）"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """线程安全的LRU缓存，可同时按条目数、占用字节数和过期时间（秒）淘汰"""
+
+    def __init__(self, max_items=None, max_bytes=None, sizeof=estimate_nbytes, ttl=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and not self._expired(entry)
+
+    def get(self, key, default=None):
+        """读取缓存并把条目移到最近使用的位置"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """写入缓存；单个值超过字节上限时不缓存。ttl 为空时使用缓存的默认过期时间"""
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires_at)
+            self._bytes += size
+            self._evict()
+        return True
+
+    def get_or_create(self, key, factory):
+        """命中则直接返回，否则调用 factory() 生成并写入缓存
+
+        factory 在锁外执行，并发未命中时可能重复计算，但不会阻塞其它读取。
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)
+
+    def purge_expired(self):
+        """清理所有已过期的条目，返回清理数量"""
+        with self._lock:
+            expired = [key for key, entry in self._data.items() if self._expired(entry)]
+            for key in expired:
+                self._remove(key)
+            self.evictions += len(expired)
+            return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """缓存统计信息"""
+        return {
+            'items': len(self._data),
+            'bytes': self._bytes,
+            'max_items': self.max_items,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+    @staticmethod
+    def _expired(entry):
+        expires_at = entry[2]
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def _remove(self, key):
+        # 调用方需持有锁
+        value, size, _ = self._data.pop(key)
+        self._bytes -= size
+        return value
+
+    def _evict(self):
+        # 调用方需持有锁
+        while self._data and (
+            (self.max_items is not None and len(self._data) > self.max_items) or
+            (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, size, _) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
@@ -13,5 +13,17 @@ class UnauthorizedException(Exception):
 class ValidationException(Exception):
     """验证异常"""
     def __init__(self, message="Validation error"):
+        self.message = message
+        super().__init__(self.message)
+
+class QuotaExceededException(Exception):
+    """超出配额异常"""
+    def __init__(self, message="Quota exceeded"):
+        self.message = message
+        super().__init__(self.message)
+
+class QueueFullException(Exception):
+    """任务队列已满异常"""
+    def __init__(self, message="Queue is full"):
         self.message = message
         super().__init__(self.message)
\ No newline at end of file
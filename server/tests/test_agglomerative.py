@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from scipy.cluster.hierarchy import fcluster
+from sklearn.metrics import adjusted_rand_score
+
+from app.services.clustering_service import cut_dendrogram, trace_agglomerative
+from app.services.dataset_service import generate_dataset
+
+
+@pytest.mark.parametrize('linkage_method', ['ward', 'complete', 'average', 'single'])
+def test_cut_dendrogram_returns_requested_cluster_counts(linkage_method):
+    X, _ = generate_dataset(400, 'gaussian', 5)
+    Z, _ = trace_agglomerative(X, linkage_method)
+    for n_clusters in (1, 2, 3, 7, 50, 400):
+        labels = cut_dendrogram(Z, n_clusters)
+        assert len(np.unique(labels)) == n_clusters
+        # 簇按最小点下标编号：第一次出现的顺序即为 0, 1, 2, ...
+        _, first = np.unique(labels, return_index=True)
+        np.testing.assert_array_equal(labels[np.sort(first)], np.arange(n_clusters))
+        assert adjusted_rand_score(fcluster(Z, n_clusters, criterion='maxclust'), labels) == 1.0
+
+
+def test_cut_dendrogram_keeps_cluster_count_with_tied_distances():
+    # 整数网格上大量合并距离相同，按距离阈值切割会一次合并过多
+    X = np.array([[x, y] for x in range(10) for y in range(10)], dtype=np.float64)
+    Z, _ = trace_agglomerative(X, 'single')
+    for n_clusters in (2, 5, 37, 99):
+        assert len(np.unique(cut_dendrogram(Z, n_clusters))) == n_clusters
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from sklearn.cluster import DBSCAN
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+from app.services.clustering_service import collect_frames, iter_dbscan_frames
+from app.services.dataset_service import generate_dataset
+from app.services.density_service import build_density_index, dbscan_from_index
+
+
+def _ambiguous_border_points(X, labels, core, eps):
+    """同时处在多个簇核心点 ε 邻域内的边界点：归属取决于扩展顺序"""
+    neighbourhoods = NearestNeighbors(radius=eps).fit(X).radius_neighbors(X, return_distance=False)
+    ambiguous = np.zeros(len(X), dtype=bool)
+    for i in np.flatnonzero(~core):
+        neighbours = neighbourhoods[i]
+        ambiguous[i] = len(np.unique(labels[neighbours[core[neighbours]]])) > 1
+    return ambiguous
+
+
+@pytest.mark.parametrize('data_type', ['moons', 'gaussian', 'noisy'])
+@pytest.mark.parametrize('eps', [0.08, 0.15, 0.3])
+def test_density_index_matches_sklearn_dbscan(data_type, eps):
+    X, _ = generate_dataset(1500, data_type, 3)
+    X = StandardScaler().fit_transform(X)
+    min_samples = 5
+    index = build_density_index(X, min_samples)
+
+    labels, core = dbscan_from_index(index, eps)
+    expected = DBSCAN(eps=eps, min_samples=min_samples).fit(X)
+    expected_core = np.zeros(len(X), dtype=bool)
+    expected_core[expected.core_sample_indices_] = True
+
+    np.testing.assert_array_equal(core, expected_core)
+    settled = ~_ambiguous_border_points(X, expected.labels_, expected_core, eps)
+    np.testing.assert_array_equal(labels[settled], expected.labels_[settled])
+
+
+@pytest.mark.parametrize('data_type', ['moons', 'gaussian', 'noisy'])
+@pytest.mark.parametrize('eps', [0.08, 0.15, 0.3])
+def test_expansion_trace_matches_sklearn_dbscan(data_type, eps):
+    X, _ = generate_dataset(1500, data_type, 3)
+    frames, _ = collect_frames(iter_dbscan_frames(X, eps, 5, mode='expansion', frame_every=2))
+    expected = DBSCAN(eps=eps, min_samples=5).fit(StandardScaler().fit_transform(X)).labels_
+
+    # 扩展顺序与sklearn相同，多个簇共享的边界点也归入同一个簇
+    final = frames[-1]['labels']
+    np.testing.assert_array_equal(final, expected)
+    # 扩展过程中已归类的点不会再改变簇
+    for frame in frames[2:-1]:
+        assigned = frame['labels'] >= 0
+        np.testing.assert_array_equal(frame['labels'][assigned], final[assigned])
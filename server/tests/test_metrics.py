@@ -0,0 +1,33 @@
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score, silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from app.services.dataset_service import generate_dataset
+from app.services.metrics_service import (calinski_harabasz, compute_cluster_metrics, davies_bouldin,
+                                          silhouette_exact)
+
+
+def test_sampled_silhouette_ci_covers_exact_value():
+    """中等规模数据上强制抽样估计，置信区间应覆盖精确的轮廓系数"""
+    X, _ = generate_dataset(8000, 'moons', 7)
+    X = StandardScaler().fit_transform(X)
+    labels = DBSCAN(eps=0.1, min_samples=5).fit_predict(X)
+
+    exact = silhouette_exact(X, labels)
+    metrics = compute_cluster_metrics(X, labels, mode='sampled', sample_size=1500)
+
+    assert metrics['silhouette_mode'] == 'sampled'
+    low, high = metrics['silhouette_ci']
+    assert low <= exact <= high
+
+
+def test_metrics_with_many_small_clusters_match_sklearn():
+    """大量小簇时按块计算（块大小计入簇数），结果与 sklearn 一致"""
+    X, _ = generate_dataset(1500, 'uniform', 3)
+    labels = DBSCAN(eps=0.01, min_samples=1).fit_predict(X)
+    assert len(np.unique(labels)) > 500
+
+    assert abs(silhouette_exact(X, labels, working_memory=64 * 1024) - silhouette_score(X, labels)) < 1e-6
+    assert abs(calinski_harabasz(X, labels) - calinski_harabasz_score(X, labels)) < 1e-6
+    assert abs(davies_bouldin(X, labels, working_memory=64 * 1024) - davies_bouldin_score(X, labels)) < 1e-6
@@ -0,0 +1,71 @@
+import pytest
+
+from app.config import Config
+from app.services.clustering_service import (parse_gmm_sweep_params, parse_k_distance_params, parse_simulation_params,
+                                             parse_sweep_params)
+from app.services.dataset_service import generate_dataset
+
+
+@pytest.mark.parametrize('field', ['k_value', 'max_iterations'])
+@pytest.mark.parametrize('value', [0, -1, 'abc', None])
+def test_kmeans_rejects_non_positive_ints(field, value):
+    with pytest.raises(ValueError):
+        parse_simulation_params('kmeans', {'point_count': 100, field: value})
+
+
+def test_kmeans_normalises_numeric_strings():
+    params = parse_simulation_params('kmeans', {'point_count': 100, 'k_value': '4', 'max_iterations': '20'})
+    assert params['k_value'] == 4 and params['max_iterations'] == 20
+
+
+@pytest.mark.parametrize('field', ['k_value', 'max_iterations', 'tolerance'])
+@pytest.mark.parametrize('value', [0, -1, 'abc', None])
+def test_gmm_rejects_non_positive_values(field, value):
+    with pytest.raises(ValueError):
+        parse_simulation_params('gmm', {'point_count': 100, field: value})
+
+
+@pytest.mark.parametrize('data', [
+    {'point_count': 10, 'min_points': 11},
+    {'point_count': Config.DBSCAN_K_DISTANCE_MAX_POINTS + 1}
+])
+def test_k_distance_rejects_out_of_range_inputs(data):
+    with pytest.raises(ValueError):
+        parse_k_distance_params(data)
+
+
+@pytest.mark.parametrize('parse', [parse_sweep_params, parse_gmm_sweep_params])
+def test_sweeps_reject_datasets_above_sync_limit(parse):
+    with pytest.raises(ValueError):
+        parse({'point_count': Config.SIMULATION_SYNC_MAX_POINTS + 1})
+
+
+@pytest.mark.parametrize('data', [
+    {'epsilon': 0}, {'epsilon': -1}, {'epsilon': 'abc'}, {'epsilon': None},
+    {'min_points': 0}, {'min_points': 'abc'},
+    {'mode': 'expansion', 'frame_every': -1}, {'mode': 'expansion', 'frame_every': 'abc'}
+])
+def test_dbscan_rejects_invalid_parameters(data):
+    with pytest.raises(ValueError):
+        parse_simulation_params('dbscan', {'point_count': 100, **data})
+
+
+def test_dbscan_normalises_numeric_strings():
+    params = parse_simulation_params('dbscan', {'point_count': 100, 'epsilon': '0.5', 'min_points': '4'})
+    assert params['epsilon'] == 0.5 and params['min_points'] == 4
+
+
+@pytest.mark.parametrize('algorithm, data', [
+    ('kmeans', {'centroid_method': 'bogus'}),
+    ('gmm', {'covariance_type': 'bogus'})
+])
+def test_unknown_methods_are_rejected_before_running(algorithm, data):
+    with pytest.raises(ValueError):
+        parse_simulation_params(algorithm, {'point_count': 100, **data})
+
+
+def test_unknown_data_type_is_rejected():
+    with pytest.raises(ValueError):
+        parse_simulation_params('kmeans', {'point_count': 100, 'data_type': 'blobs'})
+    with pytest.raises(ValueError):
+        generate_dataset(100, 'blobs')
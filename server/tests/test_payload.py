@@ -0,0 +1,86 @@
+import base64
+
+import numpy as np
+import pytest
+
+from app.services.clustering_service import (collect_frames, iter_agglomerative_frames, iter_dbscan_frames,
+                                             iter_gmm_frames, iter_kmeans_frames)
+from app.services.dataset_service import generate_dataset
+from app.services.payload_service import apply_frame_budget, build_payload
+
+
+def _decode(encoded):
+    dtype = np.dtype(encoded['dtype']).newbyteorder('<')
+    return np.frombuffer(base64.b64decode(encoded['data']), dtype=dtype).reshape(encoded['shape'])
+
+
+def _keyframe_state(step, response_format):
+    """从完整关键帧中取出客户端需要保存的状态：标签、概率和质心"""
+    if response_format == 'dict':
+        labels = [point['cluster'] for point in step['points']]
+        probability = [point['probability'] for point in step['points']] if 'probability' in step['points'][0] else None
+    else:
+        labels = _decode(step['labels']).tolist()
+        probability = _decode(step['probability']).tolist() if 'probability' in step else None
+    return {'labels': labels, 'probability': probability, 'centroids': step.get('centroids')}
+
+
+def _apply_delta(state, step, response_format):
+    """按客户端的方式把一帧稀疏差异叠加到上一帧的状态上"""
+    state = {key: None if value is None else list(value) for key, value in state.items()}
+    changes = step['changes']
+    if response_format == 'dict':
+        indices, clusters, probability = changes['indices'], changes['clusters'], changes.get('probability')
+    else:
+        indices, clusters = _decode(changes['indices']).tolist(), _decode(changes['clusters']).tolist()
+        probability = _decode(changes['probability']).tolist() if 'probability' in changes else None
+    for position, i in enumerate(indices):
+        state['labels'][i] = clusters[position]
+        if probability is not None:
+            state['probability'][i] = probability[position]
+    if 'centroids' in step:
+        state['centroids'] = step['centroids']
+    for centroid in step.get('moved_centroids', []):
+        state['centroids'][centroid['cluster']] = centroid
+    return state
+
+
+def _frames(algorithm):
+    X, _ = generate_dataset(400, 'gaussian', 11)
+    if algorithm == 'kmeans':
+        frames, metrics = collect_frames(iter_kmeans_frames(X, 4))
+    elif algorithm == 'gmm':
+        frames, metrics = collect_frames(iter_gmm_frames(X, 4))
+    else:
+        frames, metrics = collect_frames(iter_dbscan_frames(X, 0.2, 5, mode='expansion'))
+    return X, frames, metrics
+
+
+@pytest.mark.parametrize('algorithm', ['kmeans', 'gmm', 'dbscan'])
+@pytest.mark.parametrize('response_format', ['dict', 'columnar'])
+def test_delta_frames_reproduce_full_frames(algorithm, response_format):
+    X, frames, metrics = _frames(algorithm)
+    full = build_payload(X, frames, metrics, response_format=response_format, frame_encoding='full')
+    delta = build_payload(X, frames, metrics, response_format=response_format, frame_encoding='delta')
+
+    assert delta['frame_encoding'] == 'delta'
+    assert len(delta['steps']) == len(full['steps'])
+    assert any(not step['keyframe'] for step in delta['steps'])
+    state = None
+    for full_step, delta_step in zip(full['steps'], delta['steps']):
+        if delta_step['keyframe']:
+            state = _keyframe_state(delta_step, response_format)
+        else:
+            state = _apply_delta(state, delta_step, response_format)
+        assert state == _keyframe_state(full_step, response_format)
+        assert delta_step['description'] == full_step['description']
+        assert delta_step['metrics'] == full_step['metrics']
+
+
+@pytest.mark.parametrize('budget', [{'max_frames': 2}, {'max_bytes': 1}])
+def test_frame_budget_keeps_the_dendrogram_frame(budget):
+    X, _ = generate_dataset(300, 'gaussian', 11)
+    frames, metrics = collect_frames(iter_agglomerative_frames(X, 3))
+    kept, info = apply_frame_budget(X, frames, metrics, **budget)
+    assert info['kept_frames'] < info['total_frames']
+    assert any(frame['dendrogram'] is not None for frame in kept)